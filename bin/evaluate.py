@@ -0,0 +1,226 @@
+#! /usr/bin/env python
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Evaluates the checkpoints of a training run in a separate process.
+
+The script watches a model directory for new checkpoints and evaluates each
+one once, writing summaries to the `eval_<eval_name>` directory. Training
+does not need to pause for evaluation. Optionally, all checkpoints except
+the best K according to a metric are deleted.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+
+import yaml
+
+import tensorflow as tf
+from tensorflow import gfile
+
+from seq2seq import models
+from seq2seq.configurable import _maybe_load_yaml, _create_from_dict
+from seq2seq.configurable import _deep_merge_dict
+from seq2seq.data import input_pipeline
+from seq2seq.metrics import metric_specs
+from seq2seq.training import utils as training_utils
+from seq2seq.training.evaluator import Evaluator, BestCheckpoints
+from seq2seq.training.evaluator import delete_checkpoint
+
+tf.flags.DEFINE_string("config_paths", "",
+                       """Path to YAML configuration files defining FLAG
+                       values, e.g. the configuration files used for
+                       training. Multiple files can be separated by commas.
+                       Keys that are not flags of this script are
+                       ignored.""")
+tf.flags.DEFINE_string("model_dir", None,
+                       "The model directory to watch for checkpoints.")
+tf.flags.DEFINE_string("model_params", "{}",
+                       """Optionally overwrite model parameters for
+                       evaluation. A YAML string.""")
+tf.flags.DEFINE_string("input_pipeline_dev", "{}",
+                       """YAML configuration string for the development
+                       data input pipeline.""")
+tf.flags.DEFINE_string("metrics", "[]",
+                       """YAML configuration string for the evaluation
+                       metrics to use.""")
+tf.flags.DEFINE_string("buckets", None,
+                       """Buckets input sequences according to these length.
+                       A comma-separated list of sequence length
+                       buckets.""")
+tf.flags.DEFINE_integer("batch_size", 16, "Batch size used for evaluation.")
+tf.flags.DEFINE_string("eval_name", "continuous",
+                       """Summaries are written to the eval_<eval_name>
+                       subdirectory of the model directory.""")
+tf.flags.DEFINE_integer("eval_interval_secs", 60,
+                        """Minimum number of seconds between
+                        evaluations.""")
+tf.flags.DEFINE_integer("timeout_secs", None,
+                        """Stop if no new checkpoint appears for this many
+                        seconds. If None, wait forever.""")
+tf.flags.DEFINE_integer("train_steps", None,
+                        """Stop after evaluating a checkpoint of at least
+                        this many steps.""")
+tf.flags.DEFINE_integer("keep_best", 0,
+                        """If greater than 0, delete all evaluated
+                        checkpoints except the best N according to
+                        best_metric. The latest checkpoint is never
+                        deleted.""")
+tf.flags.DEFINE_string("best_metric", "loss",
+                       "The evaluation metric used to rank checkpoints.")
+tf.flags.DEFINE_boolean("higher_is_better", False,
+                        "Whether higher values of best_metric are better.")
+tf.flags.DEFINE_integer("intra_op_parallelism_threads", 0,
+                        """Number of threads used to parallelize a single op.
+                        0 lets TensorFlow pick the number of cores.""")
+tf.flags.DEFINE_integer("inter_op_parallelism_threads", 0,
+                        """Number of threads used to run independent ops in
+                        parallel. 0 lets TensorFlow pick the number of
+                        cores.""")
+
+FLAGS = tf.flags.FLAGS
+
+
+def _load_config_files(config_paths):
+  """Sets the FLAGS to the values of all configuration files, as in
+  train.py. Dictionary flags are merged with the configuration values."""
+  final_config = {}
+  for config_path in config_paths.split(","):
+    config_path = config_path.strip()
+    if not config_path:
+      continue
+    tf.logging.info("Loading config from %s", config_path)
+    with gfile.GFile(os.path.abspath(config_path)) as config_file:
+      final_config = _deep_merge_dict(final_config, yaml.load(config_file))
+
+  for flag_key, flag_value in final_config.items():
+    if not hasattr(FLAGS, flag_key):
+      continue
+    if isinstance(getattr(FLAGS, flag_key), dict):
+      flag_value = _deep_merge_dict(flag_value, getattr(FLAGS, flag_key))
+    setattr(FLAGS, flag_key, flag_value)
+
+
+def create_evaluator():
+  """Creates the Evaluator from the saved training options and the
+  FLAGS."""
+  train_options = training_utils.TrainOptions.load(FLAGS.model_dir)
+  model_params = _deep_merge_dict(train_options.model_params,
+                                  FLAGS.model_params or {})
+
+  def model_fn(features, labels, mode):
+    """Builds the model graph"""
+    model = _create_from_dict({
+        "class": train_options.model_class,
+        "params": model_params
+    }, models, mode=mode)
+    predictions, loss, _ = model(features, labels, None)
+    return tf.contrib.learn.ModelFnOps(
+        mode=mode, predictions=predictions, loss=loss)
+
+  bucket_boundaries = None
+  if FLAGS.buckets:
+    bucket_boundaries = list(map(int, FLAGS.buckets.split(",")))
+
+  dev_input_pipeline = input_pipeline.make_input_pipeline_from_def(
+      def_dict=FLAGS.input_pipeline_dev,
+      mode=tf.contrib.learn.ModeKeys.EVAL,
+      shuffle=False, num_epochs=1)
+  eval_input_fn = training_utils.create_input_fn(
+      pipeline=dev_input_pipeline,
+      batch_size=FLAGS.batch_size,
+      bucket_boundaries=bucket_boundaries,
+      allow_smaller_final_batch=True,
+      scope="dev_input_fn")
+
+  eval_metrics = {}
+  for dict_ in FLAGS.metrics:
+    metric = _create_from_dict(dict_, metric_specs)
+    eval_metrics[metric.name] = metric
+
+  session_config = tf.ConfigProto(
+      intra_op_parallelism_threads=FLAGS.intra_op_parallelism_threads,
+      inter_op_parallelism_threads=FLAGS.inter_op_parallelism_threads)
+
+  return Evaluator(
+      model_fn=model_fn,
+      input_fn=eval_input_fn,
+      metrics=eval_metrics,
+      eval_dir=FLAGS.model_dir,
+      session_config=session_config)
+
+
+def main(_argv):
+  """The entrypoint for the script"""
+  FLAGS.model_params = _maybe_load_yaml(FLAGS.model_params)
+  FLAGS.input_pipeline_dev = _maybe_load_yaml(FLAGS.input_pipeline_dev)
+  FLAGS.metrics = _maybe_load_yaml(FLAGS.metrics)
+  _load_config_files(FLAGS.config_paths)
+
+  if not FLAGS.model_dir:
+    raise ValueError("You must specify model_dir")
+  if not FLAGS.input_pipeline_dev:
+    raise ValueError("You must specify input_pipeline_dev")
+
+  evaluator = create_evaluator()
+  eval_dir = os.path.join(FLAGS.model_dir, "eval_" + FLAGS.eval_name)
+  gfile.MakeDirs(eval_dir)
+  best_checkpoints = BestCheckpoints(
+      metric=FLAGS.best_metric,
+      higher_is_better=FLAGS.higher_is_better,
+      num_best=max(FLAGS.keep_best, 1),
+      state_path=os.path.join(eval_dir, "checkpoints.json"))
+
+  for checkpoint_path in tf.contrib.training.checkpoints_iterator(
+      FLAGS.model_dir,
+      min_interval_secs=FLAGS.eval_interval_secs,
+      timeout=FLAGS.timeout_secs):
+    if checkpoint_path in best_checkpoints:
+      tf.logging.info("Skipping %s, it has been evaluated before",
+                      checkpoint_path)
+      continue
+
+    try:
+      evaluator.restore(checkpoint_path)
+    except tf.errors.NotFoundError:
+      tf.logging.warning("Checkpoint %s was deleted before it could be "
+                         "evaluated", checkpoint_path)
+      continue
+    eval_result = evaluator.evaluate(name=FLAGS.eval_name)
+    best_checkpoints.add(checkpoint_path, eval_result)
+
+    if FLAGS.keep_best > 0:
+      latest_checkpoint = tf.train.latest_checkpoint(FLAGS.model_dir)
+      for path in best_checkpoints.checkpoints_to_delete(
+          exclude=[latest_checkpoint]):
+        tf.logging.info("Deleting checkpoint %s", path)
+        delete_checkpoint(path)
+        best_checkpoints.mark_deleted(path)
+
+    if FLAGS.train_steps and \
+      eval_result[tf.GraphKeys.GLOBAL_STEP] >= FLAGS.train_steps:
+      tf.logging.info("Evaluated the final checkpoint")
+      break
+
+  tf.logging.info("Best checkpoints:\n%s", yaml.dump(best_checkpoints.best))
+  evaluator.close()
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  tf.app.run()
@@ -0,0 +1,224 @@
+#! /usr/bin/env python
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs distributed training with parameter servers and multiple training
+processes on a single machine.
+
+All processes run `bin/train.py` with a `TF_CONFIG` environment variable that
+describes a cluster on localhost. The chief runs as the `master` job and the
+remaining training processes as `worker` jobs. By default every process is
+pinned to its own block of CPU cores and its thread pools are sized to match,
+so that the processes do not compete for the same cores.
+
+All arguments not listed below are passed on to `bin/train.py`, e.g.
+
+  python -m bin.launch_local \\
+    --num_workers 4 --sync_replicas \\
+    --output_dir /tmp/model \\
+    --config_paths example_configs/nmt_small.yml,example_configs/train_seq2seq.yml \\
+    --train_steps 1000
+
+The output of each process is written to `<output_dir>/logs/`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import io
+import os
+import subprocess
+import sys
+import time
+
+import yaml
+
+from seq2seq.training import local_cluster
+
+PARSER = argparse.ArgumentParser(
+    description="Runs distributed training on a single machine.")
+PARSER.add_argument(
+    "--num_workers", type=int, default=2,
+    help="number of training processes, including the chief")
+PARSER.add_argument(
+    "--num_ps", type=int, default=1, help="number of parameter servers")
+PARSER.add_argument(
+    "--sync_replicas", action="store_true",
+    help="""aggregate the gradients of all training processes synchronously
+    using the SyncReplicasOptimizer. By default the processes update the
+    parameters asynchronously""")
+PARSER.add_argument(
+    "--replicas_to_aggregate", type=int, default=None,
+    help="""number of gradients to aggregate per update with --sync_replicas.
+    Defaults to --num_workers""")
+PARSER.add_argument(
+    "--num_ps_cpus", type=int, default=1,
+    help="number of CPU cores shared by the parameter servers")
+PARSER.add_argument(
+    "--no_pin_cpus", action="store_true",
+    help="""do not pin processes to CPU cores. Thread pools are still sized
+    according to an even split of the cores""")
+PARSER.add_argument(
+    "--inter_op_threads", type=int, default=2,
+    help="inter-op thread pool size of each training process")
+PARSER.add_argument(
+    "--gpus", type=str, default="",
+    help="""comma-separated list of GPU ids that are assigned round-robin to
+    the training processes. By default no GPUs are used""")
+PARSER.add_argument(
+    "--host", type=str, default="localhost",
+    help="host name the processes listen on")
+PARSER.add_argument(
+    "--output_dir", type=str, required=True,
+    help="model directory shared by all processes")
+PARSER.add_argument(
+    "--config_paths", type=str, default="",
+    help="configuration files, passed on to bin/train.py")
+PARSER.add_argument(
+    "--train_script", type=str,
+    default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "train.py"),
+    help="path to the training script")
+
+
+def _write_sync_config(output_dir, num_replicas, replicas_to_aggregate):
+  """Writes a configuration file that enables the SyncReplicasOptimizer and
+  returns its path."""
+  config_path = os.path.join(output_dir, "local_cluster.yml")
+  config = {
+      "model_params": {
+          "optimizer.sync_replicas": num_replicas,
+          "optimizer.sync_replicas_to_aggregate": replicas_to_aggregate
+      }
+  }
+  with io.open(config_path, "w", encoding="utf-8") as file:
+    file.write(yaml.dump(config, default_flow_style=False))
+  return config_path
+
+
+def _pin_to_cpus(cpus):
+  """Returns a function that pins the calling process to the given CPUs.
+  Used as `preexec_fn` of the child processes."""
+  def pin():
+    if hasattr(os, "sched_setaffinity"):
+      os.sched_setaffinity(0, cpus)
+  return pin
+
+
+def _terminate(processes):
+  """Terminates all processes that are still running."""
+  for process in processes:
+    if process.poll() is None:
+      process.terminate()
+  for process in processes:
+    process.wait()
+
+
+def launch(args, train_args):
+  """Starts all processes of the cluster and waits for training to finish.
+
+  Returns:
+    The exit code of the first failed training process, or 0.
+  """
+  log_dir = os.path.join(args.output_dir, "logs")
+  if not os.path.isdir(log_dir):
+    os.makedirs(log_dir)
+
+  config_paths = [_ for _ in args.config_paths.split(",") if _.strip()]
+  if args.sync_replicas:
+    config_paths.append(_write_sync_config(
+        args.output_dir, args.num_workers,
+        args.replicas_to_aggregate or args.num_workers))
+
+  cluster = local_cluster.create_cluster(
+      num_workers=args.num_workers, num_ps=args.num_ps, host=args.host)
+  ps_cpus, worker_cpus = local_cluster.partition_cpus(
+      local_cluster.available_cpus(),
+      num_workers=args.num_workers,
+      num_ps=args.num_ps,
+      num_ps_cpus=args.num_ps_cpus)
+  gpus = [_ for _ in args.gpus.split(",") if _.strip()]
+
+  ps_processes = []
+  train_processes = []
+  try:
+    for job_name, task_index in local_cluster.cluster_tasks(cluster):
+      if job_name == "ps":
+        cpus = ps_cpus
+        visible_gpus = ""
+      else:
+        replica_index = task_index + (1 if job_name == "worker" else 0)
+        cpus = worker_cpus[replica_index]
+        visible_gpus = gpus[replica_index % len(gpus)] if gpus else ""
+
+      env = dict(os.environ)
+      env["TF_CONFIG"] = local_cluster.create_tf_config(
+          cluster, job_name, task_index)
+      env["CUDA_VISIBLE_DEVICES"] = visible_gpus
+      env["OMP_NUM_THREADS"] = str(len(cpus))
+
+      command = [
+          sys.executable, args.train_script,
+          "--output_dir={}".format(args.output_dir),
+          "--config_paths={}".format(",".join(config_paths)),
+          "--intra_op_parallelism_threads={}".format(len(cpus)),
+          "--inter_op_parallelism_threads={}".format(
+              1 if job_name == "ps" else args.inter_op_threads)
+      ] + train_args
+
+      log_path = os.path.join(
+          log_dir, "{}-{}.log".format(job_name, task_index))
+      print("Starting {}:{} on CPUs {}, logging to {}".format(
+          job_name, task_index, ",".join(map(str, cpus)), log_path))
+      with io.open(log_path, "wb") as log_file:
+        process = subprocess.Popen(
+            command, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+            preexec_fn=None if args.no_pin_cpus else _pin_to_cpus(cpus))
+      if job_name == "ps":
+        ps_processes.append(process)
+      else:
+        train_processes.append(process)
+
+    # The parameter servers run forever, so wait for the training processes
+    # only and stop everything as soon as one of them fails.
+    while True:
+      for process in ps_processes:
+        if process.poll() is not None:
+          print("A parameter server exited with code {}".format(
+              process.returncode))
+          return process.returncode or 1
+      return_codes = [_.poll() for _ in train_processes]
+      failed = [_ for _ in return_codes if _ not in (None, 0)]
+      if failed:
+        print("A training process exited with code {}".format(failed[0]))
+        return failed[0]
+      if all(_ == 0 for _ in return_codes):
+        print("Training finished")
+        return 0
+      time.sleep(1)
+  finally:
+    _terminate(train_processes + ps_processes)
+
+
+def main():
+  """Main function"""
+  args, train_args = PARSER.parse_known_args()
+  sys.exit(launch(args, train_args))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,203 @@
+#! /usr/bin/env python
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Decodes and resizes all images of an image captioning TFRecord dataset once
+and writes them to a memory-mapped feature cache. Pass the output directory
+as the `cache_dir` of the `ImageCaptioningInputPipeline` to skip decoding
+during training.
+
+With `--features inception` the images are additionally passed through the
+`InceptionV3Encoder` and the resulting attention features and pooled final
+state are cached instead of the images. Training an `Image2Seq` model with
+the `PrecomputedImageEncoder` on this cache only runs the decoder.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import tensorflow as tf
+from tensorflow import gfile
+
+from seq2seq.data import feature_cache
+from seq2seq.data.input_pipeline import ImageCaptioningInputPipeline
+from seq2seq.encoders.image_encoder import InceptionV3Encoder
+
+tf.flags.DEFINE_string("files", None,
+                       """Comma-separated list of TFRecord files or glob
+                       patterns to read images and captions from.""")
+tf.flags.DEFINE_string("output_dir", None, "path to the output directory")
+tf.flags.DEFINE_integer("image_height", 299, "resize images to this height")
+tf.flags.DEFINE_integer("image_width", 299, "resize images to this width")
+tf.flags.DEFINE_integer("num_decode_threads", 4,
+                        "number of threads decoding images in parallel")
+tf.flags.DEFINE_string("features", "images",
+                       """What to cache, one of "images" for the resized
+                       images or "inception" for InceptionV3 features.""")
+tf.flags.DEFINE_integer("batch_size", 32,
+                        "batch size for computing InceptionV3 features")
+tf.flags.DEFINE_string("checkpoint_path", None,
+                       """InceptionV3 checkpoint to compute features with,
+                       e.g. the pre-trained checkpoint from the slim model
+                       zoo. Required for inception features.""")
+tf.flags.DEFINE_string("checkpoint_scope", "",
+                       """Prefix of the InceptionV3 variable names in the
+                       checkpoint, e.g.
+                       "model/att_seq2seq/encode/image_encoder/" for a
+                       trained Image2Seq model.""")
+
+FLAGS = tf.flags.FLAGS
+
+SEQUENCE_KEYS = ["target_tokens", "target_ids"]
+
+
+def count_records(files):
+  """Returns the number of records in the given TFRecord files."""
+  num_records = 0
+  for filename in files:
+    num_records += sum(1 for _ in tf.python_io.tf_record_iterator(filename))
+  return num_records
+
+
+def create_pipeline(files):
+  """Creates an input pipeline that reads each image once."""
+  return ImageCaptioningInputPipeline(
+      params={
+          "files": files,
+          "shuffle": False,
+          "num_epochs": 1,
+          "image_height": FLAGS.image_height,
+          "image_width": FLAGS.image_width,
+          "num_decode_threads": FLAGS.num_decode_threads,
+      },
+      mode=tf.contrib.learn.ModeKeys.INFER)
+
+
+def iterate_examples(sess, tensors):
+  """Evaluates `tensors` until the input is exhausted and yields the
+  resulting numpy dictionaries."""
+  coord = tf.train.Coordinator()
+  threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+  try:
+    while True:
+      yield sess.run(tensors)
+  except tf.errors.OutOfRangeError:
+    pass
+  finally:
+    coord.request_stop()
+    coord.join(threads)
+
+
+def iterate_inception_examples(sess, batch):
+  """Evaluates batches of InceptionV3 features and captions and yields
+  the individual unpadded examples."""
+  for batch_ in iterate_examples(sess, batch):
+    for idx, target_len in enumerate(batch_["target_len"]):
+      yield {
+          "image_features": batch_["image_features"][idx],
+          "image_final_state": batch_["image_final_state"][idx],
+          "target_tokens": batch_["target_tokens"][idx][:target_len],
+          "target_ids": batch_["target_ids"][idx][:target_len],
+          "target_len": target_len,
+      }
+
+
+def create_inception_features(example):
+  """Batches examples and computes InceptionV3 features for them.
+
+  Returns:
+    A tuple `(batch, init_fn)`. `init_fn` restores the InceptionV3
+    variables from `FLAGS.checkpoint_path` in a session.
+  """
+  batch = tf.train.batch(
+      tensors=example,
+      batch_size=FLAGS.batch_size,
+      dynamic_pad=True,
+      allow_smaller_final_batch=True,
+      name="batch_queue")
+
+  encoder = InceptionV3Encoder(
+      params={
+          "resize_height": FLAGS.image_height,
+          "resize_width": FLAGS.image_width,
+          "final_state": "pool",
+      },
+      mode=tf.contrib.learn.ModeKeys.INFER)
+  encoder_output = encoder(batch["image"])
+
+  # Map variables to their names in the checkpoint
+  var_list = {}
+  for var in tf.global_variables():
+    _, name = var.op.name.split("/", 1)
+    var_list[FLAGS.checkpoint_scope + name] = var
+  init_fn = tf.contrib.framework.assign_from_checkpoint_fn(
+      FLAGS.checkpoint_path, var_list)
+
+  features = {
+      "image_features": encoder_output.attention_values,
+      "image_final_state": encoder_output.final_state,
+      "target_tokens": batch["target_tokens"],
+      "target_ids": batch["target_ids"],
+      "target_len": batch["target_len"],
+  }
+  return features, init_fn
+
+
+def main(_argv):
+  """Main function"""
+  if FLAGS.features not in ["images", "inception"]:
+    raise ValueError("Unknown features: {}".format(FLAGS.features))
+  if FLAGS.features == "inception" and not FLAGS.checkpoint_path:
+    raise ValueError("Inception features require a --checkpoint_path")
+
+  files = []
+  for pattern in FLAGS.files.split(","):
+    files.extend(sorted(gfile.Glob(pattern.strip())))
+  num_examples = count_records(files)
+  tf.logging.info("Caching %d examples from %s", num_examples, files)
+
+  pipeline = create_pipeline(files)
+  data_provider = pipeline.make_data_provider()
+  example = pipeline.read_from_data_provider(data_provider)
+  tensors = {
+      key: example[key]
+      for key in ["image", "target_tokens", "target_ids", "target_len"]
+  }
+
+  init_fn = None
+  if FLAGS.features == "inception":
+    tensors, init_fn = create_inception_features(tensors)
+
+  with tf.Session() as sess:
+    sess.run(tf.global_variables_initializer())
+    sess.run(tf.local_variables_initializer())
+    if init_fn is not None:
+      init_fn(sess)
+      examples = iterate_inception_examples(sess, tensors)
+    else:
+      examples = iterate_examples(sess, tensors)
+    num_written = feature_cache.write_feature_cache(
+        cache_dir=FLAGS.output_dir,
+        examples=examples,
+        num_examples=num_examples,
+        sequence_keys=SEQUENCE_KEYS)
+  tf.logging.info("Wrote %d examples to %s", num_written, FLAGS.output_dir)
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  tf.app.run()
@@ -0,0 +1,50 @@
+#! /usr/bin/env python
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compiles a vocabulary file into a directory that can be passed in place
+of the vocabulary file. Compiled vocabularies are loaded without reading
+the full file and are not embedded into the graph.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+
+from seq2seq.data import vocab
+
+PARSER = argparse.ArgumentParser(
+    description="Compiles a vocabulary file.")
+PARSER.add_argument(
+    "vocab_path", type=str,
+    help="vocabulary file generated by generate_vocab.py")
+PARSER.add_argument(
+    "--output_dir", type=str, required=True,
+    help="path to the output directory")
+
+
+def main():
+  """Main function"""
+  args = PARSER.parse_args()
+  vocab.compile_vocabulary(args.vocab_path, args.output_dir)
+  vocab_info = vocab.get_vocab_info(args.output_dir)
+  print("Compiled vocabulary of size {} to {}".format(
+      vocab_info.vocab_size, args.output_dir))
+
+
+if __name__ == "__main__":
+  main()
@@ -21,7 +21,9 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import json
 import os
+import sys
 import six
 
 #pylint: disable=E0611
@@ -38,12 +40,33 @@ from tensorflow.python.framework import common_shapes # pylint: disable=E0611
 
 # Import custom ops
 from seq2seq.decoders.attention import att_sum_bahdanau, att_sum_dot
+from seq2seq.losses import chunk_cross_entropy
+from seq2seq.training import profiling
 
 
 tf.flags.DEFINE_string("model_dir", None, "path to model directory")
+tf.flags.DEFINE_integer("top_n", 20,
+                        """Number of rows in the tables of aggregated op
+                        statistics.""")
+tf.flags.DEFINE_integer("scope_depth", 3,
+                        """Maximum name scope depth of the aggregated op
+                        statistics.""")
+tf.flags.DEFINE_string("baseline_dir", None,
+                       """If set, compare the op statistics of model_dir
+                       against the statistics of this model directory instead
+                       of running the analyses.""")
+tf.flags.DEFINE_float("regression_threshold", 0.1,
+                      """Relative increase of the time, float ops or memory
+                      of a scope that counts as regression.""")
+tf.flags.DEFINE_integer("min_regression_micros", 100,
+                        """Increases in time below this many microseconds per
+                        step are ignored.""")
+tf.flags.DEFINE_boolean("fail_on_regression", False,
+                        """Exit with a non-zero status if the comparison
+                        finds regressions.""")
 
 FLAGS = tf.flags.FLAGS
-CUSTOM_OP_FUNCTIONS = [att_sum_bahdanau, att_sum_dot]
+CUSTOM_OP_FUNCTIONS = [att_sum_bahdanau, att_sum_dot, chunk_cross_entropy]
 
 def _register_function_ops(func_list):
   """Registers custom ops in the default graph. This is needed
@@ -171,6 +194,114 @@ def device_analysis_options(output_dir):
   return "scope", options
 
 
+def op_stats_analysis(model_dir, output_dir, top_n, scope_depth):
+  """Summarizes the op statistics aggregated over multiple traced steps by
+  the MetadataCaptureHook. Returns the text of the summary, or None if the
+  statistics do not exist."""
+  op_stats_path = os.path.join(model_dir, "metadata",
+                               profiling.OP_STATS_FILENAME)
+  if not gfile.Exists(op_stats_path):
+    print("Op statistics do not exist at {}. Skipping.".format(op_stats_path))
+    return None
+
+  op_stats = profiling.load_op_stats(op_stats_path)
+  ops = op_stats["ops"]
+  sections = [
+      "Averaged over {} traced steps: {}".format(
+          op_stats["num_steps"], ", ".join(map(str, op_stats["steps"]))),
+      "Time by scope:\n" + profiling.format_table(
+          profiling.aggregate_by_scope(ops, scope_depth), "micros", top_n),
+      "Memory by scope:\n" + profiling.format_table(
+          profiling.aggregate_by_scope(ops, scope_depth), "bytes", top_n),
+      "Time by op type:\n" + profiling.format_table(
+          profiling.aggregate_by_type(ops), "micros", top_n),
+      "Top ops by time:\n" + profiling.format_table(ops, "micros", top_n),
+  ]
+  summary = "\n\n".join(sections)
+  print(summary)
+
+  summary_path = os.path.join(output_dir, "op_stats.txt")
+  with gfile.GFile(summary_path, "w") as file:
+    file.write(summary + "\n")
+  print("Wrote {}".format(summary_path))
+  return summary
+
+
+def load_op_stats(model_dir):
+  """Loads the op statistics of a model directory. Falls back to computing
+  them from a single traced step if the statistics of multiple steps do not
+  exist."""
+  op_stats_path = os.path.join(model_dir, "metadata",
+                               profiling.OP_STATS_FILENAME)
+  if gfile.Exists(op_stats_path):
+    print("Loaded op statistics from {}".format(op_stats_path))
+    return profiling.load_op_stats(op_stats_path)
+
+  run_meta, graph, _ = load_metadata(model_dir)
+  if not run_meta.step_stats.dev_stats:
+    raise ValueError("No traced steps found in {}".format(model_dir))
+  # pylint: disable=W0212
+  float_ops = {
+      name: entry.float_ops
+      for name, entry in tfprof_logger._get_logged_ops(graph, run_meta).items()
+  }
+  accumulator = profiling.OpStatsAccumulator(
+      op_types={op.name: op.type for op in graph.get_operations()})
+  accumulator.add(-1, profiling.collect_op_stats(run_meta.step_stats,
+                                                 float_ops))
+  return accumulator.to_dict()
+
+
+def diff_analysis(model_dir, baseline_dir, output_dir):
+  """Compares the op statistics of two runs by name scope and writes a JSON
+  report.
+
+  Returns:
+    The report as a dictionary.
+  """
+  base_stats = load_op_stats(baseline_dir)
+  new_stats = load_op_stats(model_dir)
+
+  totals_diff = profiling.diff_stats(
+      {"total": profiling.total_stats(base_stats["ops"])},
+      {"total": profiling.total_stats(new_stats["ops"])})["total"]
+  scope_diff = profiling.diff_stats(
+      profiling.aggregate_by_scope(base_stats["ops"], FLAGS.scope_depth),
+      profiling.aggregate_by_scope(new_stats["ops"], FLAGS.scope_depth))
+  thresholds = {key: FLAGS.regression_threshold
+                for key in profiling.STAT_KEYS}
+  regressions = profiling.find_regressions(
+      scope_diff, thresholds, {"micros": FLAGS.min_regression_micros})
+
+  print("Comparing {} against baseline {}".format(model_dir, baseline_dir))
+  for key in profiling.STAT_KEYS:
+    change = totals_diff[key]
+    print("Total {}: {:.0f} -> {:.0f} ({:+.0f})".format(
+        key, change["base"], change["new"], change["delta"]))
+  for key in profiling.STAT_KEYS:
+    print("\nChange of {} by scope:".format(key))
+    print(profiling.format_diff_table(scope_diff, key, FLAGS.top_n))
+  print("\nFound {} regressions".format(len(regressions)))
+  for regression in regressions[:FLAGS.top_n]:
+    print("  {metric} of {name}: {base:.0f} -> {new:.0f}".format(
+        **regression))
+
+  report = {
+      "model_dir": model_dir,
+      "baseline_dir": baseline_dir,
+      "num_steps": new_stats["num_steps"],
+      "baseline_num_steps": base_stats["num_steps"],
+      "totals": totals_diff,
+      "scopes": scope_diff,
+      "regressions": regressions
+  }
+  report_path = os.path.join(output_dir, "diff.json")
+  with gfile.GFile(report_path, "w") as file:
+    file.write(json.dumps(report, indent=1, sort_keys=True))
+  print("Wrote {}".format(report_path))
+  return report
+
+
 def main(_argv):
   """Main functions. Runs all anaylses."""
   # pylint: disable=W0212
@@ -180,6 +311,15 @@ def main(_argv):
   output_dir = os.path.join(FLAGS.model_dir, "profile")
   gfile.MakeDirs(output_dir)
 
+  if FLAGS.baseline_dir:
+    report = diff_analysis(
+        FLAGS.model_dir,
+        os.path.abspath(os.path.expanduser(FLAGS.baseline_dir)),
+        output_dir)
+    if FLAGS.fail_on_regression and report["regressions"]:
+      sys.exit(1)
+    return
+
   run_meta, graph, op_log = load_metadata(FLAGS.model_dir)
 
   param_arguments = [
@@ -200,6 +340,9 @@ def main(_argv):
     if params["dump_to_file"] != "":
       print("Wrote {}".format(params["dump_to_file"]))
 
+  op_stats_analysis(FLAGS.model_dir, output_dir, FLAGS.top_n,
+                    FLAGS.scope_depth)
+
 
 if __name__ == '__main__':
   tf.app.run()
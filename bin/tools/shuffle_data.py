@@ -0,0 +1,170 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Globally shuffles parallel text files that do not fit into memory.
+
+The shuffle is performed in two passes. The first pass streams through the
+data and appends each example to one of `num_shards` randomly chosen shard
+files. The second pass loads one shard at a time into memory, shuffles it,
+and writes it back. Each shard holds a uniformly random subset of the data,
+so memory usage is bounded by the size of a single shard.
+
+The resulting shards can be passed to the `ParallelTextInputPipeline` with
+`shuffle_files: True` to additionally reshuffle the shard order every epoch.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import io
+import os
+import random
+
+from six.moves import zip_longest
+
+PARSER = argparse.ArgumentParser(
+    description="Shuffles parallel text files with bounded memory.")
+PARSER.add_argument(
+    "--sources", type=str, nargs="+", required=True,
+    help="source text files, one example per line")
+PARSER.add_argument(
+    "--targets", type=str, nargs="*", default=[],
+    help="target text files, aligned with the source files")
+PARSER.add_argument(
+    "--output_dir", type=str, required=True,
+    help="path to the output directory")
+PARSER.add_argument(
+    "--num_shards", type=int, default=64,
+    help="""number of output shards. Each shard must fit into memory during
+    the second pass""")
+PARSER.add_argument(
+    "--seed", type=int, default=None, help="random seed")
+
+
+def shard_filenames(output_dir, name, num_shards):
+  """Returns the file names of all shards for the given data name,
+  e.g. "sources" or "targets".
+  """
+  return [
+      os.path.join(output_dir, "{}-{:05d}-of-{:05d}.txt".format(
+          name, shard_index, num_shards))
+      for shard_index in range(num_shards)
+  ]
+
+
+def _read_lines(filenames):
+  """Iterates over the lines of all given files, in order."""
+  for filename in filenames:
+    with io.open(filename, "rb") as file:
+      for line in file:
+        yield line.rstrip(b"\n") + b"\n"
+
+
+def scatter_to_shards(sources, targets, source_shards, target_shards, rng):
+  """First pass: Appends each example to a random shard.
+
+  Args:
+    sources: List of source files.
+    targets: List of target files. Can be empty.
+    source_shards: Output file names for the source shards.
+    target_shards: Output file names for the target shards, or None.
+    rng: An instance of `random.Random`.
+
+  Returns:
+    The number of examples written.
+  """
+  num_shards = len(source_shards)
+  source_files = [io.open(_, "wb") for _ in source_shards]
+  target_files = [io.open(_, "wb") for _ in target_shards or []]
+  num_examples = 0
+  try:
+    lines = zip_longest(_read_lines(sources), _read_lines(targets))
+    for source_line, target_line in lines:
+      if source_line is None or (targets and target_line is None):
+        raise ValueError("Source and target files are not aligned.")
+      shard_index = rng.randint(0, num_shards - 1)
+      source_files[shard_index].write(source_line)
+      if target_files:
+        target_files[shard_index].write(target_line)
+      num_examples += 1
+  finally:
+    for file in source_files + target_files:
+      file.close()
+  return num_examples
+
+
+def shuffle_shard(source_shard, target_shard, rng):
+  """Second pass: Shuffles a single shard in memory and rewrites it.
+
+  Args:
+    source_shard: Path to the source shard.
+    target_shard: Path to the target shard, or None.
+    rng: An instance of `random.Random`.
+  """
+  with io.open(source_shard, "rb") as file:
+    source_lines = file.readlines()
+  target_lines = None
+  if target_shard is not None:
+    with io.open(target_shard, "rb") as file:
+      target_lines = file.readlines()
+
+  permutation = list(range(len(source_lines)))
+  rng.shuffle(permutation)
+
+  with io.open(source_shard, "wb") as file:
+    file.writelines(source_lines[i] for i in permutation)
+  if target_shard is not None:
+    with io.open(target_shard, "wb") as file:
+      file.writelines(target_lines[i] for i in permutation)
+
+
+def main():
+  """Main function"""
+  args = PARSER.parse_args()
+  rng = random.Random(args.seed)
+
+  try:
+    os.makedirs(args.output_dir)
+  except OSError:
+    if not os.path.isdir(args.output_dir):
+      raise
+
+  source_shards = shard_filenames(args.output_dir, "sources", args.num_shards)
+  target_shards = None
+  if args.targets:
+    target_shards = shard_filenames(args.output_dir, "targets",
+                                    args.num_shards)
+
+  num_examples = scatter_to_shards(args.sources, args.targets, source_shards,
+                                   target_shards, rng)
+  print("Scattered {} examples into {} shards".format(num_examples,
+                                                        args.num_shards))
+
+  for shard_index, source_shard in enumerate(source_shards):
+    target_shard = target_shards[shard_index] if target_shards else None
+    shuffle_shard(source_shard, target_shard, rng)
+  print("Wrote {}".format(os.path.join(args.output_dir, "sources-*")))
+  if target_shards:
+    print("Wrote {}".format(os.path.join(args.output_dir, "targets-*")))
+
+
+if __name__ == "__main__":
+  main()
@@ -21,6 +21,7 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import copy
 import os
 import tempfile
 
@@ -38,6 +39,8 @@ from seq2seq.configurable import _deep_merge_dict
 from seq2seq.data import input_pipeline
 from seq2seq.metrics import metric_specs
 from seq2seq.training import hooks
+from seq2seq.training.early_stopping import EarlyStopping
+from seq2seq.training.early_stopping import STOP_MARKER_FILENAME
 from seq2seq.training import utils as training_utils
 
 tf.flags.DEFINE_string("config_paths", "",
@@ -72,6 +75,27 @@ tf.flags.DEFINE_string("buckets", None,
                        A comma-separated list of sequence length buckets, e.g.
                        "10,20,30" would result in 4 buckets:
                        <10, 10-20, 20-30, >30. None disabled bucketing. """)
+tf.flags.DEFINE_integer("pool_size", None,
+                        """If set, read pools of this many training batches,
+                        sort each pool by sequence length and train on its
+                        batches in random order. Can not be combined with
+                        buckets.""")
+tf.flags.DEFINE_integer("curriculum_steps", None,
+                        """If set, train on short examples first. The maximum
+                        example length grows from curriculum_min_length to
+                        curriculum_max_length over this many steps.""")
+tf.flags.DEFINE_integer("curriculum_min_length", 10,
+                        "The maximum example length at the first step.")
+tf.flags.DEFINE_integer("curriculum_max_length", 50,
+                        """The maximum example length at the end of the
+                        curriculum. All examples are used afterwards.""")
+tf.flags.DEFINE_boolean("cache_eval_data", False,
+                        """If true, read the development data only once and
+                        replay the cached batches for every evaluation.""")
+tf.flags.DEFINE_string("eval_cache_path", None,
+                       """Optional, a file to store the cached development
+                       data batches in. The file is reused across runs if it
+                       exists. Only used with cache_eval_data.""")
 tf.flags.DEFINE_integer("batch_size", 16,
                         """Batch size used for training and evaluation.""")
 tf.flags.DEFINE_string("output_dir", None,
@@ -81,12 +105,31 @@ tf.flags.DEFINE_string("output_dir", None,
 # Training parameters
 tf.flags.DEFINE_string("schedule", None,
                        """Estimator function to call, defaults to
-                       continuous_train_and_eval for local run""")
+                       continuous_train_and_eval for local run. Use
+                       persistent_train_and_eval to keep the training and
+                       evaluation graphs alive between evaluations.""")
 tf.flags.DEFINE_integer("train_steps", None,
                         """Maximum number of training steps to run.
                          If None, train forever.""")
 tf.flags.DEFINE_integer("eval_every_n_steps", 1000,
                         "Run evaluation on validation data every N steps.")
+tf.flags.DEFINE_string("early_stopping_metric", None,
+                       """Stop training when this evaluation metric, e.g.
+                       loss or bleu, stops improving. Requires the
+                       continuous_train_and_eval or persistent_train_and_eval
+                       schedule.""")
+tf.flags.DEFINE_integer("early_stopping_patience", 5,
+                        """Stop after this many evaluations without
+                        improvement of the early stopping metric.""")
+tf.flags.DEFINE_float("early_stopping_min_delta", 0.0,
+                      """The minimum change of the early stopping metric that
+                      counts as improvement.""")
+tf.flags.DEFINE_boolean("early_stopping_higher_is_better", False,
+                        """Set to true if higher values of the early stopping
+                        metric are better, e.g. for bleu.""")
+tf.flags.DEFINE_boolean("early_stopping_keep_best", True,
+                        """If true, keep the checkpoint with the best value of
+                        the early stopping metric in output_dir/best.""")
 
 # RunConfig Flags
 tf.flags.DEFINE_integer("tf_random_seed", None,
@@ -114,6 +157,14 @@ tf.flags.DEFINE_boolean("gpu_allow_growth", False,
                         dynamically.""")
 tf.flags.DEFINE_boolean("log_device_placement", False,
                         """Log the op placement to devices""")
+tf.flags.DEFINE_integer("intra_op_parallelism_threads", 0,
+                        """Number of threads used to parallelize a single op,
+                        e.g. a matrix multiplication. 0 lets TensorFlow pick
+                        the number of cores.""")
+tf.flags.DEFINE_integer("inter_op_parallelism_threads", 0,
+                        """Number of threads used to run independent ops in
+                        parallel. 0 lets TensorFlow pick the number of
+                        cores.""")
 
 
 FLAGS = tf.flags.FLAGS
@@ -135,6 +186,10 @@ def create_experiment(output_dir):
       gpu_memory_fraction=FLAGS.gpu_memory_fraction)
   config.tf_config.gpu_options.allow_growth = FLAGS.gpu_allow_growth
   config.tf_config.log_device_placement = FLAGS.log_device_placement
+  config.tf_config.intra_op_parallelism_threads = \
+    FLAGS.intra_op_parallelism_threads
+  config.tf_config.inter_op_parallelism_threads = \
+    FLAGS.inter_op_parallelism_threads
 
   train_options = training_utils.TrainOptions(
       model_class=FLAGS.model,
@@ -148,9 +203,14 @@ def create_experiment(output_dir):
   if FLAGS.buckets:
     bucket_boundaries = list(map(int, FLAGS.buckets.split(",")))
 
-  # Training data input pipeline
+  # Training data input pipeline. Each process in a distributed cluster
+  # reads its own shard of the data unless the shards are set explicitly.
+  train_pipeline_def = copy.deepcopy(FLAGS.input_pipeline_train)
+  train_pipeline_def["params"] = _deep_merge_dict(
+      training_utils.input_shard_params(config),
+      train_pipeline_def.get("params") or {})
   train_input_pipeline = input_pipeline.make_input_pipeline_from_def(
-      def_dict=FLAGS.input_pipeline_train,
+      def_dict=train_pipeline_def,
       mode=tf.contrib.learn.ModeKeys.TRAIN)
 
   # Create training input function
@@ -158,7 +218,11 @@ def create_experiment(output_dir):
       pipeline=train_input_pipeline,
       batch_size=FLAGS.batch_size,
       bucket_boundaries=bucket_boundaries,
-      scope="train_input_fn")
+      scope="train_input_fn",
+      pool_size=FLAGS.pool_size,
+      curriculum_steps=FLAGS.curriculum_steps,
+      curriculum_min_length=FLAGS.curriculum_min_length,
+      curriculum_max_length=FLAGS.curriculum_max_length)
 
   # Development data input pipeline
   dev_input_pipeline = input_pipeline.make_input_pipeline_from_def(
@@ -167,11 +231,19 @@ def create_experiment(output_dir):
       shuffle=False, num_epochs=1)
 
   # Create eval input function
-  eval_input_fn = training_utils.create_input_fn(
-      pipeline=dev_input_pipeline,
-      batch_size=FLAGS.batch_size,
-      allow_smaller_final_batch=True,
-      scope="dev_input_fn")
+  if FLAGS.cache_eval_data:
+    eval_input_fn = training_utils.create_cached_input_fn(
+        pipeline=dev_input_pipeline,
+        batch_size=FLAGS.batch_size,
+        allow_smaller_final_batch=True,
+        cache_path=FLAGS.eval_cache_path,
+        scope="dev_input_fn")
+  else:
+    eval_input_fn = training_utils.create_input_fn(
+        pipeline=dev_input_pipeline,
+        batch_size=FLAGS.batch_size,
+        allow_smaller_final_batch=True,
+        scope="dev_input_fn")
 
 
   def model_fn(features, labels, params, mode):
@@ -197,12 +269,38 @@ def create_experiment(output_dir):
         run_config=config)
     train_hooks.append(hook)
 
+  # Synchronous replicas can not start training without the hook that
+  # initializes the token queue, so add it if it is missing.
+  model_params = train_options.model_params or {}
+  if model_params.get("optimizer.sync_replicas", 0) > 0 and \
+    not any(isinstance(_, hooks.SyncReplicasOptimizerHook)
+            for _ in train_hooks):
+    train_hooks.append(hooks.SyncReplicasOptimizerHook(
+        params={}, model_dir=estimator.model_dir, run_config=config))
+
   # Create metrics
   eval_metrics = {}
   for dict_ in FLAGS.metrics:
     metric = _create_from_dict(dict_, metric_specs)
     eval_metrics[metric.name] = metric
 
+  early_stopping = None
+  if FLAGS.early_stopping_metric:
+    best_dir = None
+    if FLAGS.early_stopping_keep_best:
+      best_dir = os.path.join(output_dir, "best")
+    early_stopping = EarlyStopping(
+        metric=FLAGS.early_stopping_metric,
+        patience=FLAGS.early_stopping_patience,
+        min_delta=FLAGS.early_stopping_min_delta,
+        higher_is_better=FLAGS.early_stopping_higher_is_better,
+        best_dir=best_dir,
+        stop_marker=os.path.join(output_dir, STOP_MARKER_FILENAME))
+    # Only the chief evaluates. Other workers stop when it writes the marker.
+    if not config.is_chief:
+      train_hooks.append(hooks.StopMarkerHook(
+          params={}, model_dir=estimator.model_dir, run_config=config))
+
   experiment = PatchedExperiment(
       estimator=estimator,
       train_input_fn=train_input_fn,
@@ -211,7 +309,8 @@ def create_experiment(output_dir):
       train_steps=FLAGS.train_steps,
       eval_steps=None,
       eval_metrics=eval_metrics,
-      train_monitors=train_hooks)
+      train_monitors=train_hooks,
+      early_stopping=early_stopping)
 
   return experiment
 
@@ -266,6 +365,25 @@ def main(_argv):
   if not FLAGS.input_pipeline_dev:
     raise ValueError("You must specify input_pipeline_dev")
 
+  if FLAGS.early_stopping_metric:
+    # Only the chief evaluates. Other tasks of a cluster keep the default
+    # schedule that learn_runner picks for their task type.
+    cluster_config = run_config.RunConfig()
+    is_distributed = bool(cluster_config.cluster_spec) and \
+      bool(cluster_config.task_type)
+    eval_schedules = ["continuous_train_and_eval", "persistent_train_and_eval"]
+    if is_distributed and not cluster_config.is_chief:
+      if FLAGS.schedule in eval_schedules:
+        raise ValueError(
+            "Early stopping only runs on the chief, but task {}:{} uses the "
+            "schedule {}".format(cluster_config.task_type,
+                                 cluster_config.task_id, FLAGS.schedule))
+    elif FLAGS.schedule is None:
+      FLAGS.schedule = "continuous_train_and_eval"
+    elif FLAGS.schedule not in eval_schedules:
+      raise ValueError("Early stopping is not supported by the schedule "
+                       "{}".format(FLAGS.schedule))
+
   learn_runner.run(
       experiment_fn=create_experiment,
       output_dir=FLAGS.output_dir,
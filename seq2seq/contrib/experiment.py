@@ -18,13 +18,88 @@ sharing issues.
 
 import tensorflow as tf
 
+from seq2seq.training.evaluator import Evaluator
+from seq2seq.training.evaluator import copy_checkpoint
+
+
+class _PersistentEvalHook(tf.train.SessionRunHook):
+  """Evaluates the model every N steps by copying the training weights into
+  an `Evaluator`.
+
+  Args:
+    evaluator: An `Evaluator` instance.
+    every_n_steps: Evaluate every N global steps.
+    continuous_eval_predicate_fn: Optional, a function of the evaluation
+      results. Training is stopped when it returns false.
+    early_stopping: Optional, an `EarlyStopping` instance that is updated
+      with every evaluation. The evaluated weights are used as its best
+      checkpoint.
+  """
+
+  def __init__(self, evaluator, every_n_steps,
+               continuous_eval_predicate_fn=None, early_stopping=None):
+    super(_PersistentEvalHook, self).__init__()
+    self._evaluator = evaluator
+    self._every_n_steps = every_n_steps
+    self._predicate_fn = continuous_eval_predicate_fn
+    self._early_stopping = early_stopping
+    self._variables = None
+    self._global_step = None
+    self._last_eval_step = None
+    self.eval_result = None
+
+  def begin(self):
+    self._global_step = tf.contrib.framework.get_global_step()
+    train_variables = {_.op.name: _ for _ in tf.global_variables()}
+    self._variables = {
+        name: train_variables[name]
+        for name in self._evaluator.variable_names if name in train_variables
+    }
+
+  def after_create_session(self, session, coord):
+    self._last_eval_step = session.run(self._global_step)
+
+  def after_run(self, run_context, _run_values):
+    # Read the step after the training op, which increments it, has finished.
+    # Fetching it in the same run could return either value.
+    step = run_context.session.run(self._global_step)
+    if step - self._last_eval_step >= self._every_n_steps:
+      self._evaluate(run_context.session)
+      if self._predicate_fn and not self._predicate_fn(self.eval_result):
+        tf.logging.info("Stopping training as requested by the predicate.")
+        run_context.request_stop()
+      if self._early_stopping and self._early_stopping.update(
+          self.eval_result, save_fn=self._evaluator.save):
+        run_context.request_stop()
+
+  def end(self, session):
+    if session.run(self._global_step) != self._last_eval_step:
+      self._evaluate(session)
+
+  def _evaluate(self, session):
+    """Copies the current weights and evaluates them."""
+    self._evaluator.load_weights(session.run(self._variables))
+    self.eval_result = self._evaluator.evaluate()
+    self._last_eval_step = self.eval_result[tf.GraphKeys.GLOBAL_STEP]
+
+
 class Experiment(tf.contrib.learn.Experiment):
   """A patched tf.learn Experiment class to handle GPU memory
-  sharing issues."""
+  sharing issues.
+
+  Args:
+    train_steps_per_iteration: The number of training steps between
+      evaluations in `continuous_train_and_eval`.
+    early_stopping: Optional, an `EarlyStopping` instance. If set,
+      `continuous_train_and_eval` and `persistent_train_and_eval` stop
+      training once the monitored metric stops improving.
+  """
 
-  def __init__(self, train_steps_per_iteration=None, *args, **kwargs):
+  def __init__(self, train_steps_per_iteration=None, early_stopping=None,
+               *args, **kwargs):
     super(Experiment, self).__init__(*args, **kwargs)
     self._train_steps_per_iteration = train_steps_per_iteration
+    self._early_stopping = early_stopping
 
   def _has_training_stopped(self, eval_result):
     """Determines whether the training has stopped."""
@@ -111,4 +186,114 @@ class Experiment(tf.contrib.learn.Experiment):
           name="one_pass",
           hooks=self._eval_hooks)
 
+      # The evaluation always uses the latest checkpoint, which is written
+      # at the end of each training iteration.
+      if self._early_stopping and self._early_stopping.update(
+          eval_result, save_fn=self._copy_latest_checkpoint):
+        break
+
+    return eval_result, self._maybe_export(eval_result)
+
+  def _copy_latest_checkpoint(self, checkpoint_path):
+    """Copies the latest checkpoint of the model to `checkpoint_path`."""
+    copy_checkpoint(
+        tf.train.latest_checkpoint(self._estimator.model_dir), checkpoint_path)
+
+  def persistent_train_and_eval(self, continuous_eval_predicate_fn=None):
+    """Interleaves training and evaluation without rebuilding graphs.
+
+    `continuous_train_and_eval` rebuilds the training graph, restarts the
+    input queues and restores a checkpoint for every training iteration, and
+    does the same for every evaluation. This schedule instead keeps a single
+    training session and a separate evaluation graph alive for the whole
+    run. Every `min_eval_frequency` steps the current weights are copied
+    from the training session into the evaluation graph in memory, without a
+    checkpoint, and the model is evaluated on the development data. The
+    development data is read once and kept in memory.
+
+    Args:
+      continuous_eval_predicate_fn: A predicate function determining whether to
+        continue after each evaluation. It takes the evaluation results as its
+        argument. When it is not specified, this will run in an infinite loop
+        or exit when global_step reaches `train_steps`.
+
+    Only the chief evaluates. Other workers train until `train_steps` is
+    reached or the chief stops.
+
+    Returns:
+      A tuple of the result of the last evaluation and the export results
+      using the specified `ExportStrategy`. On workers other than the chief
+      this is `(None, None)`.
+
+    Raises:
+      ValueError: if `continuous_eval_predicate_fn` is neither None nor
+        callable.
+    """
+    if (continuous_eval_predicate_fn is not None and
+        not callable(continuous_eval_predicate_fn)):
+      raise ValueError(
+          "`continuous_eval_predicate_fn` must be a callable, or None.")
+
+    # pylint: disable=protected-access
+    estimator = self._estimator
+    config = estimator.config
+    evaluator = None
+    eval_hook = None
+    if config.is_chief:
+      evaluator = Evaluator(
+          model_fn=estimator._call_model_fn,
+          input_fn=self._eval_input_fn,
+          metrics=self._eval_metrics,
+          eval_dir=estimator.model_dir,
+          session_config=config.tf_config)
+      eval_hook = _PersistentEvalHook(
+          evaluator=evaluator,
+          every_n_steps=self._min_eval_frequency or 1000,
+          continuous_eval_predicate_fn=continuous_eval_predicate_fn,
+          early_stopping=self._early_stopping)
+
+    with tf.Graph().as_default() as graph:
+      tf.set_random_seed(config.tf_random_seed)
+      global_step = tf.contrib.framework.create_global_step(graph)
+      features, labels = self._train_input_fn()
+      model_fn_ops = estimator._call_model_fn(
+          features, labels, tf.contrib.learn.ModeKeys.TRAIN)
+
+      scaffold = tf.train.Scaffold(saver=tf.train.Saver(
+          sharded=True,
+          max_to_keep=config.keep_checkpoint_max,
+          keep_checkpoint_every_n_hours=config.keep_checkpoint_every_n_hours))
+      hooks = list(self._train_monitors or []) + [
+          tf.train.NanTensorHook(model_fn_ops.loss),
+          tf.train.LoggingTensorHook(
+              {"loss": model_fn_ops.loss, "step": global_step},
+              every_n_iter=100)
+      ]
+      if eval_hook is not None:
+        hooks.append(eval_hook)
+      if self._train_steps is not None:
+        hooks.append(tf.train.StopAtStepHook(last_step=self._train_steps))
+      if config.is_chief:
+        hooks.append(tf.train.CheckpointSaverHook(
+            estimator.model_dir,
+            save_secs=config.save_checkpoints_secs,
+            save_steps=config.save_checkpoints_steps,
+            scaffold=scaffold))
+
+      with tf.train.MonitoredTrainingSession(
+          master=config.master,
+          is_chief=config.is_chief,
+          checkpoint_dir=estimator.model_dir,
+          scaffold=scaffold,
+          hooks=hooks,
+          save_checkpoint_secs=None,
+          save_summaries_steps=config.save_summary_steps,
+          config=config.tf_config) as session:
+        while not session.should_stop():
+          session.run(model_fn_ops.train_op)
+
+    if evaluator is None:
+      return None, None
+    evaluator.close()
+    eval_result = eval_hook.eval_result
     return eval_result, self._maybe_export(eval_result)
@@ -159,6 +159,8 @@ class TrainingHelper(Helper):
     """
     with ops.name_scope(name, "TrainingHelper", [inputs, sequence_length]):
       inputs = ops.convert_to_tensor(inputs, name="inputs")
+      self._inputs = inputs
+      self._time_major = time_major
       if not time_major:
         inputs = nest.map_structure(_transpose_batch_time, inputs)
 
@@ -179,6 +181,17 @@ class TrainingHelper(Helper):
   def batch_size(self):
     return self._batch_size
 
+  @property
+  def inputs(self):
+    """The inputs of all time steps, batch major."""
+    if self._time_major:
+      return nest.map_structure(_transpose_batch_time, self._inputs)
+    return self._inputs
+
+  @property
+  def sequence_length(self):
+    return self._sequence_length
+
   def initialize(self, name=None):
     with ops.name_scope(name, "TrainingHelperInitialize"):
       finished = math_ops.equal(0, self._sequence_length)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Byte Pair Encoding (BPE) segmentation of words into subword units, using
+merge operations learned by https://github.com/rsennrich/subword-nmt.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import threading
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import gfile
+
+
+def load_bpe_codes(codes_path):
+  """Loads BPE merge operations from a file generated by `learn_bpe.py`.
+
+  Args:
+    codes_path: Path to the codes file. Each line contains a pair of
+      symbols to merge, separated by a space. The first line may contain
+      a version header, e.g. "#version: 0.2".
+
+  Returns:
+    A tuple `(bpe_codes, version)`. `bpe_codes` is a dictionary mapping
+    pairs of symbols to their merge priority, lower values are merged first.
+  """
+  if not gfile.Exists(codes_path):
+    raise ValueError("File does not exist: {}".format(codes_path))
+
+  version = (0, 1)
+  bpe_codes = {}
+  with gfile.GFile(codes_path) as file:
+    for line_number, line in enumerate(file):
+      line = tf.compat.as_text(line).rstrip("\n")
+      if line_number == 0 and line.startswith("#version:"):
+        version = tuple(int(_) for _ in line.split()[-1].split("."))
+        continue
+      pair = tuple(line.split(" "))
+      if len(pair) != 2:
+        raise ValueError("Invalid BPE code on line {}: {}".format(
+            line_number + 1, line))
+      # Earlier merges take precedence over later duplicates
+      bpe_codes.setdefault(pair, len(bpe_codes))
+  return bpe_codes, version
+
+
+def _get_pairs(word):
+  """Returns the set of adjacent symbol pairs in a word."""
+  return set(zip(word[:-1], word[1:]))
+
+
+def apply_bpe_codes(word, bpe_codes, version=(0, 2)):
+  """Segments a single word into subword units by greedily applying the
+  highest priority merge operation until no more merges apply.
+
+  Args:
+    word: The word to segment, a string.
+    bpe_codes: A dictionary of merge operations as returned by
+      `load_bpe_codes`.
+    version: The version of the codes file.
+
+  Returns:
+    A tuple of subword units.
+  """
+  if version == (0, 1):
+    symbols = tuple(word) + ("</w>",)
+  else:
+    symbols = tuple(word[:-1]) + (word[-1] + "</w>",)
+
+  pairs = _get_pairs(symbols)
+  if not pairs:
+    return (word,)
+
+  while True:
+    bigram = min(pairs, key=lambda pair: bpe_codes.get(pair, float("inf")))
+    if bigram not in bpe_codes:
+      break
+    first, second = bigram
+    new_symbols = []
+    i = 0
+    while i < len(symbols):
+      if (i < len(symbols) - 1 and symbols[i] == first and
+          symbols[i + 1] == second):
+        new_symbols.append(first + second)
+        i += 2
+      else:
+        new_symbols.append(symbols[i])
+        i += 1
+    symbols = tuple(new_symbols)
+    if len(symbols) == 1:
+      break
+    pairs = _get_pairs(symbols)
+
+  # Remove the end-of-word marker
+  if symbols[-1] == "</w>":
+    symbols = symbols[:-1]
+  elif symbols[-1].endswith("</w>"):
+    symbols = symbols[:-1] + (symbols[-1][:-len("</w>")],)
+  return symbols
+
+
+class BPESegmenter(object):
+  """Segments tokens into subword units using BPE merge operations.
+
+  The segmentation of each word is memoized in a least-recently-used cache
+  of bounded size, so frequent words are only segmented once. All subword
+  units except the last unit of a word are marked with a separator suffix,
+  which can be removed with `seq2seq.data.postproc.strip_bpe`.
+
+  Args:
+    codes_path: Path to a BPE codes file generated by `learn_bpe.py`.
+    separator: The suffix appended to non-final subword units.
+    cache_size: The maximum number of words to keep in the cache.
+  """
+
+  def __init__(self, codes_path, separator="@@", cache_size=100000):
+    self.bpe_codes, self.version = load_bpe_codes(codes_path)
+    self.separator = separator
+    self.cache_size = cache_size
+    self._cache = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  def segment_word(self, word):
+    """Returns the list of subword units for a single word."""
+    with self._lock:
+      units = self._cache.pop(word, None)
+      if units is not None:
+        self._cache[word] = units
+        return units
+
+    units = list(apply_bpe_codes(word, self.bpe_codes, self.version))
+    units = [_ + self.separator for _ in units[:-1]] + units[-1:]
+
+    with self._lock:
+      self._cache[word] = units
+      while len(self._cache) > self.cache_size:
+        self._cache.popitem(last=False)
+    return units
+
+  def segment_list(self, words):
+    """Segments a list of words and returns a flat list of subword units."""
+    return [unit for word in words if word for unit in self.segment_word(word)]
+
+  def segment(self, text):
+    """Segments a space-delimited string and returns a space-delimited
+    string of subword units.
+    """
+    return " ".join(self.segment_list(text.split()))
+
+  def segment_tokens(self, tokens):
+    """Segments a 1-D string tensor of words.
+
+    Args:
+      tokens: A 1-D string tensor.
+
+    Returns:
+      A 1-D string tensor of subword units.
+    """
+
+    def _segment(words):
+      units = self.segment_list([tf.compat.as_text(_) for _ in words])
+      return np.array([tf.compat.as_bytes(_) for _ in units], dtype=object)
+
+    units = tf.py_func(_segment, [tokens], tf.string, stateful=False)
+    units.set_shape([None])
+    return units
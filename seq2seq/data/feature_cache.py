@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+An on-disk cache of preprocessed examples, e.g. decoded and resized images
+or image features computed by a convolutional network. Each item is stored
+as a numpy array that is memory-mapped when the cache is read, so reading
+an example does not load the full cache into memory.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+
+import numpy as np
+import six
+import tensorflow as tf
+from tensorflow import gfile
+from tensorflow.contrib.slim.python.slim.data import data_provider
+
+METADATA_FILENAME = "metadata.json"
+
+
+def _array_path(cache_dir, key):
+  """Returns the path of the numpy file for an item."""
+  return os.path.join(cache_dir, key.replace("/", "_") + ".npy")
+
+
+def write_feature_cache(cache_dir, examples, num_examples,
+                        sequence_keys=None):
+  """Writes examples to a feature cache.
+
+  Args:
+    cache_dir: The directory to write the cache to.
+    examples: An iterable of dictionaries mapping item names to numpy
+      arrays for a single example. All examples must have the same items,
+      and all non-sequence items must have the same shape.
+    num_examples: The number of examples in `examples`.
+    sequence_keys: Optional, a list of items that are variable-length 1-D
+      sequences, e.g. caption tokens. These are stored as space-delimited
+      strings.
+
+  Returns:
+    The number of examples written.
+  """
+  sequence_keys = set(sequence_keys or [])
+  gfile.MakeDirs(cache_dir)
+
+  arrays = None
+  sequences = {key: [] for key in sequence_keys}
+  metadata = {"items": {}}
+  num_written = 0
+  for example in examples:
+    if num_written >= num_examples:
+      raise ValueError("Got more than {} examples.".format(num_examples))
+    if arrays is None:
+      arrays = {}
+      for key, value in example.items():
+        value = np.asarray(value)
+        if key in sequence_keys:
+          metadata["items"][key] = {
+              "dtype": value.dtype.str if value.dtype.kind != "O" else "|S",
+              "sequence": True}
+          continue
+        metadata["items"][key] = {
+            "dtype": value.dtype.str, "shape": list(value.shape),
+            "sequence": False}
+        arrays[key] = np.lib.format.open_memmap(
+            _array_path(cache_dir, key), mode="w+", dtype=value.dtype,
+            shape=(num_examples,) + value.shape)
+    for key, value in example.items():
+      if key in sequence_keys:
+        sequences[key].append(b" ".join(
+            tf.compat.as_bytes(
+                _ if isinstance(_, (bytes, six.text_type)) else str(_))
+            for _ in np.asarray(value).tolist()))
+      else:
+        arrays[key][num_written] = value
+    num_written += 1
+
+  if num_written != num_examples:
+    raise ValueError("Expected {} examples, but got {}.".format(
+        num_examples, num_written))
+
+  for array in (arrays or {}).values():
+    array.flush()
+  for key, values in sequences.items():
+    np.save(_array_path(cache_dir, key), np.array(values, dtype=np.bytes_))
+
+  metadata["num_examples"] = num_written
+  with gfile.GFile(os.path.join(cache_dir, METADATA_FILENAME), "wb") as file:
+    file.write(tf.compat.as_bytes(json.dumps(metadata)))
+  return num_written
+
+
+def is_feature_cache(cache_dir):
+  """Returns true iff `cache_dir` contains a feature cache."""
+  return gfile.Exists(os.path.join(cache_dir, METADATA_FILENAME))
+
+
+class FeatureCache(object):
+  """Reads examples from a cache written by `write_feature_cache`.
+
+  Args:
+    cache_dir: The directory containing the cache.
+  """
+
+  def __init__(self, cache_dir):
+    if not is_feature_cache(cache_dir):
+      raise ValueError("No feature cache found in {}".format(cache_dir))
+    with gfile.GFile(os.path.join(cache_dir, METADATA_FILENAME)) as file:
+      metadata = json.loads(file.read())
+    self.cache_dir = cache_dir
+    self.num_examples = metadata["num_examples"]
+    self.items = metadata["items"]
+    self._arrays = None
+
+  def _get_arrays(self):
+    """Memory-maps the cached arrays when they are first accessed."""
+    if self._arrays is None:
+      self._arrays = {
+          key: np.load(_array_path(self.cache_dir, key), mmap_mode="r")
+          for key in self.items
+      }
+    return self._arrays
+
+  def list_items(self):
+    """Returns the names of the cached items."""
+    return sorted(self.items.keys())
+
+  def read(self, index):
+    """Reads a single example.
+
+    Args:
+      index: A scalar integer tensor, the index of the example to read.
+
+    Returns:
+      A dictionary of tensors for the example.
+    """
+    keys = self.list_items()
+
+    def _read(index):
+      arrays = self._get_arrays()
+      return [np.asarray(arrays[key][index]) for key in keys]
+
+    dtypes = [
+        tf.string if self.items[key]["sequence"] else
+        tf.as_dtype(np.dtype(self.items[key]["dtype"])) for key in keys
+    ]
+    values = tf.py_func(_read, [index], dtypes, stateful=False,
+                        name="read_feature_cache")
+
+    tensors = {}
+    for key, value in zip(keys, values):
+      item = self.items[key]
+      if not item["sequence"]:
+        value.set_shape(item["shape"])
+        tensors[key] = value
+        continue
+      value.set_shape([])
+      tokens = tf.string_split([value], delimiter=" ").values
+      dtype = np.dtype(item["dtype"])
+      if dtype.kind in ["S", "U"]:
+        tensors[key] = tokens
+      else:
+        tensors[key] = tf.string_to_number(
+            tokens, out_type=tf.as_dtype(dtype))
+    return tensors
+
+
+class FeatureCacheDataProvider(data_provider.DataProvider):
+  """A DataProvider that reads examples from a `FeatureCache`.
+
+  Args:
+    cache: An instance of `FeatureCache`.
+    shuffle: Whether to shuffle the examples.
+    num_epochs: Number of times to iterate through the cache. If None,
+      iterate forever.
+    num_shards: Split the examples into this many disjoint shards.
+    shard_index: The shard to read, in `[0, num_shards)`.
+    seed: The seed to use for shuffling.
+  """
+
+  def __init__(self,
+               cache,
+               shuffle=True,
+               num_epochs=None,
+               num_shards=1,
+               shard_index=0,
+               seed=None):
+    indices = np.arange(shard_index, cache.num_examples, num_shards)
+    index_queue = tf.train.input_producer(
+        tf.constant(indices, dtype=tf.int64),
+        num_epochs=num_epochs,
+        shuffle=shuffle,
+        seed=seed,
+        name="feature_cache_indices")
+    items_to_tensors = cache.read(index_queue.dequeue())
+
+    super(FeatureCacheDataProvider, self).__init__(
+        items_to_tensors=items_to_tensors, num_samples=len(indices))
@@ -29,10 +29,13 @@ import sys
 import six
 
 import tensorflow as tf
+from tensorflow.contrib.slim.python.slim.data import data_provider
 from tensorflow.contrib.slim.python.slim.data import tfexample_decoder
 
 from seq2seq.configurable import Configurable
+from seq2seq.data import feature_cache
 from seq2seq.data import split_tokens_decoder, parallel_data_provider
+from seq2seq.data.bpe import BPESegmenter
 from seq2seq.data.sequence_example_decoder import TFSEquenceExampleDecoder
 
 
@@ -66,6 +69,83 @@ def make_input_pipeline_from_def(def_dict, mode, **kwargs):
   return pipeline_class(params=params, mode=mode)
 
 
+def _default_length_params():
+  """Creates default parameters used by input pipelines that read
+  source and target sequences.
+  """
+  return {
+      "source_max_len": None,
+      "target_max_len": None,
+      "source_min_len": None,
+      "target_min_len": None,
+      "filter_long_examples": False,
+  }
+
+
+def _truncate_length(params, prefix):
+  """Returns the length that sequences with the given prefix ("source" or
+  "target") are truncated to, or None if they should not be truncated.
+  """
+  if params["filter_long_examples"]:
+    return None
+  return params[prefix + "_max_len"]
+
+
+def _default_subword_params():
+  """Creates default parameters used by input pipelines that can segment
+  source and target text into subword units.
+  """
+  return {
+      "source_bpe_codes": None,
+      "target_bpe_codes": None,
+      "bpe_cache_size": 100000,
+  }
+
+
+def _make_segmenters(params):
+  """Creates the BPE segmenters for the source and target text, or None
+  for text that should not be segmented. Source and target share a
+  segmenter, and its cache, if they use the same codes file.
+
+  Returns:
+    A tuple `(source_segmenter, target_segmenter)`.
+  """
+  segmenters = {}
+  for codes_path in [params["source_bpe_codes"], params["target_bpe_codes"]]:
+    if codes_path and codes_path not in segmenters:
+      segmenters[codes_path] = BPESegmenter(
+          codes_path, cache_size=params["bpe_cache_size"])
+  return (segmenters.get(params["source_bpe_codes"]),
+          segmenters.get(params["target_bpe_codes"]))
+
+
+def _length_filter(features_and_labels, params):
+  """Creates a predicate that is true iff an example satisfies the length
+  constraints defined by `_default_length_params`.
+
+  Args:
+    features_and_labels: A dictionary of tensors for a single example.
+    params: The parameters of the input pipeline.
+
+  Returns:
+    A boolean scalar tensor, or None if all examples should be kept.
+  """
+  conditions = []
+  for prefix in ["source", "target"]:
+    length = features_and_labels.get(prefix + "_len")
+    if length is None:
+      continue
+    min_len = params[prefix + "_min_len"]
+    max_len = params[prefix + "_max_len"]
+    if min_len is not None:
+      conditions.append(length >= min_len)
+    if max_len is not None and params["filter_long_examples"]:
+      conditions.append(length <= max_len)
+  if not conditions:
+    return None
+  return tf.reduce_all(tf.stack(conditions))
+
+
 @six.add_metaclass(abc.ABCMeta)
 class InputPipeline(Configurable):
   """Abstract InputPipeline class. All input pipelines must inherit from this.
@@ -76,6 +156,9 @@ class InputPipeline(Configurable):
     shuffle: If true, shuffle the data.
     num_epochs: Number of times to iterate through the dataset. If None,
       iterate forever.
+    num_shards: Split the data into this many disjoint shards, e.g. one per
+      worker in distributed training.
+    shard_index: The shard to read, in `[0, num_shards)`.
   """
 
   def __init__(self, params, mode):
@@ -86,8 +169,24 @@ class InputPipeline(Configurable):
     return {
         "shuffle": True,
         "num_epochs": None,
+        "num_shards": 1,
+        "shard_index": 0,
     }
 
+  def _shard_files(self, files):
+    """Returns the subset of `files` read by the current shard. Pipelines
+    that can not shard individual records read all files if there are fewer
+    files than shards.
+    """
+    sharded_files = parallel_data_provider.shard_data_sources(
+        files, self.params["num_shards"], self.params["shard_index"])
+    if sharded_files is None:
+      tf.logging.warning(
+          "Can not split %s into %d shards. Reading all files.", files,
+          self.params["num_shards"])
+      return files
+    return sharded_files
+
   def make_data_provider(self, **kwargs):
     """Creates DataProvider instance for this input pipeline. Additional
     keyword arguments are passed to the DataProvider.
@@ -108,6 +207,20 @@ class InputPipeline(Configurable):
     """
     return set()
 
+  def keep_input(self, features_and_labels):
+    """Defines which examples are kept. Examples for which this returns
+    false are dropped before they are batched and padded.
+
+    Args:
+      features_and_labels: A dictionary of tensors for a single example, as
+        returned by `read_from_data_provider`.
+
+    Returns:
+      A boolean scalar tensor, or None if all examples should be kept.
+    """
+    #pylint: disable=R0201,W0613
+    return None
+
   @staticmethod
   def read_from_data_provider(data_provider):
     """Utility function to read all available items from a DataProvider.
@@ -129,6 +242,24 @@ class ParallelTextInputPipeline(InputPipeline):
       to  " " (space). For character-level training this can be set to the
       empty string.
     target_delimiter: Same as `source_delimiter` but for the target text.
+    shuffle_files: If true, reshuffle the order of the files every epoch,
+      keeping source and target files aligned. This is useful for data that
+      was sharded and shuffled using `bin/tools/shuffle_data.py`.
+    source_max_len: Optional, truncate source sequences to this many tokens,
+      including the special SEQUENCE_END token, before batching.
+    target_max_len: Same as `source_max_len` but for the target sequences,
+      including the SEQUENCE_START and SEQUENCE_END tokens.
+    source_min_len: Optional, drop examples with fewer source tokens,
+      including special tokens.
+    target_min_len: Same as `source_min_len` but for the target sequences.
+    filter_long_examples: If true, examples longer than `source_max_len`
+      or `target_max_len` are dropped instead of truncated.
+    source_bpe_codes: Optional, path to a BPE codes file generated by
+      `learn_bpe.py` of https://github.com/rsennrich/subword-nmt. If set,
+      raw source text is split into subword units while reading. Lengths
+      refer to the number of subword units.
+    target_bpe_codes: Same as `source_bpe_codes` but for the target text.
+    bpe_cache_size: The number of words whose segmentation is cached.
   """
 
   @staticmethod
@@ -139,15 +270,25 @@ class ParallelTextInputPipeline(InputPipeline):
         "target_files": [],
         "source_delimiter": " ",
         "target_delimiter": " ",
+        "shuffle_files": False,
     })
+    params.update(_default_length_params())
+    params.update(_default_subword_params())
     return params
 
+  def keep_input(self, features_and_labels):
+    return _length_filter(features_and_labels, self.params)
+
   def make_data_provider(self, **kwargs):
+    segmenter_source, segmenter_target = _make_segmenters(self.params)
+
     decoder_source = split_tokens_decoder.SplitTokensDecoder(
         tokens_feature_name="source_tokens",
         length_feature_name="source_len",
         append_token="SEQUENCE_END",
-        delimiter=self.params["source_delimiter"])
+        delimiter=self.params["source_delimiter"],
+        max_length=_truncate_length(self.params, "source"),
+        segmenter=segmenter_source)
 
     dataset_source = tf.contrib.slim.dataset.Dataset(
         data_sources=self.params["source_files"],
@@ -163,7 +304,9 @@ class ParallelTextInputPipeline(InputPipeline):
           length_feature_name="target_len",
           prepend_token="SEQUENCE_START",
           append_token="SEQUENCE_END",
-          delimiter=self.params["target_delimiter"])
+          delimiter=self.params["target_delimiter"],
+          max_length=_truncate_length(self.params, "target"),
+          segmenter=segmenter_target)
 
       dataset_target = tf.contrib.slim.dataset.Dataset(
           data_sources=self.params["target_files"],
@@ -177,6 +320,9 @@ class ParallelTextInputPipeline(InputPipeline):
         dataset2=dataset_target,
         shuffle=self.params["shuffle"],
         num_epochs=self.params["num_epochs"],
+        num_shards=self.params["num_shards"],
+        shard_index=self.params["shard_index"],
+        shuffle_files=self.params["shuffle_files"],
         **kwargs)
 
   @property
@@ -200,6 +346,21 @@ class TFRecordInputPipeline(InputPipeline):
       to  " " (space). For character-level training this can be set to the
       empty string.
     target_delimiter: Same as `source_delimiter` but for the target text.
+    source_max_len: Optional, truncate source sequences to this many tokens,
+      including the special SEQUENCE_END token, before batching.
+    target_max_len: Same as `source_max_len` but for the target sequences,
+      including the SEQUENCE_START and SEQUENCE_END tokens.
+    source_min_len: Optional, drop examples with fewer source tokens,
+      including special tokens.
+    target_min_len: Same as `source_min_len` but for the target sequences.
+    filter_long_examples: If true, examples longer than `source_max_len`
+      or `target_max_len` are dropped instead of truncated.
+    source_bpe_codes: Optional, path to a BPE codes file generated by
+      `learn_bpe.py` of https://github.com/rsennrich/subword-nmt. If set,
+      raw source text is split into subword units while reading. Lengths
+      refer to the number of subword units.
+    target_bpe_codes: Same as `source_bpe_codes` but for the target text.
+    bpe_cache_size: The number of words whose segmentation is cached.
   """
 
   @staticmethod
@@ -212,22 +373,32 @@ class TFRecordInputPipeline(InputPipeline):
         "source_delimiter": " ",
         "target_delimiter": " ",
     })
+    params.update(_default_length_params())
+    params.update(_default_subword_params())
     return params
 
+  def keep_input(self, features_and_labels):
+    return _length_filter(features_and_labels, self.params)
+
   def make_data_provider(self, **kwargs):
+    segmenter_source, segmenter_target = _make_segmenters(self.params)
 
     splitter_source = split_tokens_decoder.SplitTokensDecoder(
         tokens_feature_name="source_tokens",
         length_feature_name="source_len",
         append_token="SEQUENCE_END",
-        delimiter=self.params["source_delimiter"])
+        delimiter=self.params["source_delimiter"],
+        max_length=_truncate_length(self.params, "source"),
+        segmenter=segmenter_source)
 
     splitter_target = split_tokens_decoder.SplitTokensDecoder(
         tokens_feature_name="target_tokens",
         length_feature_name="target_len",
         prepend_token="SEQUENCE_START",
         append_token="SEQUENCE_END",
-        delimiter=self.params["target_delimiter"])
+        delimiter=self.params["target_delimiter"],
+        max_length=_truncate_length(self.params, "target"),
+        segmenter=segmenter_target)
 
     keys_to_features = {
         self.params["source_field"]: tf.FixedLenFeature((), tf.string),
@@ -257,7 +428,7 @@ class TFRecordInputPipeline(InputPipeline):
                                                  items_to_handlers)
 
     dataset = tf.contrib.slim.dataset.Dataset(
-        data_sources=self.params["files"],
+        data_sources=self._shard_files(self.params["files"]),
         reader=tf.TFRecordReader,
         decoder=decoder,
         num_samples=None,
@@ -279,19 +450,32 @@ class TFRecordInputPipeline(InputPipeline):
 
 
 class ImageCaptioningInputPipeline(InputPipeline):
-  """An input pipeline that reads a TFRecords containing both source
-  and target sequences.
+  """An input pipeline that reads a TFRecords containing images and
+  their captions.
 
   Params:
     files: An array of file names to read from.
-    source_field: The TFRecord feature field containing the source text.
-    target_field: The TFRecord feature field containing the target text.
-    source_delimiter: A character to split the source text on. Defaults
-      to  " " (space). For character-level training this can be set to the
-      empty string.
-    target_delimiter: Same as `source_delimiter` but for the target text.
+    image_field: The TFRecord feature field containing the encoded image.
+    image_format: The default format of the encoded images.
+    caption_ids_field: The TFRecord feature field containing the caption ids.
+    caption_tokens_field: The TFRecord feature field containing the
+      caption tokens.
+    image_height: Optional, resize images to this height while reading.
+      Requires `image_width`.
+    image_width: Optional, resize images to this width while reading.
+    num_decode_threads: The number of threads that decode and resize images
+      in parallel.
+    cache_dir: Optional, read examples from a feature cache created by
+      `bin/tools/cache_image_features.py` instead of the TFRecords.
+      The cache can contain resized images, or precomputed
+      `image_features` and `image_final_state` to be used with the
+      `PrecomputedImageEncoder`.
   """
 
+  def __init__(self, params, mode):
+    super(ImageCaptioningInputPipeline, self).__init__(params, mode)
+    self._cache = None
+
   @staticmethod
   def default_params():
     params = InputPipeline.default_params()
@@ -301,10 +485,60 @@ class ImageCaptioningInputPipeline(InputPipeline):
         "image_format": "jpg",
         "caption_ids_field": "image/caption_ids",
         "caption_tokens_field": "image/caption",
+        "image_height": None,
+        "image_width": None,
+        "num_decode_threads": 1,
+        "cache_dir": None,
     })
     return params
 
+  def _get_cache(self):
+    """Reads the feature cache metadata when it is first accessed."""
+    if self._cache is None:
+      self._cache = feature_cache.FeatureCache(self.params["cache_dir"])
+    return self._cache
+
+  def _resize_image(self, image):
+    """Resizes a decoded image to the configured size."""
+    if self.params["image_height"] is None:
+      return image
+    image.set_shape([None, None, 3])
+    image = tf.image.resize_images(
+        images=image,
+        size=[self.params["image_height"], self.params["image_width"]],
+        method=tf.image.ResizeMethod.BILINEAR)
+    return tf.saturate_cast(image, tf.uint8)
+
+  def _decode_in_parallel(self, items_to_tensors):
+    """Runs the ops that produce `items_to_tensors`, i.e. reading, decoding
+    and resizing, in `num_decode_threads` threads. Returns a dictionary of
+    tensors with the same keys that are dequeued from a buffer.
+    """
+    keys = sorted(items_to_tensors.keys())
+    tensors = [items_to_tensors[k] for k in keys]
+    queue = tf.PaddingFIFOQueue(
+        capacity=16 * self.params["num_decode_threads"],
+        dtypes=[_.dtype for _ in tensors],
+        shapes=[_.get_shape() for _ in tensors],
+        name="decode_queue")
+    enqueue_op = queue.enqueue(tensors)
+    tf.train.add_queue_runner(
+        tf.train.QueueRunner(queue,
+                             [enqueue_op] * self.params["num_decode_threads"]))
+    dequeued = queue.dequeue()
+    for tensor, dequeued_tensor in zip(tensors, dequeued):
+      dequeued_tensor.set_shape(tensor.get_shape())
+    return dict(zip(keys, dequeued))
+
   def make_data_provider(self, **kwargs):
+    if self.params["cache_dir"]:
+      return feature_cache.FeatureCacheDataProvider(
+          cache=self._get_cache(),
+          shuffle=self.params["shuffle"],
+          num_epochs=self.params["num_epochs"],
+          num_shards=self.params["num_shards"],
+          shard_index=self.params["shard_index"],
+          **kwargs)
 
     context_keys_to_features = {
         self.params["image_field"]: tf.FixedLenFeature(
@@ -338,20 +572,36 @@ class ImageCaptioningInputPipeline(InputPipeline):
         context_keys_to_features, sequence_keys_to_features, items_to_handlers)
 
     dataset = tf.contrib.slim.dataset.Dataset(
-        data_sources=self.params["files"],
+        data_sources=self._shard_files(self.params["files"]),
         reader=tf.TFRecordReader,
         decoder=decoder,
         num_samples=None,
         items_to_descriptions={})
 
-    return tf.contrib.slim.dataset_data_provider.DatasetDataProvider(
+    dataset_provider = \
+      tf.contrib.slim.dataset_data_provider.DatasetDataProvider(
         dataset=dataset,
         shuffle=self.params["shuffle"],
         num_epochs=self.params["num_epochs"],
         **kwargs)
 
+    if (self.params["image_height"] is None and
+        self.params["num_decode_threads"] <= 1):
+      return dataset_provider
+
+    items_to_tensors = self.read_from_data_provider(dataset_provider)
+    items_to_tensors["image"] = self._resize_image(items_to_tensors["image"])
+    if self.params["num_decode_threads"] > 1:
+      items_to_tensors = self._decode_in_parallel(items_to_tensors)
+    return data_provider.DataProvider(
+        items_to_tensors=items_to_tensors,
+        num_samples=dataset_provider.num_samples())
+
   @property
   def feature_keys(self):
+    if self.params["cache_dir"]:
+      if "image_features" in self._get_cache().items:
+        return set(["image_features", "image_final_state"])
     return set(["image"])
 
   @property
@@ -34,6 +34,8 @@ def make_parallel_data_provider(data_sources_source,
                                 num_samples=None,
                                 source_delimiter=" ",
                                 target_delimiter=" ",
+                                source_max_len=None,
+                                target_max_len=None,
                                 **kwargs):
   """Creates a DataProvider that reads parallel text data.
 
@@ -43,6 +45,10 @@ def make_parallel_data_provider(data_sources_source,
       Can be None for inference mode.
     num_samples: Optional, number of records in the dataset
     delimiter: Split tokens in the data on this delimiter. Defaults to space.
+    source_max_len: Optional, truncate source sequences to this many tokens,
+      including special tokens.
+    target_max_len: Optional, truncate target sequences to this many tokens,
+      including special tokens.
     kwargs: Additional arguments (shuffle, num_epochs, etc) that are passed
       to the data provider
 
@@ -54,7 +60,8 @@ def make_parallel_data_provider(data_sources_source,
       tokens_feature_name="source_tokens",
       length_feature_name="source_len",
       append_token="SEQUENCE_END",
-      delimiter=source_delimiter)
+      delimiter=source_delimiter,
+      max_length=source_max_len)
 
   dataset_source = tf.contrib.slim.dataset.Dataset(
       data_sources=data_sources_source,
@@ -70,7 +77,8 @@ def make_parallel_data_provider(data_sources_source,
         length_feature_name="target_len",
         prepend_token="SEQUENCE_START",
         append_token="SEQUENCE_END",
-        delimiter=target_delimiter)
+        delimiter=target_delimiter,
+        max_length=target_max_len)
 
     dataset_target = tf.contrib.slim.dataset.Dataset(
         data_sources=data_sources_target,
@@ -83,6 +91,94 @@ def make_parallel_data_provider(data_sources_source,
       dataset1=dataset_source, dataset2=dataset_target, **kwargs)
 
 
+def shard_data_sources(data_sources, num_shards, shard_index):
+  """Assigns a disjoint subset of files to each shard.
+
+  Args:
+    data_sources: A list of file names or file patterns.
+    num_shards: The total number of shards, e.g. the number of workers.
+    shard_index: The index of the current shard.
+
+  Returns:
+    The list of files for the current shard, or None if there are fewer files
+    than shards and the data must be sharded on a per-record basis instead.
+  """
+  if shard_index < 0 or shard_index >= num_shards:
+    raise ValueError("Invalid shard index {} for {} shards".format(
+        shard_index, num_shards))
+  if num_shards == 1:
+    return data_sources
+  # Sort files so that all workers agree on the assignment
+  data_files = sorted(parallel_reader.get_data_files(data_sources))
+  if len(data_files) < num_shards:
+    return None
+  return data_files[shard_index::num_shards]
+
+
+def shard_parallel_data_sources(data_sources1, data_sources2, num_shards,
+                                shard_index):
+  """Assigns a disjoint subset of aligned file pairs to each shard. The i-th
+  file of `data_sources1` is aligned with the i-th file of `data_sources2`.
+  The pairs are sorted by the first file name, so that all workers agree on
+  the assignment and each shard keeps the pairs aligned.
+
+  Args:
+    data_sources1: A list of file names or file patterns.
+    data_sources2: A list of file names or file patterns with the same
+      number of files as `data_sources1`.
+    num_shards: The total number of shards, e.g. the number of workers.
+    shard_index: The index of the current shard.
+
+  Returns:
+    A tuple of the file lists for the current shard, or `(None, None)` if
+    there are fewer files than shards and the data must be sharded on a
+    per-record basis instead.
+  """
+  if shard_index < 0 or shard_index >= num_shards:
+    raise ValueError("Invalid shard index {} for {} shards".format(
+        shard_index, num_shards))
+  if num_shards == 1:
+    return data_sources1, data_sources2
+  data_files1 = parallel_reader.get_data_files(data_sources1)
+  data_files2 = parallel_reader.get_data_files(data_sources2)
+  if len(data_files1) != len(data_files2):
+    raise ValueError("Can not align {} files with {} files".format(
+        len(data_files1), len(data_files2)))
+  if len(data_files1) < num_shards:
+    return None, None
+  pairs = sorted(zip(data_files1, data_files2))[shard_index::num_shards]
+  return [_[0] for _ in pairs], [_[1] for _ in pairs]
+
+
+def _read_records(data_sources, reader_class, num_epochs, shuffle_files,
+                  capacity, min_after_dequeue, seed):
+  """Reads records from the given data sources in order. If `shuffle_files`
+  is true the order of files is reshuffled every epoch. Calls with the same
+  seed and files produce the same file order.
+
+  Returns:
+    A tuple `(key, value)` of string tensors.
+  """
+  if not shuffle_files:
+    return parallel_reader.parallel_read(
+        data_sources,
+        reader_class=reader_class,
+        num_epochs=num_epochs,
+        num_readers=1,
+        shuffle=False,
+        capacity=capacity,
+        min_after_dequeue=min_after_dequeue,
+        seed=seed)
+
+  filename_queue = tf.train.string_input_producer(
+      parallel_reader.get_data_files(data_sources),
+      num_epochs=num_epochs,
+      shuffle=True,
+      seed=seed,
+      name="filenames")
+  return reader_class().read(filename_queue)
+
+
 class ParallelDataProvider(data_provider.DataProvider):
   """Creates a ParallelDataProvider. This data provider reads two datasets
   in parallel, keeping them aligned.
@@ -100,6 +196,15 @@ class ParallelDataProvider(data_provider.DataProvider):
     common_queue_min: The minimum number of elements in the common queue after
       a dequeue.
     seed: The seed to use if shuffling.
+    num_shards: The number of shards to split the data into. Each shard
+      reads a disjoint subset of the data. If there are at least as many
+      files as shards the files are split, otherwise records are assigned
+      to shards based on a hash of their key.
+    shard_index: The shard this data provider reads.
+    shuffle_files: If true, reshuffle the order of the data files every
+      epoch. Source and target files are shuffled in the same order. Use this
+      with files written by `bin/tools/shuffle_data.py` to get a global
+      shuffle without holding the data in memory.
   """
 
   def __init__(self,
@@ -109,45 +214,79 @@ class ParallelDataProvider(data_provider.DataProvider):
                num_epochs=None,
                common_queue_capacity=4096,
                common_queue_min=1024,
-               seed=None):
+               seed=None,
+               num_shards=1,
+               shard_index=0,
+               shuffle_files=False):
 
     if seed is None:
       seed = np.random.randint(10e8)
 
-    _, data_source = parallel_reader.parallel_read(
-        dataset1.data_sources,
+    data_sources2 = None
+    if dataset2 is None:
+      data_sources1 = shard_data_sources(
+          dataset1.data_sources, num_shards, shard_index)
+    else:
+      data_sources1, data_sources2 = shard_parallel_data_sources(
+          dataset1.data_sources, dataset2.data_sources, num_shards,
+          shard_index)
+
+    # Fall back to sharding individual records if there are too few files
+    shard_records = data_sources1 is None
+    if shard_records:
+      tf.logging.info("Sharding records of %s into %d shards.",
+                      dataset1.data_sources, num_shards)
+      data_sources1 = dataset1.data_sources
+      if dataset2 is not None:
+        data_sources2 = dataset2.data_sources
+
+    key_source, data_source = _read_records(
+        data_sources1,
         reader_class=dataset1.reader,
         num_epochs=num_epochs,
-        num_readers=1,
-        shuffle=False,
+        shuffle_files=shuffle_files,
         capacity=common_queue_capacity,
         min_after_dequeue=common_queue_min,
         seed=seed)
 
     data_target = ""
     if dataset2 is not None:
-      _, data_target = parallel_reader.parallel_read(
-          dataset2.data_sources,
+      _, data_target = _read_records(
+          data_sources2,
           reader_class=dataset2.reader,
           num_epochs=num_epochs,
-          num_readers=1,
-          shuffle=False,
+          shuffle_files=shuffle_files,
           capacity=common_queue_capacity,
           min_after_dequeue=common_queue_min,
           seed=seed)
 
-    # Optionally shuffle the data
-    if shuffle:
-      shuffle_queue = tf.RandomShuffleQueue(
-          capacity=common_queue_capacity,
-          min_after_dequeue=common_queue_min,
-          dtypes=[tf.string, tf.string],
-          seed=seed)
+    # Optionally shuffle the data and drop records of other shards
+    if shuffle or shard_records:
+      if shuffle:
+        queue = tf.RandomShuffleQueue(
+            capacity=common_queue_capacity,
+            min_after_dequeue=common_queue_min,
+            dtypes=[tf.string, tf.string],
+            seed=seed)
+      else:
+        queue = tf.FIFOQueue(
+            capacity=common_queue_capacity, dtypes=[tf.string, tf.string])
       enqueue_ops = []
-      enqueue_ops.append(shuffle_queue.enqueue([data_source, data_target]))
-      tf.train.add_queue_runner(
-          tf.train.QueueRunner(shuffle_queue, enqueue_ops))
-      data_source, data_target = shuffle_queue.dequeue()
+      if shard_records:
+        # Record keys are unique, so hashing them assigns each record to
+        # exactly one shard. An empty batch enqueues nothing.
+        keep = tf.equal(
+            tf.string_to_hash_bucket_fast(key_source, num_shards),
+            shard_index)
+        keep = tf.expand_dims(keep, 0)
+        enqueue_ops.append(queue.enqueue_many([
+            tf.boolean_mask(tf.expand_dims(data_source, 0), keep),
+            tf.boolean_mask(tf.expand_dims(data_target, 0), keep)
+        ]))
+      else:
+        enqueue_ops.append(queue.enqueue([data_source, data_target]))
+      tf.train.add_queue_runner(tf.train.QueueRunner(queue, enqueue_ops))
+      data_source, data_target = queue.dequeue()
 
     # Decode source items
     items = dataset1.decoder.list_items()
@@ -33,6 +33,13 @@ class SplitTokensDecoder(data_decoder.DataDecoder):
     delimiter: Delimiter to split on. Must be a single character.
     tokens_feature_name: A descriptive feature name for the token values
     length_feature_name: A descriptive feature name for the length value
+    prepend_token: Optional, a special token to prepend.
+    append_token: Optional, a special token to append.
+    max_length: Optional, the maximum number of tokens to return, including
+      the special tokens. Tokens are truncated before the special tokens are
+      added so that the prepended and appended tokens are always kept.
+    segmenter: Optional, a `seq2seq.data.bpe.BPESegmenter` used to split
+      the tokens into subword units before truncation.
   """
 
   def __init__(self,
@@ -40,12 +47,16 @@ class SplitTokensDecoder(data_decoder.DataDecoder):
                tokens_feature_name="tokens",
                length_feature_name="length",
                prepend_token=None,
-               append_token=None):
+               append_token=None,
+               max_length=None,
+               segmenter=None):
     self.delimiter = delimiter
     self.tokens_feature_name = tokens_feature_name
     self.length_feature_name = length_feature_name
     self.prepend_token = prepend_token
     self.append_token = append_token
+    self.max_length = max_length
+    self.segmenter = segmenter
 
   def decode(self, data, items):
     decoded_items = {}
@@ -53,6 +64,16 @@ class SplitTokensDecoder(data_decoder.DataDecoder):
     # Split tokens
     tokens = tf.string_split([data], delimiter=self.delimiter).values
 
+    # Optionally split tokens into subword units
+    if self.segmenter is not None:
+      tokens = self.segmenter.segment_tokens(tokens)
+
+    # Optionally truncate, leaving room for the special tokens
+    if self.max_length is not None:
+      num_special = sum(1 for _ in [self.prepend_token, self.append_token]
+                        if _ is not None)
+      tokens = tokens[:max(self.max_length - num_special, 0)]
+
     # Optionally prepend a special token
     if self.prepend_token is not None:
       tokens = tf.concat([[self.prepend_token], tokens], 0)
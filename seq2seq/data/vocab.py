@@ -19,9 +19,19 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import json
+import os
+import weakref
+
 import tensorflow as tf
 from tensorflow import gfile
 
+VOCAB_INFO_FILENAME = "vocab_info.json"
+VOCAB_TABLE_FILENAME = "vocab.tsv"
+
+# Lookup tables that have been created, per graph and vocabulary file
+_TABLE_CACHE = weakref.WeakKeyDictionary()
+
 SpecialVocab = collections.namedtuple("SpecialVocab",
                                       ["UNK", "SEQUENCE_START", "SEQUENCE_END"])
 
@@ -38,18 +48,31 @@ class VocabInfo(
     return self.vocab_size + len(self.special_vocab)
 
 
+def is_compiled_vocab(vocab_path):
+  """Returns true iff `vocab_path` is a vocabulary directory created by
+  `compile_vocabulary`.
+  """
+  return gfile.IsDirectory(vocab_path) and gfile.Exists(
+      os.path.join(vocab_path, VOCAB_INFO_FILENAME))
+
+
 def get_vocab_info(vocab_path):
   """Creates a `VocabInfo` instance that contains the vocabulary size and
     the special vocabulary for the given file.
 
   Args:
-    vocab_path: Path to a vocabulary file with one word per line.
+    vocab_path: Path to a vocabulary file with one word per line, or to
+      a directory created by `compile_vocabulary`.
 
   Returns:
     A VocabInfo tuple.
   """
-  with gfile.GFile(vocab_path) as file:
-    vocab_size = sum(1 for _ in file)
+  if is_compiled_vocab(vocab_path):
+    with gfile.GFile(os.path.join(vocab_path, VOCAB_INFO_FILENAME)) as file:
+      vocab_size = json.loads(file.read())["vocab_size"]
+  else:
+    with gfile.GFile(vocab_path) as file:
+      vocab_size = sum(1 for _ in file)
   special_vocab = get_special_vocab(vocab_size)
   return VocabInfo(vocab_path, vocab_size, special_vocab)
 
@@ -60,27 +83,18 @@ def get_special_vocab(vocabulary_size):
   return SpecialVocab(*range(vocabulary_size, vocabulary_size + 3))
 
 
-def create_vocabulary_lookup_table(filename, default_value=None):
-  """Creates a lookup table for a vocabulary file.
+def _load_vocabulary(filename):
+  """Loads a vocabulary file into memory.
 
-  Args:
-    filename: Path to a vocabulary file containg one word per line.
-      Each word is mapped to its line number.
-    default_value: UNK tokens will be mapped to this id.
-      If None, UNK tokens will be mapped to [vocab_size]
-
-    Returns:
-      A tuple (vocab_to_id_table, id_to_vocab_table,
-      word_to_count_table, vocab_size). The vocab size does not include
-      the UNK token.
-    """
+  Returns:
+    A tuple `(vocab, counts)` of lists. Counts are -1 if the file
+    does not contain counts.
+  """
   if not gfile.Exists(filename):
     raise ValueError("File does not exist: {}".format(filename))
 
-  # Load vocabulary into memory
   with gfile.GFile(filename) as file:
     vocab = list(line.strip("\n") for line in file)
-  vocab_size = len(vocab)
 
   has_counts = len(vocab[0].split("\t")) == 2
   if has_counts:
@@ -89,21 +103,75 @@ def create_vocabulary_lookup_table(filename, default_value=None):
     vocab = list(vocab)
   else:
     counts = [-1. for _ in vocab]
+  return vocab, counts
 
-  # Add special vocabulary items
-  special_vocab = get_special_vocab(vocab_size)
-  vocab += list(special_vocab._fields)
-  vocab_size += len(special_vocab)
-  counts += [-1. for _ in list(special_vocab._fields)]
 
-  if default_value is None:
-    default_value = special_vocab.UNK
+def compile_vocabulary(vocab_path, output_dir):
+  """Compiles a vocabulary file into a directory that can be loaded without
+  reading the full vocabulary. The directory contains:
+
+  - `vocab_info.json`: The vocabulary size and special vocabulary ids.
+  - `vocab.tsv`: One `word<TAB>count` line per id, including the special
+    vocabulary. Lookup tables are initialized from this file at session
+    creation, which keeps the vocabulary out of the `GraphDef`.
+
+  Args:
+    vocab_path: Path to a vocabulary file with one word per line,
+      optionally followed by a tab and the word count.
+    output_dir: The directory to write the compiled vocabulary to.
+      Pass this directory in place of the vocabulary file.
+  """
+  vocab, counts = _load_vocabulary(vocab_path)
+  special_vocab = get_special_vocab(len(vocab))
+
+  gfile.MakeDirs(output_dir)
+  with gfile.GFile(os.path.join(output_dir, VOCAB_TABLE_FILENAME), "wb") as file:
+    all_words = vocab + list(special_vocab._fields)
+    all_counts = counts + [-1. for _ in special_vocab._fields]
+    for word, count in zip(all_words, all_counts):
+      file.write(tf.compat.as_bytes("{}\t{}\n".format(word, count)))
+
+  vocab_info = {
+      "vocab_size": len(vocab),
+      "special_vocab": dict(special_vocab._asdict()),
+  }
+  with gfile.GFile(os.path.join(output_dir, VOCAB_INFO_FILENAME), "wb") as file:
+    file.write(tf.compat.as_bytes(json.dumps(vocab_info)))
+
+
+def _create_tables_from_file(vocab_dir, vocab_size, default_value):
+  """Creates lookup tables that are initialized from a compiled vocabulary
+  when the session is created.
+  """
+  table_path = os.path.join(vocab_dir, VOCAB_TABLE_FILENAME)
+  line_number = tf.contrib.lookup.TextFileIndex.LINE_NUMBER
+
+  id_to_vocab_init = tf.contrib.lookup.TextFileInitializer(
+      table_path, tf.int64, line_number, tf.string, 0,
+      vocab_size=vocab_size, delimiter="\t")
+  id_to_vocab_table = tf.contrib.lookup.HashTable(id_to_vocab_init, "UNK")
+
+  vocab_to_id_init = tf.contrib.lookup.TextFileInitializer(
+      table_path, tf.string, 0, tf.int64, line_number,
+      vocab_size=vocab_size, delimiter="\t")
+  vocab_to_id_table = tf.contrib.lookup.HashTable(vocab_to_id_init,
+                                                  default_value)
+
+  word_to_count_init = tf.contrib.lookup.TextFileInitializer(
+      table_path, tf.string, 0, tf.float32, 1,
+      vocab_size=vocab_size, delimiter="\t")
+  word_to_count_table = tf.contrib.lookup.HashTable(word_to_count_init, -1)
+
+  return vocab_to_id_table, id_to_vocab_table, word_to_count_table
 
-  tf.logging.info("Creating vocabulary lookup table of size %d", vocab_size)
 
+def _create_tables_from_constants(vocab, counts, default_value):
+  """Creates lookup tables that are initialized from constants embedded
+  in the graph.
+  """
   vocab_tensor = tf.constant(vocab)
   count_tensor = tf.constant(counts, dtype=tf.float32)
-  vocab_idx_tensor = tf.range(vocab_size, dtype=tf.int64)
+  vocab_idx_tensor = tf.range(len(vocab), dtype=tf.int64)
 
   # Create ID -> word mapping
   id_to_vocab_init = tf.contrib.lookup.KeyValueTensorInitializer(
@@ -121,4 +189,56 @@ def create_vocabulary_lookup_table(filename, default_value=None):
       vocab_tensor, count_tensor, tf.string, tf.float32)
   word_to_count_table = tf.contrib.lookup.HashTable(word_to_count_init, -1)
 
-  return vocab_to_id_table, id_to_vocab_table, word_to_count_table, vocab_size
+  return vocab_to_id_table, id_to_vocab_table, word_to_count_table
+
+
+def create_vocabulary_lookup_table(filename, default_value=None):
+  """Creates a lookup table for a vocabulary file. Tables are shared within
+  a graph, so calling this function again for the same file returns the
+  existing tables.
+
+  Args:
+    filename: Path to a vocabulary file containg one word per line.
+      Each word is mapped to its line number. Can also be a directory
+      created by `compile_vocabulary`, in which case the vocabulary
+      is not embedded in the graph.
+    default_value: UNK tokens will be mapped to this id.
+      If None, UNK tokens will be mapped to [vocab_size]
+
+    Returns:
+      A tuple (vocab_to_id_table, id_to_vocab_table,
+      word_to_count_table, vocab_size). The vocab size does not include
+      the UNK token.
+    """
+  graph_tables = _TABLE_CACHE.setdefault(tf.get_default_graph(), {})
+  cache_key = (filename, default_value)
+  if cache_key in graph_tables:
+    return graph_tables[cache_key]
+
+  if is_compiled_vocab(filename):
+    vocab_info = get_vocab_info(filename)
+    special_vocab = vocab_info.special_vocab
+    vocab_size = vocab_info.total_size
+    if default_value is None:
+      default_value = special_vocab.UNK
+    tf.logging.info("Creating vocabulary lookup table of size %d from %s",
+                    vocab_size, filename)
+    tables = _create_tables_from_file(filename, vocab_size, default_value)
+  else:
+    # Load vocabulary into memory
+    vocab, counts = _load_vocabulary(filename)
+
+    # Add special vocabulary items
+    special_vocab = get_special_vocab(len(vocab))
+    vocab += list(special_vocab._fields)
+    counts += [-1. for _ in list(special_vocab._fields)]
+    vocab_size = len(vocab)
+
+    if default_value is None:
+      default_value = special_vocab.UNK
+
+    tf.logging.info("Creating vocabulary lookup table of size %d", vocab_size)
+    tables = _create_tables_from_constants(vocab, counts, default_value)
+
+  graph_tables[cache_key] = tables + (vocab_size,)
+  return graph_tables[cache_key]
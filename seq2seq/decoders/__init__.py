@@ -18,3 +18,4 @@ from seq2seq.decoders.rnn_decoder import *
 from seq2seq.decoders.attention import *
 from seq2seq.decoders.basic_decoder import *
 from seq2seq.decoders.attention_decoder import *
+from seq2seq.decoders.transformer_decoder import TransformerDecoder
@@ -20,6 +20,8 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import abc
+from collections import namedtuple
+
 import six
 
 import tensorflow as tf
@@ -46,11 +48,32 @@ def att_sum_dot(keys, query):
   return tf.reduce_sum(keys * tf.expand_dims(query, 1), [2])
 
 
+class AttentionMemory(
+    namedtuple("AttentionMemory",
+               ["keys", "values", "values_length", "scores_mask"])):
+  """The parts of an attention layer that do not depend on the query.
+
+  Args:
+    keys: The projected keys, a tensor of shape `[B, T, num_units]`.
+    values: The elements to compute attention over, a tensor of shape
+      `[B, T, input_dim]`.
+    values_length: The sequence length of the values, a tensor of shape
+      `[B]`.
+    scores_mask: A float tensor of shape `[B, T]` that is 1 for valid
+      and 0 for padded positions.
+  """
+  pass
+
+
 @six.add_metaclass(abc.ABCMeta)
 class AttentionLayer(GraphModule, Configurable):
   """
   Attention layer according to https://arxiv.org/abs/1409.0473.
 
+  The key projection and the score mask are independent of the query. When
+  the layer is called once per decoding step, compute them once with
+  `prepare_memory` and pass the result as `memory` to every call.
+
   Params:
     num_units: Number of units used in the attention layer
   """
@@ -58,6 +81,7 @@ class AttentionLayer(GraphModule, Configurable):
   def __init__(self, params, mode, name="attention"):
     GraphModule.__init__(self, name)
     Configurable.__init__(self, params, mode)
+    self._memory_variables_created = False
 
   @staticmethod
   def default_params():
@@ -68,7 +92,42 @@ class AttentionLayer(GraphModule, Configurable):
     """Computes the attention score"""
     raise NotImplementedError
 
-  def _build(self, query, keys, values, values_length):
+  def prepare_memory(self, keys, values, values_length):
+    """Computes the query-independent parts of the attention.
+
+    Args:
+      keys: The keys used to calculate attention scores, a tensor of shape
+        `[B, T, ...]`.
+      values: The elements to compute attention over, a tensor of shape
+        `[B, T, input_dim]`.
+      values_length: An int32 tensor of shape `[B]` defining the sequence
+        length of the attention values.
+
+    Returns:
+      An `AttentionMemory` tuple.
+    """
+    # Share the key projection with calls that do not pass a memory
+    reuse = True if self._memory_variables_created else None
+    with tf.variable_scope(self._template.variable_scope, reuse=reuse):
+      att_keys = tf.contrib.layers.fully_connected(
+          inputs=keys,
+          num_outputs=self.params["num_units"],
+          activation_fn=None,
+          scope="att_keys")
+    self._memory_variables_created = True
+
+    scores_mask = tf.sequence_mask(
+        lengths=tf.to_int32(values_length),
+        maxlen=tf.shape(att_keys)[1],
+        dtype=tf.float32)
+    return AttentionMemory(
+        keys=att_keys,
+        values=values,
+        values_length=values_length,
+        scores_mask=scores_mask)
+
+  def _build(self, query, keys, values, values_length, memory=None,
+             time=None):
     """Computes attention scores and outputs.
 
     Args:
@@ -84,6 +143,10 @@ class AttentionLayer(GraphModule, Configurable):
         A tensor of shape `[B, T, input_dim]`.
       values_length: An int32 tensor of shape `[B]` defining the sequence
         length of the attention values.
+      memory: Optional, the result of `prepare_memory` for `keys`, `values`
+        and `values_length`. If None, it is computed in this call.
+      time: Optional, the current decoding step. Only used by layers that
+        attend to a window that moves with the decoding step.
 
     Returns:
       A tuple `(scores, context)`.
@@ -93,29 +156,23 @@ class AttentionLayer(GraphModule, Configurable):
       the weighted inputs.
       A tensor fo shape `[B, input_dim]`.
     """
+    if memory is None:
+      memory = self.prepare_memory(keys, values, values_length)
+    values = memory.values
     values_depth = values.get_shape().as_list()[-1]
 
-    # Fully connected layers to transform both keys and query
-    # into a tensor with `num_units` units
-    att_keys = tf.contrib.layers.fully_connected(
-        inputs=keys,
-        num_outputs=self.params["num_units"],
-        activation_fn=None,
-        scope="att_keys")
+    # Fully connected layer to transform the query into a tensor with
+    # `num_units` units. The keys are transformed in `prepare_memory`.
     att_query = tf.contrib.layers.fully_connected(
         inputs=query,
         num_outputs=self.params["num_units"],
         activation_fn=None,
         scope="att_query")
 
-    scores = self.score_fn(att_keys, att_query)
+    scores = self.score_fn(memory.keys, att_query)
 
     # Replace all scores for padded inputs with tf.float32.min
-    num_scores = tf.shape(scores)[1]
-    scores_mask = tf.sequence_mask(
-        lengths=tf.to_int32(values_length),
-        maxlen=tf.to_int32(num_scores),
-        dtype=tf.float32)
+    scores_mask = memory.scores_mask
     scores = scores * scores_mask + ((1.0 - scores_mask) * tf.float32.min)
 
     # Normalize the scores
@@ -127,7 +184,6 @@ class AttentionLayer(GraphModule, Configurable):
     context = tf.reduce_sum(context, 1, name="context")
     context.set_shape([None, values_depth])
 
-
     return (scores_normalized, context)
 
 
@@ -148,3 +204,159 @@ class AttentionLayerBahdanau(AttentionLayer):
     v_att = tf.get_variable(
         "v_att", shape=[self.params["num_units"]], dtype=tf.float32)
     return att_sum_bahdanau(v_att, keys, query)
+
+
+class AttentionLayerLocal(AttentionLayerBahdanau):
+  """Local attention according to https://arxiv.org/abs/1508.04025.
+
+  Each decoding step attends only to a window of `2 * window_width + 1`
+  encoder states around a center position, so the cost of a step does not
+  depend on the length of the source sequence. Within the window, scores
+  are computed as in `AttentionLayerBahdanau`. The returned scores are
+  zero outside of the window.
+
+  Params:
+    num_units: Number of units used in the attention layer
+    window_width: The number of encoder states attended to on each side
+      of the window center.
+    window_center: How the window center is chosen. "predicted" predicts
+      the center from the query and weights the scores with a Gaussian
+      around it (local-p). "fixed" places it at `time * window_stride`
+      (local-m).
+    window_stride: The number of source positions the window advances per
+      decoding step if the center is fixed. Should be set to the ratio of
+      source to target length, e.g. 1 for translation.
+  """
+
+  @staticmethod
+  def default_params():
+    return {
+        "num_units": 128,
+        "window_width": 16,
+        "window_center": "predicted",
+        "window_stride": 1.0
+    }
+
+  def _predict_position(self, query):
+    """Predicts a value in [-1, 1] from the query."""
+    hidden = tf.contrib.layers.fully_connected(
+        inputs=query,
+        num_outputs=self.params["num_units"],
+        activation_fn=tf.nn.tanh,
+        scope="window_position")
+    position = tf.contrib.layers.fully_connected(
+        inputs=hidden,
+        num_outputs=1,
+        activation_fn=tf.nn.tanh,
+        scope="window_position_out")
+    return tf.squeeze(position, [1])
+
+  def _fixed_center(self, memory, time):
+    """Returns the center that moves with the decoding step."""
+    if time is None:
+      raise ValueError("A window that moves with the decoding step requires "
+                       "the time argument")
+    last_position = tf.to_float(memory.values_length) - 1.0
+    return tf.minimum(
+        tf.to_float(time) * self.params["window_stride"], last_position)
+
+  def window_center(self, query, memory, time):
+    """Computes the window center for each query.
+
+    Returns:
+      A tuple `(center, predicted)`. `center` is a float tensor of shape
+      `[B]`. `predicted` is true if the scores should be weighted with a
+      Gaussian around the center.
+    """
+    if self.params["window_center"] == "predicted":
+      # Maps the prediction from [-1, 1] to [0, values_length]
+      source_length = tf.to_float(memory.values_length)
+      center = source_length * (self._predict_position(query) + 1.0) / 2.0
+      return center, True
+    if self.params["window_center"] == "fixed":
+      return self._fixed_center(memory, time), False
+    raise ValueError("Unknown window center: {}".format(
+        self.params["window_center"]))
+
+  def _build(self, query, keys, values, values_length, memory=None,
+             time=None):
+    if memory is None:
+      memory = self.prepare_memory(keys, values, values_length)
+    values_depth = memory.values.get_shape().as_list()[-1]
+    window_width = self.params["window_width"]
+
+    att_query = tf.contrib.layers.fully_connected(
+        inputs=query,
+        num_outputs=self.params["num_units"],
+        activation_fn=None,
+        scope="att_query")
+    center, predicted = self.window_center(query, memory, time)
+
+    # Positions of the window, [B, W]. With beam search the memory has a
+    # batch size of 1 and is shared by all queries.
+    batch_size = tf.shape(query)[0]
+    num_positions = tf.shape(memory.keys)[1]
+    positions = tf.expand_dims(tf.to_int32(tf.round(center)), 1) + \
+      tf.range(-window_width, window_width + 1)
+    valid = tf.logical_and(
+        positions >= 0,
+        positions < tf.expand_dims(tf.to_int32(memory.values_length), 1))
+    positions = tf.clip_by_value(positions, 0, num_positions - 1)
+    batch_indices = tf.tile(
+        tf.expand_dims(tf.range(batch_size), 1), [1, 2 * window_width + 1])
+    memory_indices = tf.stack([
+        tf.minimum(batch_indices, tf.shape(memory.keys)[0] - 1), positions
+    ], 2)
+
+    # Only the encoder states in the window are scored
+    window_keys = tf.gather_nd(memory.keys, memory_indices)
+    window_values = tf.gather_nd(memory.values, memory_indices)
+    scores = self.score_fn(window_keys, att_query)
+    scores_mask = tf.to_float(valid)
+    scores = scores * scores_mask + ((1.0 - scores_mask) * tf.float32.min)
+    scores_normalized = tf.nn.softmax(scores) * scores_mask
+
+    if predicted:
+      # Favor positions close to the center
+      sigma = window_width / 2.0
+      distance = tf.to_float(positions) - tf.expand_dims(center, 1)
+      scores_normalized *= tf.exp(-tf.square(distance) / (2 * sigma**2))
+
+    context = tf.expand_dims(scores_normalized, 2) * window_values
+    context = tf.reduce_sum(context, 1, name="context")
+    context.set_shape([None, values_depth])
+
+    # Scatter the window scores to the full source length
+    scores_normalized = tf.scatter_nd(
+        indices=tf.stack([batch_indices, positions], 2),
+        updates=scores_normalized,
+        shape=tf.stack([batch_size, num_positions]),
+        name="scores_normalized")
+
+    return (scores_normalized, context)
+
+
+class AttentionLayerMonotonic(AttentionLayerLocal):
+  """Local attention with a window that moves monotonically over the source.
+
+  The window advances by `window_stride` source positions per decoding
+  step. Within the window, the center is shifted by up to `window_width`
+  positions as predicted from the query, and the scores are weighted with
+  a Gaussian around it. This suits tasks with a roughly monotonic
+  alignment, such as summarizing long articles.
+
+  Params:
+    num_units: Number of units used in the attention layer
+    window_width: The number of encoder states attended to on each side
+      of the window center.
+    window_stride: The number of source positions the window advances per
+      decoding step, e.g. the ratio of source to target length.
+  """
+
+  @staticmethod
+  def default_params():
+    return {"num_units": 128, "window_width": 16, "window_stride": 1.0}
+
+  def window_center(self, query, memory, time):
+    shift = self.params["window_width"] * self._predict_position(query)
+    return self._fixed_center(memory, time) + shift, True
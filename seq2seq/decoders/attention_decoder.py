@@ -53,9 +53,9 @@ class AttentionDecoder(RNNDecoder):
       A tensor of shape `[B, T, input_dim]`.
     attention_values_length: Sequence length of the attention values.
       An int32 Tensor of shape `[B]`.
-    attention_fn: The attention function to use. This function map from
-      `(state, inputs)` to `(attention_scores, attention_context)`.
-      For an example, see `seq2seq.decoder.attention.AttentionLayer`.
+    attention_fn: The attention layer to use, an instance of
+      `seq2seq.decoders.attention.AttentionLayer`. Its memory is prepared
+      once before decoding and reused at every step.
     reverse_scores: Optional, an array of sequence length. If set,
       reverse the attention scores in the output. This is used for when
       a reversed source sequence is fed as an input but you want to
@@ -79,11 +79,12 @@ class AttentionDecoder(RNNDecoder):
     self.attention_values_length = attention_values_length
     self.attention_fn = attention_fn
     self.reverse_scores_lengths = reverse_scores_lengths
+    self.attention_memory = None
 
   @property
   def output_size(self):
     return AttentionDecoderOutput(
-        logits=self.vocab_size,
+        logits=self.logits_size,
         predicted_ids=tf.TensorShape([]),
         cell_output=self.cell.output_size,
         attention_scores=tf.shape(self.attention_values)[1:-1],
@@ -110,7 +111,7 @@ class AttentionDecoder(RNNDecoder):
 
     return finished, first_inputs, self.initial_state
 
-  def compute_output(self, cell_output):
+  def compute_output(self, cell_output, time=None):
     """Computes the decoder outputs."""
 
     # Compute attention
@@ -118,7 +119,9 @@ class AttentionDecoder(RNNDecoder):
         query=cell_output,
         keys=self.attention_keys,
         values=self.attention_values,
-        values_length=self.attention_values_length)
+        values_length=self.attention_values_length,
+        memory=self.attention_memory,
+        time=time)
 
     # TODO: Make this a parameter: We may or may not want this.
     # Transform attention context.
@@ -132,17 +135,19 @@ class AttentionDecoder(RNNDecoder):
         scope="attention_mix")
 
     # Softmax computation
-    logits = tf.contrib.layers.fully_connected(
-        inputs=softmax_input,
-        num_outputs=self.vocab_size,
-        activation_fn=None,
-        scope="logits")
+    logits = self._compute_logits(softmax_input)
 
     return softmax_input, logits, att_scores, attention_context
 
   def _setup(self, initial_state, helper):
     self.initial_state = initial_state
 
+    # Project the keys once instead of at every decoding step
+    self.attention_memory = self.attention_fn.prepare_memory(
+        keys=self.attention_keys,
+        values=self.attention_values,
+        values_length=self.attention_values_length)
+
     def att_next_inputs(time, outputs, state, sample_ids, name=None):
       """Wraps the original decoder helper function to append the attention
       context.
@@ -164,7 +169,7 @@ class AttentionDecoder(RNNDecoder):
   def step(self, time_, inputs, state, name=None):
     cell_output, cell_state = self.cell(inputs, state)
     cell_output_new, logits, attention_scores, attention_context = \
-      self.compute_output(cell_output)
+      self.compute_output(cell_output, time_)
 
     if self.reverse_scores_lengths is not None:
       attention_scores = tf.reverse_sequence(
@@ -173,8 +178,7 @@ class AttentionDecoder(RNNDecoder):
           seq_dim=1,
           batch_dim=0)
 
-    sample_ids = self.helper.sample(
-        time=time_, outputs=logits, state=cell_state)
+    sample_ids = self._sample(time_, logits, cell_state)
 
     outputs = AttentionDecoderOutput(
         logits=logits,
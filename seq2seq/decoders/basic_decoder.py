@@ -28,19 +28,20 @@ class BasicDecoder(RNNDecoder):
   """Simple RNN decoder that performed a softmax operations on the cell output.
   """
 
+  logits_scope = "fully_connected"
+
   def __init__(self, params, mode, vocab_size, name="basic_decoder"):
     super(BasicDecoder, self).__init__(params, mode, name)
     self.vocab_size = vocab_size
 
   def compute_output(self, cell_output):
     """Computes the decoder outputs."""
-    return tf.contrib.layers.fully_connected(
-        inputs=cell_output, num_outputs=self.vocab_size, activation_fn=None)
+    return self._compute_logits(cell_output)
 
   @property
   def output_size(self):
     return DecoderOutput(
-        logits=self.vocab_size,
+        logits=self.logits_size,
         predicted_ids=tf.TensorShape([]),
         cell_output=self.cell.output_size)
 
@@ -56,8 +57,7 @@ class BasicDecoder(RNNDecoder):
   def step(self, time_, inputs, state, name=None):
     cell_output, cell_state = self.cell(inputs, state)
     logits = self.compute_output(cell_output)
-    sample_ids = self.helper.sample(
-        time=time_, outputs=logits, state=cell_state)
+    sample_ids = self._sample(time_, logits, cell_state)
     outputs = DecoderOutput(
         logits=logits, predicted_ids=sample_ids, cell_output=cell_output)
     finished, next_inputs, next_state = self.helper.next_inputs(
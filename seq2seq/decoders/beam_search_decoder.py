@@ -79,7 +79,13 @@ class BeamSearchDecoder(RNNDecoder):
   """
 
   def __init__(self, decoder, config):
-    super(BeamSearchDecoder, self).__init__(decoder.params, decoder.mode,
+    # Decoders that are not RNN decoders may have other parameters
+    params = {
+        k: v
+        for k, v in decoder.params.items()
+        if k in BeamSearchDecoder.default_params()
+    }
+    super(BeamSearchDecoder, self).__init__(params, decoder.mode,
                                             decoder.name)
     self.decoder = decoder
     self.config = config
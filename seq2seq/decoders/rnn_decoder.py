@@ -27,6 +27,7 @@ import six
 import tensorflow as tf
 from tensorflow.python.util import nest  # pylint: disable=E0611
 
+from seq2seq import graph_utils
 from seq2seq.graph_module import GraphModule
 from seq2seq.configurable import Configurable
 from seq2seq.contrib.seq2seq.decoder import Decoder, dynamic_decode
@@ -56,13 +57,24 @@ class RNNDecoder(Decoder, GraphModule, Configurable):
     initial_state: A tensor or tuple of tensors used as the initial cell
       state.
     name: A name for this module
+
+  Attributes:
+    compute_logits: If false, the output projection onto the vocabulary is
+      not applied during decoding. The returned logits are empty and the
+      predicted ids are zero. Instead, the projection variables are added to
+      the "output_projection" collection so that a loss can apply the
+      projection itself. This can only be used with a `TrainingHelper`.
   """
 
+  # Variable scope of the output projection, relative to the decoder scope
+  logits_scope = "logits"
+
   def __init__(self, params, mode, name):
     GraphModule.__init__(self, name)
     Configurable.__init__(self, params, mode)
     self.params["rnn_cell"] = _toggle_dropout(self.params["rnn_cell"], mode)
     self.cell = training_utils.get_rnn_cell(**self.params["rnn_cell"])
+    self.compute_logits = True
     # Not initialized yet
     self.initial_state = None
     self.helper = None
@@ -79,6 +91,50 @@ class RNNDecoder(Decoder, GraphModule, Configurable):
   def batch_size(self):
     return tf.shape(nest.flatten([self.initial_state])[0])[0]
 
+  @property
+  def logits_size(self):
+    """Returns the size of the logits emitted at each step."""
+    return self.vocab_size if self.compute_logits else 0
+
+  def _compute_logits(self, inputs):
+    """Projects the inputs onto the vocabulary, or returns empty logits if
+    `compute_logits` is false.
+    """
+    if not self.compute_logits:
+      return tf.zeros([tf.shape(inputs)[0], 0])
+    return tf.contrib.layers.fully_connected(
+        inputs=inputs,
+        num_outputs=self.vocab_size,
+        activation_fn=None,
+        scope=self.logits_scope)
+
+  def _sample(self, time_, logits, state):
+    """Samples the next ids from the logits using the helper."""
+    if not self.compute_logits:
+      return tf.zeros([tf.shape(logits)[0]], dtype=tf.int32)
+    return self.helper.sample(time=time_, outputs=logits, state=state)
+
+  def _create_output_projection(self, input_size):
+    """Creates the variables of the output projection outside of the decoding
+    loop. They have the same names as the variables created by
+    `_compute_logits`.
+
+    Returns:
+      A dictionary with the `weights` of shape `[input_size, vocab_size]`
+      and the `biases` of shape `[vocab_size]`.
+    """
+    with tf.variable_scope("decoder"):
+      with tf.variable_scope(self.logits_scope):
+        weights = tf.get_variable(
+            name="weights",
+            shape=[input_size, self.vocab_size],
+            initializer=tf.contrib.layers.xavier_initializer())
+        biases = tf.get_variable(
+            name="biases",
+            shape=[self.vocab_size],
+            initializer=tf.constant_initializer(0.0))
+    return {"weights": weights, "biases": biases}
+
   def _setup(self, initial_state, helper):
     """Sets the initial state and helper for the decoder.
     """
@@ -118,4 +174,10 @@ class RNNDecoder(Decoder, GraphModule, Configurable):
         output_time_major=True,
         impute_finished=False,
         maximum_iterations=maximum_iterations)
+
+    if not self.compute_logits:
+      input_size = outputs.cell_output.get_shape().as_list()[-1]
+      graph_utils.add_dict_to_collection(
+          self._create_output_projection(input_size), "output_projection")
+
     return self.finalize(outputs, final_state)
@@ -0,0 +1,299 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A self-attention decoder, as described in https://arxiv.org/abs/1706.03762.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import tensorflow as tf
+
+from seq2seq import graph_utils
+from seq2seq.configurable import Configurable
+from seq2seq.contrib.seq2seq.decoder import dynamic_decode
+from seq2seq.contrib.seq2seq.helper import TrainingHelper
+from seq2seq.decoders.rnn_decoder import RNNDecoder, DecoderOutput
+from seq2seq.encoders.transformer_encoder import check_transformer_params
+from seq2seq.encoders.transformer_encoder import combine_heads
+from seq2seq.encoders.transformer_encoder import dot_product_attention
+from seq2seq.encoders.transformer_encoder import embed_inputs
+from seq2seq.encoders.transformer_encoder import feed_forward
+from seq2seq.encoders.transformer_encoder import layer_norm
+from seq2seq.encoders.transformer_encoder import multihead_attention
+from seq2seq.encoders.transformer_encoder import padding_bias
+from seq2seq.encoders.transformer_encoder import project
+from seq2seq.encoders.transformer_encoder import split_heads
+from seq2seq.graph_module import GraphModule
+
+
+class TransformerDecoder(RNNDecoder):
+  """A decoder that uses causal self-attention over the previous target
+  positions and multi-head attention over the encoder outputs.
+
+  With a `TrainingHelper` all target positions are decoded in a single
+  parallel pass. With other helpers, including the scheduled sampling
+  subclasses of `TrainingHelper`, the decoder runs step by step. It
+  keeps the keys and values of the previous positions of each layer in its
+  state, so a step only processes the newest position. The caches have a
+  fixed size of `max_decode_length`.
+
+  The decoder does not have a recurrent cell, so it ignores the initial
+  state and can not be used with a bridge.
+
+  Args:
+    params: A dictionary of hyperparameters.
+    mode: A `tf.contrib.learn.ModeKeys`.
+    vocab_size: Output vocabulary size.
+    memory: The encoder outputs to attend over, a tensor of shape
+      `[B, T, D]`.
+    memory_length: The sequence length of the memory, a tensor of shape
+      `[B]`.
+
+  Params:
+    num_layers: The number of layers.
+    num_units: The depth of the layers. The inputs are projected to this
+      depth if needed.
+    num_heads: The number of attention heads.
+    ffn_units: The number of hidden units of the feed forward layers.
+    dropout_keep_prob: Dropout keep probability during training.
+    max_decode_length: The maximum number of decoding steps, and the size
+      of the key and value caches.
+  """
+
+  def __init__(self,
+               params,
+               mode,
+               vocab_size,
+               memory,
+               memory_length,
+               name="transformer_decoder"):
+    # pylint: disable=super-init-not-called
+    # The RNNDecoder constructor creates an RNN cell which is not needed
+    GraphModule.__init__(self, name)
+    Configurable.__init__(self, params, mode)
+    check_transformer_params(self.params)
+    self.vocab_size = vocab_size
+    self.memory = memory
+    self.memory_length = memory_length
+    self.compute_logits = True
+    self.initial_state = None
+    self.helper = None
+    self._memory_keys = None
+    self._memory_values = None
+    self._memory_bias = None
+
+  @staticmethod
+  def default_params():
+    return {
+        "num_layers": 2,
+        "num_units": 256,
+        "num_heads": 8,
+        "ffn_units": 1024,
+        "dropout_keep_prob": 0.9,
+        "max_decode_length": 100,
+    }
+
+  @property
+  def _keep_prob(self):
+    if self.mode == tf.contrib.learn.ModeKeys.TRAIN:
+      return self.params["dropout_keep_prob"]
+    return 1.0
+
+  @property
+  def batch_size(self):
+    return tf.shape(self.memory)[0]
+
+  @property
+  def output_size(self):
+    return DecoderOutput(
+        logits=self.logits_size,
+        predicted_ids=tf.TensorShape([]),
+        cell_output=self.params["num_units"])
+
+  @property
+  def output_dtype(self):
+    return DecoderOutput(
+        logits=tf.float32, predicted_ids=tf.int32, cell_output=tf.float32)
+
+  def _setup(self, initial_state, helper):
+    """Projects the memory to the keys and values of each layer once."""
+    self.initial_state = initial_state
+    self.helper = helper
+
+    num_units = self.params["num_units"]
+    self._memory_keys = []
+    self._memory_values = []
+    with tf.variable_scope("decoder"):
+      for layer in range(self.params["num_layers"]):
+        with tf.variable_scope("layer_{}/encdec_attention".format(layer)):
+          self._memory_keys.append(split_heads(
+              project(self.memory, num_units, "key"),
+              self.params["num_heads"]))
+          self._memory_values.append(split_heads(
+              project(self.memory, num_units, "value"),
+              self.params["num_heads"]))
+    self._memory_bias = padding_bias(
+        self.memory_length, tf.shape(self.memory)[1])
+
+  def _encdec_attention_and_feed_forward(self, inputs, layer):
+    """Applies the sublayers that follow the self-attention of a layer."""
+    num_units = self.params["num_units"]
+    outputs = inputs
+    with tf.variable_scope("encdec_attention"):
+      queries = split_heads(
+          project(layer_norm(outputs), num_units, "query"),
+          self.params["num_heads"])
+      context = dot_product_attention(
+          queries, self._memory_keys[layer], self._memory_values[layer],
+          self._memory_bias, self._keep_prob)
+      attended = project(combine_heads(context, num_units), num_units,
+                         "output")
+      outputs += tf.nn.dropout(attended, self._keep_prob)
+    with tf.variable_scope("feed_forward"):
+      transformed = feed_forward(
+          layer_norm(outputs), self.params["ffn_units"], num_units,
+          self._keep_prob)
+      outputs += tf.nn.dropout(transformed, self._keep_prob)
+    return outputs
+
+  def _decode_parallel(self, inputs):
+    """Decodes all target positions at once.
+
+    Args:
+      inputs: The inputs of all steps, a tensor of shape `[B, T, D]`.
+
+    Returns:
+      A time-major `DecoderOutput`.
+    """
+    num_units = self.params["num_units"]
+    max_length = tf.shape(inputs)[1]
+
+    with tf.variable_scope("decoder"):
+      outputs = embed_inputs(
+          inputs, tf.range(max_length), num_units, self._keep_prob)
+
+      # Each position may only attend to itself and previous positions
+      causal_mask = tf.matrix_band_part(
+          tf.ones(tf.stack([max_length, max_length])), -1, 0)
+      causal_bias = tf.reshape(
+          (1.0 - causal_mask) * -1e9,
+          tf.stack([1, 1, max_length, max_length]))
+
+      for layer in range(self.params["num_layers"]):
+        with tf.variable_scope("layer_{}".format(layer)):
+          with tf.variable_scope("self_attention"):
+            normed = layer_norm(outputs)
+            attended = multihead_attention(
+                normed, normed, causal_bias, num_units,
+                self.params["num_heads"], self._keep_prob)
+            outputs += tf.nn.dropout(attended, self._keep_prob)
+          outputs = self._encdec_attention_and_feed_forward(outputs, layer)
+
+      cell_output = tf.transpose(
+          layer_norm(outputs, scope="output_norm"), [1, 0, 2])
+      logits = self._compute_logits(tf.reshape(cell_output, [-1, num_units]))
+      logits = tf.reshape(
+          logits, tf.concat([tf.shape(cell_output)[:2], [self.logits_size]],
+                            0))
+
+    if self.compute_logits:
+      predicted_ids = tf.to_int32(tf.argmax(logits, 2))
+    else:
+      predicted_ids = tf.zeros(tf.shape(cell_output)[:2], dtype=tf.int32)
+    return DecoderOutput(
+        logits=logits, predicted_ids=predicted_ids, cell_output=cell_output)
+
+  def initialize(self, name=None):
+    finished, first_inputs = self.helper.initialize()
+
+    # Empty key and value caches for each layer, [B, max_decode_length, D]
+    cache_shape = tf.stack([
+        tf.shape(first_inputs)[0], self.params["max_decode_length"],
+        self.params["num_units"]
+    ])
+    caches = tuple(
+        (tf.zeros(cache_shape), tf.zeros(cache_shape))
+        for _ in range(self.params["num_layers"]))
+    return finished, first_inputs, caches
+
+  def step(self, time_, inputs, state, name=None):
+    num_units = self.params["num_units"]
+    num_heads = self.params["num_heads"]
+    max_decode_length = self.params["max_decode_length"]
+
+    outputs = embed_inputs(
+        tf.expand_dims(inputs, 1), tf.expand_dims(time_, 0), num_units,
+        self._keep_prob)
+
+    # Write the new keys and values at the current position and attend to
+    # all positions up to it
+    position = tf.reshape(tf.one_hot(time_, max_decode_length), [1, -1, 1])
+    mask = tf.to_float(tf.range(max_decode_length) <= time_)
+    bias = tf.reshape((1.0 - mask) * -1e9, [1, 1, 1, -1])
+
+    next_caches = []
+    for layer, (keys, values) in enumerate(state):
+      with tf.variable_scope("layer_{}".format(layer)):
+        with tf.variable_scope("self_attention"):
+          normed = layer_norm(outputs)
+          keys += position * project(normed, num_units, "key")
+          values += position * project(normed, num_units, "value")
+          context = dot_product_attention(
+              split_heads(project(normed, num_units, "query"), num_heads),
+              split_heads(keys, num_heads),
+              split_heads(values, num_heads),
+              bias, self._keep_prob)
+          attended = project(combine_heads(context, num_units), num_units,
+                             "output")
+          outputs += tf.nn.dropout(attended, self._keep_prob)
+        outputs = self._encdec_attention_and_feed_forward(outputs, layer)
+      next_caches.append((keys, values))
+
+    cell_output = tf.squeeze(layer_norm(outputs, scope="output_norm"), [1])
+    cell_output.set_shape([None, num_units])
+    logits = self._compute_logits(cell_output)
+    sample_ids = self._sample(time_, logits, state)
+    step_outputs = DecoderOutput(
+        logits=logits, predicted_ids=sample_ids, cell_output=cell_output)
+    finished, next_inputs, next_state = self.helper.next_inputs(
+        time=time_,
+        outputs=step_outputs,
+        state=tuple(next_caches),
+        sample_ids=sample_ids)
+    return (step_outputs, next_state, next_inputs, finished)
+
+  def _build(self, initial_state, helper):
+    self._setup(initial_state, helper)
+
+    # Scheduled sampling helpers subclass TrainingHelper but feed back
+    # sampled outputs, so they are decoded step by step.
+    if type(helper) is TrainingHelper:  #pylint: disable=unidiomatic-typecheck
+      outputs = self._decode_parallel(helper.inputs)
+      final_state = None
+    else:
+      outputs, final_state = dynamic_decode(
+          decoder=self,
+          output_time_major=True,
+          impute_finished=False,
+          maximum_iterations=self.params["max_decode_length"])
+
+    if not self.compute_logits:
+      graph_utils.add_dict_to_collection(
+          self._create_output_projection(self.params["num_units"]),
+          "output_projection")
+
+    return self.finalize(outputs, final_state)
@@ -20,3 +20,4 @@ from seq2seq.encoders.rnn_encoder import *
 from seq2seq.encoders.image_encoder import *
 from seq2seq.encoders.pooling_encoder import PoolingEncoder
 from seq2seq.encoders.conv_encoder import ConvEncoder
+from seq2seq.encoders.transformer_encoder import TransformerEncoder
@@ -33,9 +33,14 @@ class InceptionV3Encoder(Encoder):
 
   Params:
     resize_height: Resize the image to this height before feeding it
-      into the convolutional network.
+      into the convolutional network. Images that were already resized
+      by the input pipeline are not resized again.
     resize_width: Resize the image to this width before feeding it
       into the convolutional network.
+    final_state: How the final state is computed from the feature map.
+      "flatten" flattens all features to `[B, W*H*depth]`. "pool" averages
+      the features over width and height to `[B, depth]`, which is the
+      final state stored by `bin/tools/cache_image_features.py`.
   """
 
   def __init__(self, params, mode, name="image_encoder"):
@@ -46,13 +51,14 @@ class InceptionV3Encoder(Encoder):
     return {
         "resize_height": 299,
         "resize_width": 299,
+        "final_state": "flatten",
     }
 
   def encode(self, inputs):
-    inputs = tf.image.resize_images(
-        images=inputs,
-        size=[self.params["resize_height"], self.params["resize_width"]],
-        method=tf.image.ResizeMethod.BILINEAR)
+    size = [self.params["resize_height"], self.params["resize_width"]]
+    if inputs.get_shape().as_list()[1:3] != size:
+      inputs = tf.image.resize_images(
+          images=inputs, size=size, method=tf.image.ResizeMethod.BILINEAR)
 
     outputs, _ = inception_v3_base(tf.to_float(inputs))
     output_shape = outputs.get_shape()  #pylint: disable=E1101
@@ -60,16 +66,56 @@ class InceptionV3Encoder(Encoder):
 
     # Take attentin over output elemnts in width and height dimension:
     # Shape: [B, W*H, ...]
-    outputs_flat = tf.reshape(outputs, [shape_list[0], -1, shape_list[-1]])
+    outputs_flat = tf.reshape(outputs, [-1, shape_list[1] * shape_list[2],
+                                        shape_list[-1]])
 
-    # Final state is the pooled output
-    # Shape: [B, W*H*...]
-    final_state = tf.contrib.slim.avg_pool2d(
-        outputs, output_shape[1:3], padding="VALID", scope="pool")
-    final_state = tf.contrib.slim.flatten(outputs, scope="flatten")
+    if self.params["final_state"] == "pool":
+      # Final state is the pooled output
+      # Shape: [B, ...]
+      final_state = tf.contrib.slim.avg_pool2d(
+          outputs, output_shape[1:3], padding="VALID", scope="pool")
+      final_state = tf.contrib.slim.flatten(final_state, scope="flatten")
+    elif self.params["final_state"] == "flatten":
+      # Shape: [B, W*H*...]
+      final_state = tf.contrib.slim.flatten(outputs, scope="flatten")
+    else:
+      raise ValueError("Unknown final_state: {}".format(
+          self.params["final_state"]))
 
     return EncoderOutput(
         outputs=outputs_flat,
         final_state=final_state,
         attention_values=outputs_flat,
         attention_values_length=tf.shape(outputs_flat)[1])
+
+
+class PrecomputedImageEncoder(Encoder):
+  """
+  An encoder for image features that were computed ahead of time, e.g. by
+  running the `InceptionV3Encoder` once over a dataset using
+  `bin/tools/cache_image_features.py`. The encoder has no parameters, so
+  only the decoder is trained.
+
+  Args:
+    inputs: Image features of shape `[B, W*H, depth]`.
+    final_state: Optional, the precomputed final state of shape `[B, depth]`.
+      Defaults to the mean of the features.
+  """
+
+  def __init__(self, params, mode, name="precomputed_image_encoder"):
+    super(PrecomputedImageEncoder, self).__init__(params, mode, name)
+
+  @staticmethod
+  def default_params():
+    return {}
+
+  def encode(self, inputs, final_state=None):
+    inputs = tf.to_float(inputs)
+    if final_state is None:
+      final_state = tf.reduce_mean(inputs, axis=1)
+
+    return EncoderOutput(
+        outputs=inputs,
+        final_state=final_state,
+        attention_values=inputs,
+        attention_values_length=tf.shape(inputs)[1])
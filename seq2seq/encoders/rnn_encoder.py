@@ -200,3 +200,130 @@ class StackBidirectionalRNNEncoder(Encoder):
         final_state=final_state,
         attention_values=outputs_concat,
         attention_values_length=sequence_length)
+
+
+class HierarchicalRNNEncoder(Encoder):
+  """
+  A hierarchical bidirectional RNN encoder for long inputs. The input is
+  split into chunks of `chunk_size` steps that are encoded in parallel by a
+  word-level bidirectional RNN. A chunk-level bidirectional RNN then runs
+  over the chunk summaries, i.e. the last forward and first backward
+  outputs of each chunk. The sequential depth of the encoder is
+  `chunk_size` plus the number of chunks instead of the input length.
+
+  With `attention_level: words` the attention values are the word-level
+  outputs concatenated with the output of their chunk, so that attention
+  scores depend on both levels. With `attention_level: chunks` the decoder
+  attends over the chunk outputs only.
+
+  Params:
+    chunk_size: The number of input steps per chunk.
+    rnn_cell: The parameters of the word-level RNN cell.
+    chunk_rnn_cell: The parameters of the chunk-level RNN cell.
+    attention_level: Either "words" or "chunks".
+    init_scale: The scale of the uniform initializer.
+  """
+
+  def __init__(self, params, mode, name="hierarchical_rnn_encoder"):
+    super(HierarchicalRNNEncoder, self).__init__(params, mode, name)
+    self.params["rnn_cell"] = _toggle_dropout(self.params["rnn_cell"], mode)
+    self.params["chunk_rnn_cell"] = _toggle_dropout(
+        self.params["chunk_rnn_cell"], mode)
+    if self.params["attention_level"] not in ["words", "chunks"]:
+      raise ValueError("Unknown attention level: {}".format(
+          self.params["attention_level"]))
+
+  @staticmethod
+  def default_params():
+    return {
+        "chunk_size": 50,
+        "rnn_cell": _default_rnn_cell_params(),
+        "chunk_rnn_cell": _default_rnn_cell_params(),
+        "attention_level": "words",
+        "init_scale": 0.04,
+    }
+
+  def encode(self, inputs, sequence_length, **kwargs):
+    scope = tf.get_variable_scope()
+    scope.set_initializer(tf.random_uniform_initializer(
+        -self.params["init_scale"],
+        self.params["init_scale"]))
+
+    chunk_size = self.params["chunk_size"]
+    sequence_length = tf.to_int32(sequence_length)
+    input_depth = inputs.get_shape().as_list()[-1]
+    batch_size = tf.shape(inputs)[0]
+    max_length = tf.shape(inputs)[1]
+    num_chunks = (max_length + chunk_size - 1) // chunk_size
+
+    # Split the inputs into chunks, [B * N, chunk_size, depth]
+    inputs = tf.pad(
+        inputs, [[0, 0], [0, num_chunks * chunk_size - max_length], [0, 0]])
+    chunk_inputs = tf.reshape(inputs, [-1, chunk_size, input_depth])
+    chunk_starts = tf.range(num_chunks) * chunk_size
+    chunk_length = tf.clip_by_value(
+        tf.expand_dims(sequence_length, 1) - chunk_starts, 0, chunk_size)
+    chunk_length = tf.reshape(chunk_length, [-1])
+
+    # Encode all chunks in parallel
+    cell_fw = training_utils.get_rnn_cell(**self.params["rnn_cell"])
+    cell_bw = training_utils.get_rnn_cell(**self.params["rnn_cell"])
+    (outputs_fw, outputs_bw), _ = tf.nn.bidirectional_dynamic_rnn(
+        cell_fw=cell_fw,
+        cell_bw=cell_bw,
+        inputs=chunk_inputs,
+        sequence_length=chunk_length,
+        dtype=tf.float32,
+        scope="word_rnn",
+        **kwargs)
+
+    # Summarize each chunk by its last forward and first backward output
+    last_step = tf.stack([
+        tf.range(tf.shape(chunk_length)[0]),
+        tf.maximum(chunk_length - 1, 0)
+    ], 1)
+    summaries = tf.concat(
+        [tf.gather_nd(outputs_fw, last_step), outputs_bw[:, 0]], 1)
+    summary_depth = summaries.get_shape().as_list()[-1]
+    summaries = tf.reshape(summaries, [batch_size, -1, summary_depth])
+
+    # Encode the sequence of chunks
+    num_valid_chunks = (sequence_length + chunk_size - 1) // chunk_size
+    chunk_cell_fw = training_utils.get_rnn_cell(
+        **self.params["chunk_rnn_cell"])
+    chunk_cell_bw = training_utils.get_rnn_cell(
+        **self.params["chunk_rnn_cell"])
+    chunk_outputs, states = tf.nn.bidirectional_dynamic_rnn(
+        cell_fw=chunk_cell_fw,
+        cell_bw=chunk_cell_bw,
+        inputs=summaries,
+        sequence_length=num_valid_chunks,
+        dtype=tf.float32,
+        scope="chunk_rnn",
+        **kwargs)
+    chunk_outputs = tf.concat(chunk_outputs, 2)
+
+    if self.params["attention_level"] == "chunks":
+      return EncoderOutput(
+          outputs=chunk_outputs,
+          final_state=states,
+          attention_values=chunk_outputs,
+          attention_values_length=num_valid_chunks)
+
+    # Restore the word-level outputs to [B, T, depth] and append the output
+    # of the chunk that each word belongs to
+    word_outputs = tf.concat([outputs_fw, outputs_bw], 2)
+    word_depth = word_outputs.get_shape().as_list()[-1]
+    word_outputs = tf.reshape(word_outputs, [batch_size, -1, word_depth])
+    chunk_depth = chunk_outputs.get_shape().as_list()[-1]
+    chunk_context = tf.tile(
+        tf.expand_dims(chunk_outputs, 2), [1, 1, chunk_size, 1])
+    chunk_context = tf.reshape(chunk_context, [batch_size, -1, chunk_depth])
+    outputs_concat = tf.concat([word_outputs, chunk_context], 2)
+    outputs_concat = outputs_concat[:, :max_length]
+
+    return EncoderOutput(
+        outputs=outputs_concat,
+        final_state=states,
+        attention_values=outputs_concat,
+        attention_values_length=sequence_length)
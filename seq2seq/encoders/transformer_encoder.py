@@ -0,0 +1,244 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+A self-attention encoder, as described in https://arxiv.org/abs/1706.03762,
+and the layers it shares with the self-attention decoder.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import math
+
+import tensorflow as tf
+
+from seq2seq.encoders.encoder import Encoder, EncoderOutput
+
+
+def positional_encoding(positions, depth):
+  """Computes sinusoidal position encodings.
+
+  Args:
+    positions: A 1-D tensor of positions.
+    depth: The depth of the encodings. Must be even.
+
+  Returns:
+    A float tensor of shape `[len(positions), depth]`.
+  """
+  num_timescales = depth // 2
+  log_increment = math.log(10000.0) / max(num_timescales - 1, 1)
+  inv_timescales = tf.exp(
+      tf.to_float(tf.range(num_timescales)) * -log_increment)
+  scaled_time = tf.expand_dims(tf.to_float(positions), 1) * \
+    tf.expand_dims(inv_timescales, 0)
+  return tf.concat([tf.sin(scaled_time), tf.cos(scaled_time)], 1)
+
+
+def layer_norm(inputs, scope="layer_norm", epsilon=1e-6):
+  """Normalizes the last dimension of the inputs."""
+  depth = inputs.get_shape().as_list()[-1]
+  with tf.variable_scope(scope):
+    scale = tf.get_variable(
+        "scale", [depth], initializer=tf.ones_initializer())
+    bias = tf.get_variable(
+        "bias", [depth], initializer=tf.zeros_initializer())
+    mean, variance = tf.nn.moments(inputs, [-1], keep_dims=True)
+    return (inputs - mean) * tf.rsqrt(variance + epsilon) * scale + bias
+
+
+def split_heads(inputs, num_heads):
+  """Splits the last dimension into heads, `[B, T, D]` to
+  `[B, num_heads, T, D / num_heads]`."""
+  depth = inputs.get_shape().as_list()[-1]
+  shape = tf.shape(inputs)
+  outputs = tf.reshape(
+      inputs, [shape[0], shape[1], num_heads, depth // num_heads])
+  return tf.transpose(outputs, [0, 2, 1, 3])
+
+
+def combine_heads(inputs, depth):
+  """Inverts `split_heads`, `[B, num_heads, T, depth / num_heads]` to
+  `[B, T, depth]`."""
+  outputs = tf.transpose(inputs, [0, 2, 1, 3])
+  shape = tf.shape(outputs)
+  return tf.reshape(outputs, [shape[0], shape[1], depth])
+
+
+def project(inputs, num_units, scope):
+  """A linear projection of the last dimension."""
+  return tf.contrib.layers.fully_connected(
+      inputs=inputs, num_outputs=num_units, activation_fn=None, scope=scope)
+
+
+def dot_product_attention(queries, keys, values, bias, keep_prob=1.0):
+  """Scaled dot product attention over heads.
+
+  Args:
+    queries: A tensor of shape `[B, H, T_q, D]`.
+    keys: A tensor of shape `[B, H, T_k, D]`.
+    values: A tensor of shape `[B, H, T_k, D]`.
+    bias: A tensor that is added to the attention logits and broadcasts to
+      `[B, H, T_q, T_k]`, e.g. a large negative number for masked positions.
+    keep_prob: Dropout keep probability of the attention weights.
+
+  Returns:
+    A tensor of shape `[B, H, T_q, D]`.
+  """
+  depth = queries.get_shape().as_list()[-1]
+  logits = tf.matmul(queries, keys, transpose_b=True) * depth**-0.5 + bias
+  logits_shape = tf.shape(logits)
+  weights = tf.nn.softmax(tf.reshape(logits, [-1, logits_shape[-1]]))
+  weights = tf.reshape(weights, logits_shape)
+  if keep_prob < 1.0:
+    weights = tf.nn.dropout(weights, keep_prob)
+  return tf.matmul(weights, values)
+
+
+def multihead_attention(queries, memory, bias, num_units, num_heads,
+                        keep_prob=1.0):
+  """Multi-head attention of the queries over the memory.
+
+  Args:
+    queries: A tensor of shape `[B, T_q, D]`.
+    memory: A tensor of shape `[B, T_k, D]`.
+    bias: The attention bias, see `dot_product_attention`.
+    num_units: The depth of the projections.
+    num_heads: The number of attention heads.
+    keep_prob: Dropout keep probability of the attention weights.
+
+  Returns:
+    A tensor of shape `[B, T_q, num_units]`.
+  """
+  context = dot_product_attention(
+      split_heads(project(queries, num_units, "query"), num_heads),
+      split_heads(project(memory, num_units, "key"), num_heads),
+      split_heads(project(memory, num_units, "value"), num_heads),
+      bias,
+      keep_prob)
+  return project(combine_heads(context, num_units), num_units, "output")
+
+
+def padding_bias(sequence_length, maxlen):
+  """Creates an attention bias of shape `[B, 1, 1, maxlen]` that masks
+  positions beyond the sequence length."""
+  mask = tf.sequence_mask(sequence_length, maxlen=maxlen, dtype=tf.float32)
+  return tf.expand_dims(tf.expand_dims((1.0 - mask) * -1e9, 1), 1)
+
+
+def feed_forward(inputs, hidden_units, num_units, keep_prob=1.0):
+  """A position-wise feed forward layer with ReLU activation."""
+  hidden = tf.contrib.layers.fully_connected(
+      inputs=inputs,
+      num_outputs=hidden_units,
+      activation_fn=tf.nn.relu,
+      scope="ffn_hidden")
+  if keep_prob < 1.0:
+    hidden = tf.nn.dropout(hidden, keep_prob)
+  return project(hidden, num_units, "ffn_output")
+
+
+def embed_inputs(inputs, positions, num_units, keep_prob=1.0):
+  """Projects the inputs to `num_units` if needed and adds position
+  encodings.
+
+  Args:
+    inputs: A tensor of shape `[B, T, D]`.
+    positions: A 1-D tensor with the position of each of the `T` steps.
+  """
+  if inputs.get_shape().as_list()[-1] != num_units:
+    inputs = project(inputs, num_units, "input_projection")
+  outputs = inputs + tf.expand_dims(
+      positional_encoding(positions, num_units), 0)
+  if keep_prob < 1.0:
+    outputs = tf.nn.dropout(outputs, keep_prob)
+  return outputs
+
+
+def check_transformer_params(params):
+  """Validates the parameters shared by the self-attention encoder and
+  decoder."""
+  if params["num_units"] % 2 or params["num_units"] % params["num_heads"]:
+    raise ValueError("num_units must be even and divisible by num_heads")
+
+
+class TransformerEncoder(Encoder):
+  """A self-attention encoder, as described in
+  https://arxiv.org/abs/1706.03762. Every layer applies multi-head
+  self-attention followed by a position-wise feed forward layer. Layer
+  normalization is applied to the input of each sublayer. All positions
+  are encoded in parallel.
+
+  Params:
+    num_layers: The number of layers.
+    num_units: The depth of the layers. The inputs are projected to this
+      depth if needed.
+    num_heads: The number of attention heads.
+    ffn_units: The number of hidden units of the feed forward layers.
+    dropout_keep_prob: Dropout keep probability during training.
+  """
+
+  def __init__(self, params, mode, name="transformer_encoder"):
+    super(TransformerEncoder, self).__init__(params, mode, name)
+    check_transformer_params(self.params)
+
+  @staticmethod
+  def default_params():
+    return {
+        "num_layers": 2,
+        "num_units": 256,
+        "num_heads": 8,
+        "ffn_units": 1024,
+        "dropout_keep_prob": 0.9,
+    }
+
+  def encode(self, inputs, sequence_length):
+    keep_prob = 1.0
+    if self.mode == tf.contrib.learn.ModeKeys.TRAIN:
+      keep_prob = self.params["dropout_keep_prob"]
+    num_units = self.params["num_units"]
+    max_length = tf.shape(inputs)[1]
+
+    outputs = embed_inputs(inputs, tf.range(max_length), num_units, keep_prob)
+    bias = padding_bias(sequence_length, max_length)
+
+    for layer in range(self.params["num_layers"]):
+      with tf.variable_scope("layer_{}".format(layer)):
+        with tf.variable_scope("self_attention"):
+          normed = layer_norm(outputs)
+          attended = multihead_attention(
+              normed, normed, bias, num_units, self.params["num_heads"],
+              keep_prob)
+          outputs += tf.nn.dropout(attended, keep_prob)
+        with tf.variable_scope("feed_forward"):
+          transformed = feed_forward(
+              layer_norm(outputs), self.params["ffn_units"], num_units,
+              keep_prob)
+          outputs += tf.nn.dropout(transformed, keep_prob)
+
+    outputs = layer_norm(outputs, scope="output_norm")
+    mask = tf.sequence_mask(sequence_length, maxlen=max_length,
+                            dtype=tf.float32)
+    outputs *= tf.expand_dims(mask, 2)
+
+    # Final state is the average of the outputs
+    final_state = tf.reduce_sum(outputs, 1) / tf.expand_dims(
+        tf.maximum(tf.to_float(sequence_length), 1.0), 1)
+
+    return EncoderOutput(
+        outputs=outputs,
+        final_state=final_state,
+        attention_values=outputs,
+        attention_values_length=sequence_length)
@@ -19,6 +19,7 @@ from __future__ import division
 from __future__ import print_function
 
 import tensorflow as tf
+from tensorflow.python.framework import function  # pylint: disable=E0611
 
 
 def cross_entropy_sequence_loss(logits, targets, sequence_length):
@@ -44,3 +45,185 @@ def cross_entropy_sequence_loss(logits, targets, sequence_length):
     losses = losses * tf.transpose(tf.to_float(loss_mask), [1, 0])
 
     return losses
+
+
+def _unigram_candidate_sampler(true_classes, num_samples, unigram_counts,
+                               distortion=1.0):
+  """Samples candidate classes with replacement from a unigram distribution
+  given as a tensor, e.g. word counts read from a vocabulary table.
+
+  Args:
+    true_classes: The target classes of shape `[N, 1]`
+    num_samples: The number of classes to sample.
+    unigram_counts: A float tensor of shape `[num_classes]` with the count
+      of each class. Counts smaller than 1 are treated as 1.
+    distortion: The counts are raised to this power before normalizing.
+
+  Returns:
+    A tuple `(sampled_candidates, true_expected_count,
+    sampled_expected_count)` as expected by `tf.nn.sampled_softmax_loss`.
+  """
+  probs = tf.pow(tf.maximum(tf.to_float(unigram_counts), 1.0), distortion)
+  probs /= tf.reduce_sum(probs)
+  sampled_candidates = tf.multinomial(
+      tf.expand_dims(tf.log(probs), 0), num_samples)[0]
+  true_expected_count = num_samples * tf.gather(probs, true_classes)
+  sampled_expected_count = num_samples * tf.gather(probs, sampled_candidates)
+  return (tf.stop_gradient(sampled_candidates),
+          tf.stop_gradient(true_expected_count),
+          tf.stop_gradient(sampled_expected_count))
+
+
+def _gather_columns(matrix, indices):
+  """Gathers the columns of a 2-D matrix without transposing all of it.
+
+  Returns:
+    A tensor of shape `[num_rows, len(indices)]`.
+  """
+  rows = tf.range(tf.shape(matrix, out_type=tf.int64)[0])
+  rows = tf.tile(tf.expand_dims(rows, 1), [1, tf.size(indices)])
+  columns = tf.tile(tf.expand_dims(indices, 0), [tf.shape(matrix)[0], 1])
+  return tf.gather_nd(matrix, tf.stack([rows, columns], 2))
+
+
+def sampled_softmax_sequence_loss(inputs, weights, biases, targets,
+                                  sequence_length, num_samples,
+                                  unigram_counts, distortion=1.0):
+  """Calculates the per-example sampled softmax loss for a sequence of
+    outputs and masks out all losses passed the sequence length. Instead of
+    projecting the inputs onto the full vocabulary, only the target classes
+    and `num_samples` classes drawn from a unigram distribution are
+    evaluated. This is only an estimate of the cross-entropy loss and should
+    only be used for training.
+
+  Args:
+    inputs: Inputs to the output projection of shape `[T, B, input_size]`
+    weights: Weights of the output projection of shape
+      `[input_size, vocab_size]`
+    biases: Biases of the output projection of shape `[vocab_size]`
+    targets: Target classes of shape `[T, B]`
+    sequence_length: An int32 tensor of shape `[B]` corresponding
+      to the length of each input
+    num_samples: The number of classes to sample per batch.
+    unigram_counts: A float tensor of shape `[vocab_size]` with the count of
+      each class, used as the proposal distribution.
+    distortion: The counts are raised to this power before sampling.
+
+  Returns:
+    A tensor of shape [T, B] that contains the loss per example, per time step.
+  """
+  with tf.name_scope("sampled_softmax_sequence_loss"):
+    input_size = inputs.get_shape().as_list()[-1]
+    vocab_size = weights.get_shape().as_list()[-1]
+    flat_inputs = tf.reshape(inputs, [-1, input_size])
+    flat_targets = tf.reshape(tf.to_int64(targets), [-1, 1])
+    sampled_candidates, true_expected_count, sampled_expected_count = \
+      _unigram_candidate_sampler(
+          flat_targets, num_samples, unigram_counts, distortion)
+
+    # Only project onto the target and sampled classes. Their columns of the
+    # projection are gathered, so the full weight matrix is never copied.
+    # Classes are renumbered by their position in `classes`.
+    num_targets = tf.size(flat_targets)
+    classes, class_positions = tf.unique(
+        tf.concat([tf.reshape(flat_targets, [-1]), sampled_candidates], 0))
+    class_positions = tf.to_int64(class_positions)
+
+    losses = tf.nn.sampled_softmax_loss(
+        weights=tf.transpose(_gather_columns(weights, classes)),
+        biases=tf.gather(biases, classes),
+        labels=tf.reshape(class_positions[:num_targets], [-1, 1]),
+        inputs=flat_inputs,
+        num_sampled=num_samples,
+        num_classes=vocab_size,
+        sampled_values=(class_positions[num_targets:], true_expected_count,
+                        sampled_expected_count))
+    losses = tf.reshape(losses, tf.shape(targets))
+
+    # Mask out the losses we don't care about
+    loss_mask = tf.sequence_mask(
+        tf.to_int32(sequence_length), tf.to_int32(tf.shape(targets)[0]))
+    losses = losses * tf.transpose(tf.to_float(loss_mask), [1, 0])
+
+    return losses
+
+
+def _chunk_cross_entropy_grad(op, loss_grad):
+  """Computes the gradients of `chunk_cross_entropy` by recomputing the
+  logits of the chunk, so that they need not be kept in memory between the
+  forward and backward pass.
+  """
+  inputs, weights, biases, targets = op.inputs
+  logits = tf.nn.xw_plus_b(inputs, weights, biases)
+  logits_grad = tf.nn.softmax(logits) - tf.one_hot(targets, tf.shape(logits)[1])
+  logits_grad *= tf.expand_dims(loss_grad, 1)
+  return (tf.matmul(logits_grad, weights, transpose_b=True),
+          tf.matmul(inputs, logits_grad, transpose_a=True),
+          tf.reduce_sum(logits_grad, 0),
+          None)
+
+
+@function.Defun(
+    tf.float32,
+    tf.float32,
+    tf.float32,
+    tf.int64,
+    func_name="chunk_cross_entropy",
+    python_grad_func=_chunk_cross_entropy_grad,
+    shape_func=lambda op: [op.inputs[0].get_shape()[:1]])
+def chunk_cross_entropy(inputs, weights, biases, targets):
+  """Projects a chunk of inputs onto the vocabulary and calculates the
+  cross-entropy loss for each row."""
+  logits = tf.nn.xw_plus_b(inputs, weights, biases)
+  return tf.nn.sparse_softmax_cross_entropy_with_logits(
+      logits=logits, labels=targets)
+
+
+def chunked_cross_entropy_sequence_loss(inputs, weights, biases, targets,
+                                        sequence_length, num_chunks):
+  """Calculates the per-example cross-entropy loss for a sequence of
+    outputs and masks out all losses passed the sequence length. The outputs
+    are projected onto the vocabulary in `num_chunks` chunks along the time
+    dimension, and the logits of each chunk are recomputed during the
+    backward pass. The full `[T, B, vocab_size]` logits are never kept in
+    memory.
+
+  Args:
+    inputs: Inputs to the output projection of shape `[T, B, input_size]`
+    weights: Weights of the output projection of shape
+      `[input_size, vocab_size]`
+    biases: Biases of the output projection of shape `[vocab_size]`
+    targets: Target classes of shape `[T, B]`
+    sequence_length: An int32 tensor of shape `[B]` corresponding
+      to the length of each input
+    num_chunks: The number of chunks to split the outputs into.
+
+  Returns:
+    A tensor of shape [T, B] that contains the loss per example, per time step.
+  """
+  with tf.name_scope("chunked_cross_entropy_sequence_loss"):
+    input_size = inputs.get_shape().as_list()[-1]
+    flat_inputs = tf.reshape(inputs, [-1, input_size])
+    flat_targets = tf.reshape(tf.to_int64(targets), [-1])
+
+    # Pad the outputs to a multiple of the number of chunks
+    num_rows = tf.shape(flat_targets)[0]
+    chunk_size = (num_rows + num_chunks - 1) // num_chunks
+    padding = chunk_size * num_chunks - num_rows
+    flat_inputs = tf.pad(flat_inputs, [[0, padding], [0, 0]])
+    flat_targets = tf.pad(flat_targets, [[0, padding]])
+
+    losses = [
+        chunk_cross_entropy(chunk_inputs, weights, biases, chunk_targets)
+        for chunk_inputs, chunk_targets in zip(
+            tf.split(flat_inputs, num_chunks, 0),
+            tf.split(flat_targets, num_chunks, 0))
+    ]
+    losses = tf.reshape(tf.concat(losses, 0)[:num_rows], tf.shape(targets))
+
+    # Mask out the losses we don't care about
+    loss_mask = tf.sequence_mask(
+        tf.to_int32(sequence_length), tf.to_int32(tf.shape(targets)[0]))
+    losses = losses * tf.transpose(tf.to_float(loss_mask), [1, 0])
+
+    return losses
@@ -17,6 +17,7 @@
 from seq2seq.models.basic_seq2seq import BasicSeq2Seq
 from seq2seq.models.attention_seq2seq import AttentionSeq2Seq
 from seq2seq.models.image2seq import Image2Seq
+from seq2seq.models.transformer_seq2seq import TransformerSeq2Seq
 
 import seq2seq.models.bridges
 import seq2seq.models.model_base
@@ -111,6 +111,7 @@ class BasicSeq2Seq(Seq2SeqModel):
   @templatemethod("decode")
   def decode(self, encoder_output, features, labels):
     decoder = self._create_decoder(encoder_output, features, labels)
+    decoder.compute_logits = not self.projects_outputs_in_loss
     if self.use_beam_search:
       decoder = self._get_beam_search_decoder(decoder)
 
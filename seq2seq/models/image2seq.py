@@ -24,6 +24,7 @@ import tensorflow as tf
 
 from seq2seq import graph_utils
 from seq2seq.data import vocab
+from seq2seq.encoders.image_encoder import PrecomputedImageEncoder
 from seq2seq.graph_utils import templatemethod
 from seq2seq.models.model_base import ModelBase
 from seq2seq.models.attention_seq2seq import AttentionSeq2Seq
@@ -32,6 +33,9 @@ from seq2seq.models.attention_seq2seq import AttentionSeq2Seq
 class Image2Seq(AttentionSeq2Seq):
   """A model that encodes an image and produces a sequence
   of tokens.
+
+  If the features contain precomputed `image_features`, e.g. read from a
+  feature cache, the encoder must be a `PrecomputedImageEncoder`.
   """
 
   def __init__(self, params, mode, name="image_seq2seq"):
@@ -58,6 +62,9 @@ class Image2Seq(AttentionSeq2Seq):
         "inference.beam_search.beam_width": 0,
         "inference.beam_search.length_penalty_weight": 0.0,
         "inference.beam_search.choose_successors_fn": "choose_top_k",
+        "loss.sampled_softmax.num_samples": 0,
+        "loss.sampled_softmax.distortion": 1.0,
+        "loss.chunked_softmax.num_chunks": 0,
         "vocab_target": "",
     })
     return params
@@ -65,9 +72,20 @@ class Image2Seq(AttentionSeq2Seq):
   @templatemethod("encode")
   def encode(self, features, _labels):
     encoder_fn = self.encoder_class(self.params["encoder.params"], self.mode)
+    if isinstance(encoder_fn, PrecomputedImageEncoder):
+      if "image_features" not in features:
+        raise ValueError("PrecomputedImageEncoder requires image_features. "
+                         "Read the data from a feature cache.")
+      return encoder_fn(features["image_features"],
+                        features.get("image_final_state"))
+    if "image" not in features:
+      raise ValueError("The features contain precomputed image features. "
+                       "Use the PrecomputedImageEncoder.")
     return encoder_fn(features["image"])
 
   def batch_size(self, features, _labels):
+    if "image_features" in features:
+      return tf.shape(features["image_features"])[0]
     return tf.shape(features["image"])[0]
 
   def _preprocess(self, features, labels):
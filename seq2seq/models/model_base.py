@@ -22,6 +22,7 @@ import collections
 import tensorflow as tf
 
 from seq2seq.configurable import Configurable
+from seq2seq.training import optimizers
 from seq2seq.training import utils as training_utils
 from seq2seq import global_vars
 
@@ -52,6 +53,16 @@ def _flatten_dict(dict_, parent_key="", sep="."):
   return dict(items)
 
 
+def _optimizer_class(name):
+  """Returns the optimizer class for a name in
+  `tf.contrib.layers.OPTIMIZER_CLS_NAMES` or "LazyAdam".
+  """
+  if name == "LazyAdam":
+    # Only updates the moments of embedding rows that are used in a batch
+    return optimizers.LazyAdamOptimizer
+  return tf.contrib.layers.OPTIMIZER_CLS_NAMES[name]
+
+
 class ModelBase(Configurable):
   """Abstract base class for models.
 
@@ -71,13 +82,26 @@ class ModelBase(Configurable):
         gradients, self.params["optimizer.clip_gradients"])
     return list(zip(clipped_gradients, variables))
 
-  def _create_optimizer(self):
-    """Creates the optimizer"""
+  def _create_optimizer(self, learning_rate):
+    """Creates the optimizer.
+
+    Args:
+      learning_rate: The learning rate, a scalar tensor that may be decayed
+        based on the global step.
+    """
     name = self.params["optimizer.name"]
-    optimizer = tf.contrib.layers.OPTIMIZER_CLS_NAMES[name](
-        learning_rate=self.params["optimizer.learning_rate"],
+    optimizer = _optimizer_class(name)(
+        learning_rate=learning_rate,
         **self.params["optimizer.params"])
 
+    # Optionally accumulate gradients over multiple steps. The accumulated
+    # gradients are clipped instead of the gradients of each step.
+    if self.params["optimizer.accumulation_steps"] > 1:
+      optimizer = optimizers.GradientAccumulationOptimizer(
+          opt=optimizer,
+          num_steps=self.params["optimizer.accumulation_steps"],
+          clip_gradients=self._clip_gradients)
+
     # Optionally wrap with SyncReplicasOptimizer
     if self.params["optimizer.sync_replicas"] > 0:
       optimizer = tf.train.SyncReplicasOptimizer(
@@ -102,14 +126,19 @@ class ModelBase(Configurable):
         min_learning_rate=self.params["optimizer.lr_min_learning_rate"],
         staircase=self.params["optimizer.lr_staircase"])
 
-    optimizer = self._create_optimizer()
+    clip_gradients = self._clip_gradients
+    if self.params["optimizer.accumulation_steps"] > 1:
+      clip_gradients = None
+
+    # The optimizer is created by optimize_loss so that it uses the
+    # decayed learning rate. An optimizer instance would ignore the decay.
     train_op = tf.contrib.layers.optimize_loss(
         loss=loss,
         global_step=tf.contrib.framework.get_global_step(),
         learning_rate=self.params["optimizer.learning_rate"],
         learning_rate_decay_fn=learning_rate_decay_fn,
-        clip_gradients=self._clip_gradients,
-        optimizer=optimizer,
+        clip_gradients=clip_gradients,
+        optimizer=self._create_optimizer,
         summaries=["learning_rate", "loss", "gradients", "gradient_norm"])
 
     return train_op
@@ -129,6 +158,7 @@ class ModelBase(Configurable):
         "optimizer.lr_min_learning_rate": 1e-12,
         "optimizer.lr_staircase": False,
         "optimizer.clip_gradients": 5.0,
+        "optimizer.accumulation_steps": 1,
         "optimizer.sync_replicas": 0,
         "optimizer.sync_replicas_to_aggregate": 0,
     }
@@ -61,11 +61,23 @@ class Seq2SeqModel(ModelBase):
         "inference.beam_search.length_penalty_weight": 0.0,
         "inference.beam_search.choose_successors_fn": "choose_top_k",
         "optimizer.clip_embed_gradients": 0.1,
+        "loss.sampled_softmax.num_samples": 0,
+        "loss.sampled_softmax.distortion": 1.0,
+        "loss.chunked_softmax.num_chunks": 0,
         "vocab_source": "",
         "vocab_target": "",
     })
     return params
 
+  @property
+  def projects_outputs_in_loss(self):
+    """Returns true iff the loss applies the output projection itself, in
+    which case the decoder does not compute logits.
+    """
+    return (self.mode == tf.contrib.learn.ModeKeys.TRAIN and
+            (self.params["loss.sampled_softmax.num_samples"] > 0 or
+             self.params["loss.chunked_softmax.num_chunks"] > 0))
+
   def _clip_gradients(self, grads_and_vars):
     """In addition to standard gradient clipping, also clips embedding
     gradients to a specified value."""
@@ -74,10 +86,15 @@ class Seq2SeqModel(ModelBase):
     clipped_gradients = []
     variables = []
     for gradient, variable in grads_and_vars:
-      if "embedding" in variable.name:
+      if "embedding" in variable.name and \
+        isinstance(gradient, tf.IndexedSlices):
         tmp = tf.clip_by_norm(
             gradient.values, self.params["optimizer.clip_embed_gradients"])
         gradient = tf.IndexedSlices(tmp, gradient.indices, gradient.dense_shape)
+      elif "embedding" in variable.name:
+        # Accumulated embedding gradients are dense
+        gradient = tf.clip_by_norm(
+            gradient, self.params["optimizer.clip_embed_gradients"])
       clipped_gradients.append(gradient)
       variables.append(variable)
     return list(zip(clipped_gradients, variables))
@@ -213,7 +230,8 @@ class Seq2SeqModel(ModelBase):
         "target_word_to_count": target_word_to_count
     }, "vocab_tables")
 
-    # Slice source to max_len
+    # Slice source to max_len. Setting `source_max_len` on the input pipeline
+    # instead truncates before batching and keeps the SEQUENCE_END token.
     if self.params["source.max_seq_len"] is not None:
       features["source_tokens"] = features["source_tokens"][:, :self.params[
           "source.max_seq_len"]]
@@ -271,6 +289,29 @@ class Seq2SeqModel(ModelBase):
 
     return features, labels
 
+  def _target_unigram_counts(self):
+    """Returns the count of each target vocabulary id, read from the
+    target vocabulary tables.
+    """
+    vocab_tables = graph_utils.get_dict_from_collection("vocab_tables")
+    target_ids = tf.range(self.target_vocab_info.total_size, dtype=tf.int64)
+    target_words = vocab_tables["target_id_to_vocab"].lookup(target_ids)
+    return vocab_tables["target_word_to_count"].lookup(target_words)
+
+  def _predict_ids_from_cell_output(self, decoder_output):
+    """Computes the predicted ids of a decoder that did not compute logits.
+    The projection is only run when the predictions are fetched, e.g. by
+    a hook that prints training samples.
+    """
+    projection = graph_utils.get_dict_from_collection("output_projection")
+    cell_output = decoder_output.cell_output
+    input_size = cell_output.get_shape().as_list()[-1]
+    logits = tf.nn.xw_plus_b(
+        tf.reshape(cell_output, [-1, input_size]), projection["weights"],
+        projection["biases"])
+    predicted_ids = tf.to_int32(tf.argmax(logits, 1))
+    return tf.reshape(predicted_ids, tf.shape(cell_output)[:2])
+
   def compute_loss(self, decoder_output, _features, labels):
     """Computes the loss for this model.
 
@@ -279,10 +320,33 @@ class Seq2SeqModel(ModelBase):
     """
     #pylint: disable=R0201
     # Calculate loss per example-timestep of shape [B, T]
-    losses = seq2seq_losses.cross_entropy_sequence_loss(
-        logits=decoder_output.logits[:, :, :],
-        targets=tf.transpose(labels["target_ids"][:, 1:], [1, 0]),
-        sequence_length=labels["target_len"] - 1)
+    projection = None
+    if self.projects_outputs_in_loss:
+      projection = graph_utils.get_dict_from_collection("output_projection")
+
+    if projection and self.params["loss.sampled_softmax.num_samples"] > 0:
+      losses = seq2seq_losses.sampled_softmax_sequence_loss(
+          inputs=decoder_output.cell_output,
+          weights=projection["weights"],
+          biases=projection["biases"],
+          targets=tf.transpose(labels["target_ids"][:, 1:], [1, 0]),
+          sequence_length=labels["target_len"] - 1,
+          num_samples=self.params["loss.sampled_softmax.num_samples"],
+          unigram_counts=self._target_unigram_counts(),
+          distortion=self.params["loss.sampled_softmax.distortion"])
+    elif projection:
+      losses = seq2seq_losses.chunked_cross_entropy_sequence_loss(
+          inputs=decoder_output.cell_output,
+          weights=projection["weights"],
+          biases=projection["biases"],
+          targets=tf.transpose(labels["target_ids"][:, 1:], [1, 0]),
+          sequence_length=labels["target_len"] - 1,
+          num_chunks=self.params["loss.chunked_softmax.num_chunks"])
+    else:
+      losses = seq2seq_losses.cross_entropy_sequence_loss(
+          logits=decoder_output.logits[:, :, :],
+          targets=tf.transpose(labels["target_ids"][:, 1:], [1, 0]),
+          sequence_length=labels["target_len"] - 1)
 
     # Calculate the average log perplexity
     loss = tf.reduce_sum(losses) / tf.to_float(
@@ -305,6 +369,10 @@ class Seq2SeqModel(ModelBase):
     else:
       losses, loss = self.compute_loss(decoder_output, features, labels)
 
+      if self.projects_outputs_in_loss:
+        decoder_output = decoder_output._replace(
+            predicted_ids=self._predict_ids_from_cell_output(decoder_output))
+
       train_op = None
       if self.mode == tf.contrib.learn.ModeKeys.TRAIN:
         train_op = self._build_train_op(loss)
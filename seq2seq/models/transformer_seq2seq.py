@@ -0,0 +1,87 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Sequence to Sequence model with self-attention
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import tensorflow as tf
+
+from seq2seq.graph_utils import templatemethod
+from seq2seq.models.basic_seq2seq import BasicSeq2Seq
+
+
+class TransformerSeq2Seq(BasicSeq2Seq):
+  """Sequence2Sequence model that uses self-attention instead of recurrence,
+  as described in https://arxiv.org/abs/1706.03762. The decoder attends over
+  the encoder outputs and is not initialized with a bridge.
+
+  During training all target positions are decoded in a single pass.
+  During inference the decoder caches the keys and values of previous
+  positions so that each step only processes the newest position.
+
+  Args:
+    params: A dictionary of hyperparameters
+  """
+
+  def __init__(self, params, mode, name="transformer_seq2seq"):
+    super(TransformerSeq2Seq, self).__init__(params, mode, name)
+
+  @staticmethod
+  def default_params():
+    params = BasicSeq2Seq.default_params().copy()
+    del params["bridge.class"]
+    del params["bridge.params"]
+    params.update({
+        "encoder.class": "seq2seq.encoders.TransformerEncoder",
+        "encoder.params": {},  # Arbitrary parameters for the encoder
+        "decoder.class": "seq2seq.decoders.TransformerDecoder",
+        "decoder.params": {}  # Arbitrary parameters for the decoder
+    })
+    return params
+
+  def _create_decoder(self, encoder_output, _features, _labels):
+    memory = encoder_output.attention_values
+    memory_length = encoder_output.attention_values_length
+    if self.use_beam_search:
+      # Beam search decodes a single example and each beam attends over it
+      beam_width = self.params["inference.beam_search.beam_width"]
+      memory = tf.tile(memory, [beam_width, 1, 1])
+      memory_length = tf.tile(memory_length, [beam_width])
+    return self.decoder_class(
+        params=self.params["decoder.params"],
+        mode=self.mode,
+        vocab_size=self.target_vocab_info.total_size,
+        memory=memory,
+        memory_length=memory_length)
+
+  @templatemethod("decode")
+  def decode(self, encoder_output, features, labels):
+    decoder = self._create_decoder(encoder_output, features, labels)
+    decoder.compute_logits = not self.projects_outputs_in_loss
+    if self.use_beam_search:
+      decoder = self._get_beam_search_decoder(decoder)
+
+    # The decoder has no recurrent state to initialize
+    bridge = lambda: ()
+    if self.mode == tf.contrib.learn.ModeKeys.INFER:
+      return self._decode_infer(decoder, bridge, encoder_output, features,
+                                labels)
+    else:
+      return self._decode_train(decoder, bridge, encoder_output, features,
+                                labels)
@@ -25,6 +25,8 @@ import numpy as np
 
 from seq2seq.decoders.attention import AttentionLayerDot
 from seq2seq.decoders.attention import AttentionLayerBahdanau
+from seq2seq.decoders.attention import AttentionLayerLocal
+from seq2seq.decoders.attention import AttentionLayerMonotonic
 
 
 class AttentionLayerTest(tf.test.TestCase):
@@ -79,6 +81,42 @@ class AttentionLayerTest(tf.test.TestCase):
     scores_sum = np.sum(scores_, axis=1)
     np.testing.assert_array_almost_equal(scores_sum, np.ones([self.batch_size]))
 
+  def _test_prepared_memory(self):
+    """Tests that a prepared memory gives the same results and shares the
+    key projection"""
+    inputs_pl = tf.placeholder(tf.float32, (None, None, self.input_dim))
+    inputs_length_pl = tf.placeholder(tf.int32, [None])
+    state_pl = tf.placeholder(tf.float32, (None, self.state_dim))
+    attention_fn = self._create_layer()
+    memory = attention_fn.prepare_memory(
+        keys=inputs_pl, values=inputs_pl, values_length=inputs_length_pl)
+    scores, context = attention_fn(
+        query=state_pl,
+        keys=inputs_pl,
+        values=inputs_pl,
+        values_length=inputs_length_pl,
+        memory=memory)
+    scores_direct, context_direct = attention_fn(
+        query=state_pl,
+        keys=inputs_pl,
+        values=inputs_pl,
+        values_length=inputs_length_pl)
+    key_variables = [_ for _ in tf.global_variables() if "att_keys" in _.name]
+    self.assertEqual(len(key_variables), 2)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      feed_dict = {}
+      feed_dict[inputs_pl] = np.random.randn(self.batch_size, self.seq_len,
+                                             self.input_dim)
+      feed_dict[state_pl] = np.random.randn(self.batch_size, self.state_dim)
+      feed_dict[inputs_length_pl] = np.arange(self.batch_size) + 1
+      results = sess.run(
+          [scores, context, scores_direct, context_direct], feed_dict)
+
+    np.testing.assert_array_almost_equal(results[0], results[2])
+    np.testing.assert_array_almost_equal(results[1], results[3])
+
 
 class AttentionLayerDotTest(AttentionLayerTest):
   """Tests the AttentionLayerDot class"""
@@ -91,6 +129,9 @@ class AttentionLayerDotTest(AttentionLayerTest):
   def test_layer(self):
     self._test_layer()
 
+  def test_prepared_memory(self):
+    self._test_prepared_memory()
+
 
 class AttentionLayerBahdanauTest(AttentionLayerTest):
   """Tests the AttentionLayerBahdanau class"""
@@ -103,6 +144,88 @@ class AttentionLayerBahdanauTest(AttentionLayerTest):
   def test_layer(self):
     self._test_layer()
 
+  def test_prepared_memory(self):
+    self._test_prepared_memory()
+
+
+class AttentionLayerLocalTest(tf.test.TestCase):
+  """Tests the windowed attention layers"""
+
+  def setUp(self):
+    super(AttentionLayerLocalTest, self).setUp()
+    self.batch_size = 4
+    self.input_dim = 16
+    self.seq_len = 20
+    self.state_dim = 32
+    self.window_width = 2
+
+  def _run_layer(self, attention_fn, time, memory_batch_size=None):
+    """Runs the layer on random inputs and returns scores and lengths"""
+    memory_batch_size = memory_batch_size or self.batch_size
+    inputs = np.random.randn(memory_batch_size, self.seq_len,
+                             self.input_dim).astype(np.float32)
+    inputs_length = np.arange(memory_batch_size, dtype=np.int32) + 10
+    state = np.random.randn(self.batch_size,
+                            self.state_dim).astype(np.float32)
+    memory = attention_fn.prepare_memory(
+        keys=inputs, values=inputs, values_length=inputs_length)
+    scores, context = attention_fn(
+        query=state,
+        keys=inputs,
+        values=inputs,
+        values_length=inputs_length,
+        memory=memory,
+        time=tf.constant(time))
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      scores_, context_ = sess.run([scores, context])
+
+    np.testing.assert_array_equal(scores_.shape,
+                                  [self.batch_size, self.seq_len])
+    np.testing.assert_array_equal(context_.shape,
+                                  [self.batch_size, self.input_dim])
+    return scores_, np.broadcast_to(inputs_length, [self.batch_size])
+
+  def test_fixed_center(self):
+    attention_fn = AttentionLayerLocal(
+        params={
+            "num_units": 8,
+            "window_width": self.window_width,
+            "window_center": "fixed",
+            "window_stride": 2.0
+        },
+        mode=tf.contrib.learn.ModeKeys.TRAIN)
+    scores, _ = self._run_layer(attention_fn, time=3)
+
+    # The window is centered at position 6
+    np.testing.assert_array_equal(scores[:, :4], 0.0)
+    np.testing.assert_array_equal(scores[:, 9:], 0.0)
+    np.testing.assert_array_almost_equal(
+        scores.sum(axis=1), np.ones([self.batch_size]))
+
+  def test_predicted_center(self):
+    attention_fn = AttentionLayerLocal(
+        params={"num_units": 8, "window_width": self.window_width},
+        mode=tf.contrib.learn.ModeKeys.TRAIN)
+    scores, lengths = self._run_layer(attention_fn, time=0)
+    for batch, length in zip(scores, lengths):
+      self.assertLessEqual(np.count_nonzero(batch), 2 * self.window_width + 1)
+      np.testing.assert_array_equal(batch[length:], 0.0)
+      self.assertLessEqual(batch.sum(), 1.0 + 1e-6)
+
+  def test_monotonic_shared_memory(self):
+    # With beam search a single memory is shared by all queries
+    attention_fn = AttentionLayerMonotonic(
+        params={"num_units": 8, "window_width": self.window_width},
+        mode=tf.contrib.learn.ModeKeys.INFER)
+    scores, _ = self._run_layer(attention_fn, time=100, memory_batch_size=1)
+
+    # The window stops at the last source position
+    np.testing.assert_array_equal(scores[:, :10 - 1 - 2 * self.window_width],
+                                  0.0)
+    np.testing.assert_array_equal(scores[:, 10:], 0.0)
+
 
 if __name__ == "__main__":
   tf.test.main()
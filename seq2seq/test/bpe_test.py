@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit tests for BPE subword segmentation.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import tempfile
+
+import tensorflow as tf
+import numpy as np
+
+from seq2seq.data import bpe
+from seq2seq.data import split_tokens_decoder
+
+BPE_CODES = ["#version: 0.2", "l o", "lo w", "e r</w>", "n e", "ne w",
+             "low er</w>"]
+
+
+def create_temporary_codes_file(codes):
+  """Writes BPE codes to a temporary file."""
+  file = tempfile.NamedTemporaryFile()
+  file.write("\n".join(codes).encode("utf-8"))
+  file.flush()
+  return file
+
+
+class BPESegmenterTest(tf.test.TestCase):
+  """Tests the BPESegmenter class"""
+
+  def setUp(self):
+    super(BPESegmenterTest, self).setUp()
+    self.codes_file = create_temporary_codes_file(BPE_CODES)
+
+  def tearDown(self):
+    super(BPESegmenterTest, self).tearDown()
+    self.codes_file.close()
+
+  def test_load_codes(self):
+    bpe_codes, version = bpe.load_bpe_codes(self.codes_file.name)
+    self.assertEqual(version, (0, 2))
+    self.assertEqual(bpe_codes[("l", "o")], 0)
+    self.assertEqual(bpe_codes[("low", "er</w>")], 5)
+
+  def test_segment(self):
+    segmenter = bpe.BPESegmenter(self.codes_file.name)
+    self.assertEqual(
+        segmenter.segment("lower newer low wider"),
+        "lower new@@ er lo@@ w w@@ i@@ d@@ er")
+
+  def test_cache_size(self):
+    segmenter = bpe.BPESegmenter(self.codes_file.name, cache_size=2)
+    segmenter.segment("lower newer lower low")
+    self.assertEqual(list(segmenter._cache.keys()), ["lower", "low"])
+
+  def test_decode_with_segmenter(self):
+    segmenter = bpe.BPESegmenter(self.codes_file.name)
+    decoder = split_tokens_decoder.SplitTokensDecoder(
+        delimiter=" ",
+        tokens_feature_name="source_tokens",
+        length_feature_name="source_len",
+        append_token="SEQUENCE_END",
+        max_length=4,
+        segmenter=segmenter)
+
+    data = tf.constant("newer wider")
+    decoded_tokens, decoded_length = decoder.decode(data, decoder.list_items())
+
+    with self.test_session() as sess:
+      decoded_tokens_, decoded_length_ = sess.run(
+          [decoded_tokens, decoded_length])
+
+    self.assertEqual(decoded_length_, 4)
+    np.testing.assert_array_equal(
+        np.char.decode(decoded_tokens_.astype("S"), "utf-8"),
+        ["new@@", "er", "w@@", "SEQUENCE_END"])
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -21,6 +21,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
+import shutil
 import tempfile
 import tensorflow as tf
 import numpy as np
@@ -62,6 +64,27 @@ class SplitTokensDecoderTest(tf.test.TestCase):
         np.char.decode(decoded_both_[0].astype("S"), "utf-8"),
         ["Hello", "world", "!", "笑ｗ"])
 
+  def test_decode_max_length(self):
+    decoder = split_tokens_decoder.SplitTokensDecoder(
+        delimiter=" ",
+        tokens_feature_name="source_tokens",
+        length_feature_name="source_len",
+        prepend_token="SEQUENCE_START",
+        append_token="SEQUENCE_END",
+        max_length=4)
+
+    data = tf.constant("Hello world ! 笑ｗ")
+    decoded_tokens, decoded_length = decoder.decode(data, decoder.list_items())
+
+    with self.test_session() as sess:
+      decoded_tokens_, decoded_length_ = sess.run(
+          [decoded_tokens, decoded_length])
+
+    self.assertEqual(decoded_length_, 4)
+    np.testing.assert_array_equal(
+        np.char.decode(decoded_tokens_.astype("S"), "utf-8"),
+        ["SEQUENCE_START", "Hello", "world", "SEQUENCE_END"])
+
 
 class ParallelDataProviderTest(tf.test.TestCase):
   """Tests the ParallelDataProvider class
@@ -130,6 +153,116 @@ class ParallelDataProviderTest(tf.test.TestCase):
           item_dict["target_tokens"],
           ["SEQUENCE_START"] + expected_target.split(" ") + ["SEQUENCE_END"])
 
+  def test_reading_sharded(self):
+    items_by_shard = []
+    for shard_index in range(2):
+      tf.reset_default_graph()
+      data_provider = make_parallel_data_provider(
+          data_sources_source=[self.source_file.name],
+          data_sources_target=[self.target_file.name],
+          num_epochs=1,
+          shuffle=False,
+          num_shards=2,
+          shard_index=shard_index)
+      source_tokens, target_tokens = data_provider.get(
+          ["source_tokens", "target_tokens"])
+
+      items = []
+      with self.test_session() as sess:
+        sess.run(tf.global_variables_initializer())
+        sess.run(tf.local_variables_initializer())
+        with tf.contrib.slim.queues.QueueRunners(sess):
+          try:
+            while True:
+              source_, target_ = sess.run([source_tokens, target_tokens])
+              items.append((source_[0].decode("utf-8"),
+                            target_[1].decode("utf-8")))
+          except tf.errors.OutOfRangeError:
+            pass
+      items_by_shard.append(items)
+
+    # Shards are disjoint, aligned, and together cover all the data
+    all_items = items_by_shard[0] + items_by_shard[1]
+    self.assertEqual(len(all_items), len(self.source_lines))
+    self.assertEqual(
+        set(all_items), set(zip(self.source_lines, self.target_lines)))
+
+  def test_reading_shuffled_files(self):
+    source_files = []
+    target_files = []
+    for file_index in range(3):
+      source_file = tempfile.NamedTemporaryFile()
+      target_file = tempfile.NamedTemporaryFile()
+      source_file.write("\n".join(
+          "s{}_{}".format(file_index, i) for i in range(5)).encode("utf-8"))
+      target_file.write("\n".join(
+          "t{}_{}".format(file_index, i) for i in range(5)).encode("utf-8"))
+      source_file.flush()
+      target_file.flush()
+      source_files.append(source_file)
+      target_files.append(target_file)
+
+    num_epochs = 4
+    data_provider = make_parallel_data_provider(
+        data_sources_source=[_.name for _ in source_files],
+        data_sources_target=[_.name for _ in target_files],
+        num_epochs=num_epochs,
+        shuffle=False,
+        shuffle_files=True)
+    source_tokens, target_tokens = data_provider.get(
+        ["source_tokens", "target_tokens"])
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(tf.local_variables_initializer())
+      with tf.contrib.slim.queues.QueueRunners(sess):
+        items = [sess.run([source_tokens, target_tokens])
+                 for _ in range(num_epochs * 15)]
+
+    # Source and target stay aligned even though the file order changes
+    for source_, target_ in items:
+      self.assertEqual(source_[0].decode("utf-8")[1:],
+                       target_[1].decode("utf-8")[1:])
+
+    for file in source_files + target_files:
+      file.close()
+
+  def test_reading_sharded_files(self):
+    # Source names sort in the opposite order of their target names
+    temp_dir = tempfile.mkdtemp()
+    source_files = []
+    target_files = []
+    for file_index, (source_name, target_name) in enumerate(
+        [("sources-b", "targets-x"), ("sources-a", "targets-y")]):
+      source_files.append(os.path.join(temp_dir, source_name))
+      target_files.append(os.path.join(temp_dir, target_name))
+      with open(source_files[-1], "w") as file:
+        file.write("s{}".format(file_index))
+      with open(target_files[-1], "w") as file:
+        file.write("t{}".format(file_index))
+
+    items = []
+    for shard_index in range(2):
+      tf.reset_default_graph()
+      data_provider = make_parallel_data_provider(
+          data_sources_source=source_files,
+          data_sources_target=target_files,
+          num_epochs=1,
+          shuffle=False,
+          num_shards=2,
+          shard_index=shard_index)
+      source_tokens, target_tokens = data_provider.get(
+          ["source_tokens", "target_tokens"])
+      with self.test_session() as sess:
+        sess.run(tf.local_variables_initializer())
+        with tf.contrib.slim.queues.QueueRunners(sess):
+          source_, target_ = sess.run([source_tokens, target_tokens])
+      items.append((source_[0].decode("utf-8"), target_[1].decode("utf-8")))
+    shutil.rmtree(temp_dir)
+
+    # Each shard reads one aligned pair of files
+    self.assertEqual(sorted(items), [("s0", "t0"), ("s1", "t1")])
+
   def test_reading_without_targets(self):
     num_epochs = 50
     data_provider = make_parallel_data_provider(
@@ -24,9 +24,11 @@ import tensorflow as tf
 import numpy as np
 
 from seq2seq.decoders import BasicDecoder, AttentionDecoder, AttentionLayerDot
+from seq2seq.decoders import TransformerDecoder
 from seq2seq.decoders import beam_search_decoder
 from seq2seq.inference import beam_search
 from seq2seq.contrib.seq2seq import helper as decode_helper
+from seq2seq.contrib.seq2seq.decoder import dynamic_decode
 
 
 class DecoderTests(object):
@@ -239,5 +241,108 @@ class AttentionDecoderTest(tf.test.TestCase, DecoderTests):
         scores_sum, np.ones([self.sequence_length, self.batch_size]))
 
 
+class TransformerDecoderTest(tf.test.TestCase):
+  """Tests the `TransformerDecoder` class.
+  """
+
+  def setUp(self):
+    super(TransformerDecoderTest, self).setUp()
+    tf.logging.set_verbosity(tf.logging.INFO)
+    self.batch_size = 4
+    self.sequence_length = 6
+    self.input_depth = 10
+    self.vocab_size = 100
+    self.max_decode_length = 8
+    self.memory_length = 7
+
+  def create_decoder(self, mode, batch_size=None):
+    """Creates a small decoder that attends over random memory"""
+    batch_size = batch_size or self.batch_size
+    params = TransformerDecoder.default_params()
+    params.update({
+        "num_layers": 2,
+        "num_units": 16,
+        "num_heads": 4,
+        "ffn_units": 32,
+        "max_decode_length": self.max_decode_length
+    })
+    memory = tf.convert_to_tensor(
+        np.random.randn(batch_size, self.memory_length, 12), dtype=tf.float32)
+    return TransformerDecoder(
+        params=params,
+        mode=mode,
+        vocab_size=self.vocab_size,
+        memory=memory,
+        memory_length=np.arange(batch_size, dtype=np.int32) % 3 + 5)
+
+  def test_incremental_matches_parallel(self):
+    inputs = tf.random_normal(
+        [self.batch_size, self.sequence_length, self.input_depth])
+    seq_length = tf.ones(self.batch_size, dtype=tf.int32) * self.sequence_length
+    helper = decode_helper.TrainingHelper(
+        inputs=inputs, sequence_length=seq_length)
+    decoder_fn = self.create_decoder(tf.contrib.learn.ModeKeys.EVAL)
+    parallel_output, _ = decoder_fn((), helper)
+
+    # Decode the same inputs step by step, reusing the variables
+    # pylint: disable=protected-access
+    with tf.variable_scope(decoder_fn._template.variable_scope, reuse=True):
+      decoder_fn._setup((), helper)
+      incremental_output, _ = dynamic_decode(
+          decoder=decoder_fn, output_time_major=True)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      parallel_output_, incremental_output_ = sess.run(
+          [parallel_output, incremental_output])
+
+    np.testing.assert_array_equal(
+        parallel_output_.logits.shape,
+        [self.sequence_length, self.batch_size, self.vocab_size])
+    np.testing.assert_allclose(
+        parallel_output_.logits, incremental_output_.logits, atol=1e-4)
+
+  def test_with_dynamic_inputs(self):
+    embeddings = tf.get_variable("W_embed", [self.vocab_size, self.input_depth])
+    helper = decode_helper.GreedyEmbeddingHelper(
+        embedding=embeddings, start_tokens=[0] * self.batch_size, end_token=-1)
+    decoder_fn = self.create_decoder(tf.contrib.learn.ModeKeys.INFER)
+    decoder_output, _ = decoder_fn((), helper)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      decoder_output_ = sess.run(decoder_output)
+
+    np.testing.assert_array_equal(
+        decoder_output_.logits.shape,
+        [self.max_decode_length, self.batch_size, self.vocab_size])
+
+  def test_with_beam_search(self):
+    config = beam_search.BeamSearchConfig(
+        beam_width=5,
+        vocab_size=self.vocab_size,
+        eos_token=self.vocab_size - 2,
+        length_penalty_weight=0.6,
+        choose_successors_fn=beam_search.choose_top_k)
+    embeddings = tf.get_variable("W_embed", [self.vocab_size, self.input_depth])
+    helper = decode_helper.GreedyEmbeddingHelper(
+        embedding=embeddings,
+        start_tokens=[0] * config.beam_width,
+        end_token=-1)
+    decoder_fn = beam_search_decoder.BeamSearchDecoder(
+        decoder=self.create_decoder(
+            tf.contrib.learn.ModeKeys.INFER, batch_size=config.beam_width),
+        config=config)
+    decoder_output, _ = decoder_fn((), helper)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      decoder_output_ = sess.run(decoder_output)
+
+    np.testing.assert_array_equal(
+        decoder_output_.predicted_ids.shape,
+        [self.max_decode_length, 1, config.beam_width])
+
+
 if __name__ == "__main__":
   tf.test.main()
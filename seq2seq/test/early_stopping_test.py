@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for metric-based early stopping.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+import tensorflow as tf
+
+from seq2seq.training.early_stopping import EarlyStopping
+
+
+class EarlyStoppingTest(tf.test.TestCase):
+  """Tests the EarlyStopping class"""
+
+  def setUp(self):
+    super(EarlyStoppingTest, self).setUp()
+    self.model_dir = tempfile.mkdtemp()
+    self.saved = []
+
+  def tearDown(self):
+    super(EarlyStoppingTest, self).tearDown()
+    shutil.rmtree(self.model_dir)
+
+  def _save_fn(self, checkpoint_path):
+    self.saved.append(checkpoint_path)
+    with open(checkpoint_path + ".index", "w") as file:
+      file.write("")
+
+  def test_patience(self):
+    early_stopping = EarlyStopping("loss", patience=2, min_delta=0.1)
+    self.assertFalse(early_stopping.update({"loss": 3.0, "global_step": 1}))
+    self.assertFalse(early_stopping.update({"loss": 2.0, "global_step": 2}))
+    # An improvement smaller than min_delta does not count
+    self.assertFalse(early_stopping.update({"loss": 1.95, "global_step": 3}))
+    self.assertFalse(early_stopping.update({"loss": 1.0, "global_step": 4}))
+    self.assertFalse(early_stopping.update({"loss": 1.5, "global_step": 5}))
+    self.assertTrue(early_stopping.update({"loss": 1.2, "global_step": 6}))
+    self.assertEqual(early_stopping.best_result["global_step"], 4)
+    with self.assertRaises(ValueError):
+      early_stopping.update({"bleu": 1.0, "global_step": 7})
+
+  def test_predicate(self):
+    early_stopping = EarlyStopping("bleu", patience=1, higher_is_better=True)
+    self.assertTrue(early_stopping(None))
+    self.assertTrue(early_stopping({"bleu": 10.0, "global_step": 1}))
+    self.assertTrue(early_stopping({"bleu": 20.0, "global_step": 2}))
+    self.assertFalse(early_stopping({"bleu": 15.0, "global_step": 3}))
+
+  def test_keep_best(self):
+    best_dir = os.path.join(self.model_dir, "best")
+    early_stopping = EarlyStopping("loss", patience=5, best_dir=best_dir)
+    early_stopping.update({"loss": 2.0, "global_step": 10}, self._save_fn)
+    early_stopping.update({"loss": 1.0, "global_step": 20}, self._save_fn)
+    early_stopping.update({"loss": 1.5, "global_step": 30}, self._save_fn)
+
+    best_path = os.path.join(best_dir, "model.ckpt-20")
+    self.assertEqual(self.saved,
+                     [os.path.join(best_dir, "model.ckpt-10"), best_path])
+    self.assertEqual(tf.train.get_checkpoint_state(best_dir)
+                     .model_checkpoint_path, best_path)
+    self.assertFalse(os.path.exists(
+        os.path.join(best_dir, "model.ckpt-10.index")))
+    with open(os.path.join(best_dir, "eval_result.json")) as file:
+      self.assertEqual(json.load(file), {"loss": 1.0, "global_step": 20})
+
+
+if __name__ == "__main__":
+  tf.test.main()
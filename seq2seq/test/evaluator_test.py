@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for the persistent Evaluator and the persistent train and eval
+schedule.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+
+from seq2seq.contrib.experiment import Experiment
+from seq2seq.training.evaluator import Evaluator, BestCheckpoints
+from seq2seq.training.evaluator import delete_checkpoint
+
+
+def _model_fn(features, labels, mode):
+  """A linear regression model"""
+  weight = tf.get_variable("weight", [], initializer=tf.zeros_initializer())
+  predictions = {"outputs": weight * features["inputs"]}
+  loss = tf.reduce_mean(tf.square(predictions["outputs"] - labels["targets"]))
+  train_op = None
+  if mode == tf.contrib.learn.ModeKeys.TRAIN:
+    train_op = tf.contrib.layers.optimize_loss(
+        loss=loss,
+        global_step=tf.contrib.framework.get_global_step(),
+        learning_rate=0.1,
+        optimizer="SGD")
+  return tf.contrib.learn.ModelFnOps(
+      mode=mode, predictions=predictions, loss=loss, train_op=train_op)
+
+
+def _eval_input_fn():
+  """Produces two batches with targets = 2 * inputs, then stops"""
+  inputs = tf.train.limit_epochs(
+      tf.constant([[1.0, 2.0], [3.0, 4.0]]), num_epochs=1)
+  inputs = tf.train.batch([inputs], batch_size=1, enqueue_many=True)[0]
+  return {"inputs": inputs}, {"targets": 2.0 * inputs}
+
+
+def _train_input_fn():
+  inputs = tf.constant([1.0, 2.0, 3.0, 4.0])
+  return {"inputs": inputs}, {"targets": 2.0 * inputs}
+
+
+class EvaluatorTest(tf.test.TestCase):
+  """Tests the Evaluator class"""
+
+  def setUp(self):
+    super(EvaluatorTest, self).setUp()
+    self.model_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    super(EvaluatorTest, self).tearDown()
+    shutil.rmtree(self.model_dir)
+
+  def test_evaluate(self):
+    evaluator = Evaluator(
+        model_fn=_model_fn,
+        input_fn=_eval_input_fn,
+        metrics={},
+        eval_dir=self.model_dir)
+    self.assertEqual(evaluator.variable_names, ["global_step", "weight"])
+
+    # With a zero weight the loss is the mean of the squared targets
+    results = evaluator.evaluate()
+    np.testing.assert_allclose(results["loss"], (4 + 16 + 36 + 64) / 4.0)
+    self.assertEqual(results["global_step"], 0)
+
+    evaluator.load_weights({"weight": 2.0, "global_step": 7, "other": 1.0})
+    results = evaluator.evaluate()
+    np.testing.assert_allclose(results["loss"], 0.0)
+    self.assertEqual(results["global_step"], 7)
+    evaluator.close()
+
+
+class PersistentTrainAndEvalTest(tf.test.TestCase):
+  """Tests the persistent_train_and_eval schedule"""
+
+  def setUp(self):
+    super(PersistentTrainAndEvalTest, self).setUp()
+    self.model_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    super(PersistentTrainAndEvalTest, self).tearDown()
+    shutil.rmtree(self.model_dir)
+
+  def _create_experiment(self):
+    estimator = tf.contrib.learn.Estimator(
+        model_fn=_model_fn,
+        model_dir=self.model_dir,
+        config=tf.contrib.learn.RunConfig(save_checkpoints_secs=600))
+    return Experiment(
+        estimator=estimator,
+        train_input_fn=_train_input_fn,
+        eval_input_fn=_eval_input_fn,
+        train_steps=20,
+        min_eval_frequency=5)
+
+  def test_train_and_eval(self):
+    eval_result, _ = self._create_experiment().persistent_train_and_eval()
+    self.assertEqual(eval_result["global_step"], 20)
+    self.assertLess(eval_result["loss"], 1.0)
+    self.assertIsNotNone(tf.train.latest_checkpoint(self.model_dir))
+
+  def test_predicate(self):
+    eval_steps = []
+    def predicate_fn(eval_result):
+      eval_steps.append(eval_result["global_step"])
+      return len(eval_steps) < 2
+
+    eval_result, _ = self._create_experiment().persistent_train_and_eval(
+        continuous_eval_predicate_fn=predicate_fn)
+    self.assertEqual(eval_steps, [5, 10])
+    self.assertEqual(eval_result["global_step"], 10)
+
+
+class BestCheckpointsTest(tf.test.TestCase):
+  """Tests the BestCheckpoints class"""
+
+  def setUp(self):
+    super(BestCheckpointsTest, self).setUp()
+    self.model_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    super(BestCheckpointsTest, self).tearDown()
+    shutil.rmtree(self.model_dir)
+
+  def test_ranking(self):
+    state_path = os.path.join(self.model_dir, "checkpoints.json")
+    best = BestCheckpoints("loss", False, 2, state_path)
+    self.assertTrue(best.add("ckpt-1", {"loss": 3.0, "global_step": 1}))
+    self.assertTrue(best.add("ckpt-2", {"loss": 1.0, "global_step": 2}))
+    self.assertTrue(best.add("ckpt-3", {"loss": 2.0, "global_step": 3}))
+    self.assertFalse(best.add("ckpt-4", {"loss": 5.0, "global_step": 4}))
+    self.assertEqual([_["checkpoint_path"] for _ in best.best],
+                     ["ckpt-2", "ckpt-3"])
+    self.assertIn("ckpt-4", best)
+    self.assertEqual(best.checkpoints_to_delete(exclude=["ckpt-4"]),
+                     ["ckpt-1"])
+    best.mark_deleted("ckpt-1")
+
+    # The state is restored from disk
+    best = BestCheckpoints("loss", False, 2, state_path)
+    self.assertEqual(best.checkpoints_to_delete(), ["ckpt-4"])
+    with self.assertRaises(ValueError):
+      best.add("ckpt-5", {"bleu": 1.0})
+
+  def test_higher_is_better(self):
+    best = BestCheckpoints("bleu", True, 1)
+    best.add("ckpt-1", {"bleu": 10.0})
+    best.add("ckpt-2", {"bleu": 20.0})
+    self.assertEqual(best.best[0]["checkpoint_path"], "ckpt-2")
+
+  def test_delete_checkpoint(self):
+    prefix = os.path.join(self.model_dir, "model.ckpt-10")
+    for suffix in [".index", ".meta", ".data-00000-of-00001"]:
+      with open(prefix + suffix, "w") as file:
+        file.write("")
+    other = os.path.join(self.model_dir, "model.ckpt-100.index")
+    with open(other, "w") as file:
+      file.write("")
+    delete_checkpoint(prefix)
+    self.assertEqual(os.listdir(self.model_dir), ["model.ckpt-100.index"])
+
+
+if __name__ == "__main__":
+  tf.test.main()
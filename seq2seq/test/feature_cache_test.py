@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit tests for the on-disk feature cache.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import tempfile
+
+import tensorflow as tf
+import numpy as np
+
+from seq2seq.data import feature_cache
+from seq2seq.data.input_pipeline import ImageCaptioningInputPipeline
+
+
+class FeatureCacheTest(tf.test.TestCase):
+  """Tests writing and reading a feature cache"""
+
+  def setUp(self):
+    super(FeatureCacheTest, self).setUp()
+    self.cache_dir = tempfile.mkdtemp()
+    self.examples = [{
+        "image": np.full([4, 4, 3], i, dtype=np.uint8),
+        "target_tokens": np.array(["a", "b", "c"][:i + 1], dtype=object),
+        "target_ids": np.arange(i + 1, dtype=np.int64),
+        "target_len": np.int32(i + 1),
+    } for i in range(3)]
+    feature_cache.write_feature_cache(
+        self.cache_dir, iter(self.examples), num_examples=3,
+        sequence_keys=["target_tokens", "target_ids"])
+
+  def test_write_wrong_num_examples(self):
+    with self.assertRaises(ValueError):
+      feature_cache.write_feature_cache(
+          tempfile.mkdtemp(), iter(self.examples), num_examples=2)
+
+  def test_read(self):
+    self.assertTrue(feature_cache.is_feature_cache(self.cache_dir))
+    cache = feature_cache.FeatureCache(self.cache_dir)
+    self.assertEqual(cache.num_examples, 3)
+    self.assertEqual(cache.list_items(),
+                     ["image", "target_ids", "target_len", "target_tokens"])
+
+    example = cache.read(tf.constant(2, dtype=tf.int64))
+    self.assertEqual(example["image"].get_shape().as_list(), [4, 4, 3])
+
+    with self.test_session() as sess:
+      example_ = sess.run(example)
+
+    np.testing.assert_array_equal(example_["image"], self.examples[2]["image"])
+    np.testing.assert_array_equal(example_["target_ids"], [0, 1, 2])
+    np.testing.assert_array_equal(
+        np.char.decode(example_["target_tokens"].astype("S"), "utf-8"),
+        ["a", "b", "c"])
+    self.assertEqual(example_["target_len"], 3)
+
+  def test_pipeline(self):
+    pipeline = ImageCaptioningInputPipeline(
+        params={
+            "cache_dir": self.cache_dir,
+            "shuffle": False,
+            "num_epochs": 1,
+        },
+        mode=tf.contrib.learn.ModeKeys.TRAIN)
+
+    data_provider = pipeline.make_data_provider()
+    example = pipeline.read_from_data_provider(data_provider)
+
+    with self.test_session() as sess:
+      sess.run(tf.local_variables_initializer())
+      with tf.contrib.slim.queues.QueueRunners(sess):
+        target_lens = [sess.run(example["target_len"]) for _ in range(3)]
+        with self.assertRaises(tf.errors.OutOfRangeError):
+          sess.run(example["target_len"])
+
+    self.assertEqual(target_lens, [1, 2, 3])
+
+
+if __name__ == "__main__":
+  tf.test.main()
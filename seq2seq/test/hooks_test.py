@@ -20,6 +20,7 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import json
 import os
 import tempfile
 import shutil
@@ -150,5 +151,197 @@ class TestMetadataCaptureHook(tf.test.TestCase):
           set(gfile.ListDirectory(self.model_dir)),
           set(["run_meta", "tfprof_log", "timeline.json"]))
 
+  def test_periodic_capture(self):
+    global_step = tf.contrib.framework.get_or_create_global_step()
+    some_weights = tf.get_variable("weigths", [2, 128])
+    computation = tf.nn.softmax(some_weights)
+
+    hook = hooks.MetadataCaptureHook(
+        params={"step": 2, "every_n_steps": 3, "num_steps": 2,
+                "max_captures": 2},
+        model_dir=self.model_dir,
+        run_config=tf.contrib.learn.RunConfig())
+    hook.begin()
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      #pylint: disable=W0212
+      mon_sess = monitored_session._HookedSession(sess, [hook])
+      for step in range(1, 13):
+        sess.run(tf.assign(global_step, step))
+        mon_sess.run(computation)
+
+    # Captures are triggered at steps 2, 5, 8 and 11. The capture at step 11
+    # is not finished yet and the capture at step 2 has been removed.
+    metadata_dir = os.path.join(self.model_dir, "metadata")
+    self.assertEqual(
+        set(gfile.ListDirectory(metadata_dir)),
+        set(["capture-00000005", "capture-00000008", "capture-00000011",
+             "run_meta", "tfprof_log", "op_stats.json"]))
+    self.assertIn(
+        "timeline-00000010.json",
+        gfile.ListDirectory(os.path.join(metadata_dir, "capture-00000008")))
+
+    with gfile.GFile(os.path.join(metadata_dir, "op_stats.json")) as file:
+      op_stats = json.loads(file.read())
+    self.assertEqual(op_stats["num_steps"], 6)
+    self.assertEqual(op_stats["steps"], [3, 4, 6, 7, 9, 10])
+    self.assertIn("Softmax", op_stats["ops"])
+    self.assertEqual(op_stats["ops"]["Softmax"]["type"], "Softmax")
+
+class TestThroughputHook(tf.test.TestCase):
+  """Tests the `ThroughputHook` hook"""
+
+  def setUp(self):
+    super(TestThroughputHook, self).setUp()
+    self.model_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    super(TestThroughputHook, self).tearDown()
+    shutil.rmtree(self.model_dir)
+
+  def test_report(self):
+    global_step = tf.contrib.framework.get_or_create_global_step()
+    batch = tf.train.batch(
+        tensors={
+            "source_tokens": tf.constant(["a", "b", "c", "d"]),
+            "source_len": tf.constant(2),
+            "target_tokens": tf.constant(["a", "b"]),
+            "target_len": tf.constant(2)
+        },
+        batch_size=3)
+    graph_utils.add_dict_to_collection(
+        {k: batch[k] for k in ["source_tokens", "source_len"]}, "features")
+    graph_utils.add_dict_to_collection(
+        {k: batch[k] for k in ["target_tokens", "target_len"]}, "labels")
+    train_op = tf.group(batch["source_len"], batch["target_len"])
+
+    hook = hooks.ThroughputHook(
+        params={"every_n_steps": 2}, model_dir=self.model_dir,
+        run_config=tf.contrib.learn.RunConfig())
+    hook.begin()
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      coord = tf.train.Coordinator()
+      threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+      #pylint: disable=W0212
+      mon_sess = monitored_session._HookedSession(sess, [hook])
+      for step in range(1, 6):
+        sess.run(tf.assign(global_step, step))
+        mon_sess.run(train_op)
+      coord.request_stop()
+      coord.join(threads)
+
+    log_path = os.path.join(self.model_dir, "throughput.jsonl")
+    with gfile.GFile(log_path) as file:
+      reports = [json.loads(line) for line in file]
+    # The first window is discarded
+    self.assertEqual([_["global_step"] for _ in reports], [3, 5])
+    self.assertEqual(reports[0]["steps"], 2)
+    # 3 * 2 + 3 * 2 real tokens out of 3 * 4 + 3 * 2 token positions
+    self.assertAlmostEqual(reports[0]["padding_ratio"], 1.0 - 12.0 / 18.0)
+    self.assertGreater(reports[0]["tokens_per_sec"], 0.0)
+    self.assertGreater(reports[0]["examples_per_sec"], 0.0)
+    self.assertIn("step_time_p90", reports[0])
+    self.assertGreaterEqual(reports[0]["input_wait_fraction"], 0.0)
+
+
+class TestStopMarkerHook(tf.test.TestCase):
+  """Tests the `StopMarkerHook` hook"""
+
+  def setUp(self):
+    super(TestStopMarkerHook, self).setUp()
+    self.model_dir = tempfile.mkdtemp()
+    self.marker_path = os.path.join(self.model_dir, "stop.json")
+
+  def tearDown(self):
+    super(TestStopMarkerHook, self).tearDown()
+    shutil.rmtree(self.model_dir)
+
+  def _write_marker(self, global_step):
+    with gfile.GFile(self.marker_path, "w") as file:
+      file.write(json.dumps({"global_step": global_step}))
+
+  def test_stop(self):
+    # A marker from an earlier run must not stop training
+    self._write_marker(100)
+    train_op = tf.no_op()
+    hook = hooks.StopMarkerHook(
+        params={"every_n_secs": 0, "marker_file": "stop.json"},
+        model_dir=self.model_dir,
+        run_config=tf.contrib.learn.RunConfig())
+    hook.begin()
+
+    with self.test_session() as sess:
+      #pylint: disable=W0212
+      mon_sess = monitored_session._HookedSession(sess, [hook])
+      mon_sess.run(train_op)
+      self.assertFalse(mon_sess.should_stop())
+      self._write_marker(200)
+      mon_sess.run(train_op)
+      self.assertTrue(mon_sess.should_stop())
+
+
+class TestInputPipelineMonitorHook(tf.test.TestCase):
+  """Tests the `InputPipelineMonitorHook` hook"""
+
+  def test_statistics(self):
+    global_step = tf.contrib.framework.get_or_create_global_step()
+    batch = tf.train.batch(
+        tensors={"source_len": tf.constant(2)}, batch_size=3, capacity=10)
+    graph_utils.add_dict_to_collection(batch, "features")
+    train_op = tf.group(batch["source_len"], tf.assign_add(global_step, 1))
+
+    hook = hooks.InputPipelineMonitorHook(
+        params={"every_n_steps": 2, "report_every_n_steps": 100},
+        model_dir=tempfile.mkdtemp(),
+        run_config=tf.contrib.learn.RunConfig())
+    hook.begin()
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      coord = tf.train.Coordinator()
+      threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+      #pylint: disable=W0212
+      mon_sess = monitored_session._HookedSession(sess, [hook])
+      for step in range(1, 6):
+        sess.run(tf.assign(global_step, step))
+        mon_sess.run(train_op)
+      coord.request_stop()
+      coord.join(threads)
+
+    queue_stats, wait_fraction = hook.compute_statistics()
+    self.assertEqual(len(queue_stats), 1)
+    self.assertEqual(queue_stats[0]["capacity"], 10)
+    self.assertLessEqual(queue_stats[0]["max_fill"], 1.0)
+    self.assertEqual(len(hook._step_times), 3) #pylint: disable=W0212
+    self.assertGreaterEqual(wait_fraction, 0.0)
+    self.assertLessEqual(wait_fraction, 1.0)
+
+  def test_recommendations(self):
+    def _stats(name, mean_fill, empty_fraction, max_fill=None):
+      return {"name": name, "capacity": 100, "mean_fill": mean_fill,
+              "max_fill": max_fill or mean_fill,
+              "empty_fraction": empty_fraction}
+
+    # The readers can not keep up
+    recommendations = hooks._recommend_input_knobs( #pylint: disable=W0212
+        [_stats("input_producer/fifo_queue", 1.0, 0.0),
+         _stats("common_queue", 0.0, 1.0),
+         _stats("batch_queue", 0.0, 1.0)], "batch_queue")
+    self.assertEqual(len(recommendations), 1)
+    self.assertIn("common_queue", recommendations[0])
+    self.assertIn("readers", recommendations[0])
+
+    # The preprocessing after the reader queue can not keep up
+    recommendations = hooks._recommend_input_knobs( #pylint: disable=W0212
+        [_stats("common_queue", 0.9, 0.0),
+         _stats("batch_queue", 0.2, 0.5, max_fill=1.0)], "batch_queue")
+    self.assertEqual(len(recommendations), 2)
+    self.assertIn("preprocessing", recommendations[0])
+    self.assertIn("capacity", recommendations[1])
+
+
 if __name__ == "__main__":
   tf.test.main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Test Cases for image encoders.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+import numpy as np
+
+from seq2seq.encoders import PrecomputedImageEncoder
+
+
+class PrecomputedImageEncoderTest(tf.test.TestCase):
+  """
+  Tests the PrecomputedImageEncoder class.
+  """
+
+  def setUp(self):
+    super(PrecomputedImageEncoderTest, self).setUp()
+    self.features = np.random.randn(2, 64, 16).astype(np.float32)
+
+  def test_encode(self):
+    encoder = PrecomputedImageEncoder(
+        params={}, mode=tf.contrib.learn.ModeKeys.TRAIN)
+    encoder_output = encoder(tf.constant(self.features))
+
+    with self.test_session() as sess:
+      encoder_output_ = sess.run(encoder_output)
+
+    np.testing.assert_array_equal(encoder_output_.outputs, self.features)
+    np.testing.assert_allclose(encoder_output_.final_state,
+                               self.features.mean(axis=1), rtol=1e-5)
+    self.assertEqual(encoder_output_.attention_values_length, 64)
+    self.assertEqual(tf.trainable_variables(), [])
+
+  def test_encode_with_final_state(self):
+    final_state = np.random.randn(2, 16).astype(np.float32)
+    encoder = PrecomputedImageEncoder(
+        params={}, mode=tf.contrib.learn.ModeKeys.TRAIN)
+    encoder_output = encoder(
+        tf.constant(self.features), tf.constant(final_state))
+
+    with self.test_session() as sess:
+      final_state_ = sess.run(encoder_output.final_state)
+
+    np.testing.assert_array_equal(final_state_, final_state)
+
+
+if __name__ == "__main__":
+  tf.test.main()
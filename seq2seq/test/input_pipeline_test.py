@@ -156,6 +156,72 @@ class ParallelTextInputPipelineTest(tf.test.TestCase):
         np.char.decode(res["target_tokens"].astype("S"), "utf-8"),
         ["SEQUENCE_START", "Bye", "泣", "SEQUENCE_END"])
 
+  def test_pipeline_max_len(self):
+    file_source, file_target = test_utils.create_temp_parallel_data(
+        sources=["Hello World . 笑"], targets=["Bye 泣"])
+
+    pipeline = input_pipeline.ParallelTextInputPipeline(
+        params={
+            "source_files": [file_source.name],
+            "target_files": [file_target.name],
+            "source_max_len": 3,
+            "target_max_len": 3,
+            "num_epochs": 5,
+            "shuffle": False
+        },
+        mode=tf.contrib.learn.ModeKeys.TRAIN)
+
+    data_provider = pipeline.make_data_provider()
+
+    features = pipeline.read_from_data_provider(data_provider)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(tf.local_variables_initializer())
+      with tf.contrib.slim.queues.QueueRunners(sess):
+        res = sess.run(features)
+
+    self.assertEqual(res["source_len"], 3)
+    self.assertEqual(res["target_len"], 3)
+    np.testing.assert_array_equal(
+        np.char.decode(res["source_tokens"].astype("S"), "utf-8"),
+        ["Hello", "World", "SEQUENCE_END"])
+    np.testing.assert_array_equal(
+        np.char.decode(res["target_tokens"].astype("S"), "utf-8"),
+        ["SEQUENCE_START", "Bye", "SEQUENCE_END"])
+
+  def test_keep_input(self):
+    file_source, file_target = test_utils.create_temp_parallel_data(
+        sources=["a b", "a b c d", "a b c d e f"], targets=["x", "x", "x y"])
+
+    pipeline = input_pipeline.ParallelTextInputPipeline(
+        params={
+            "source_files": [file_source.name],
+            "target_files": [file_target.name],
+            "source_min_len": 4,
+            "source_max_len": 5,
+            "target_min_len": 3,
+            "filter_long_examples": True,
+            "num_epochs": 1,
+            "shuffle": False
+        },
+        mode=tf.contrib.learn.ModeKeys.TRAIN)
+
+    data_provider = pipeline.make_data_provider()
+    features = pipeline.read_from_data_provider(data_provider)
+    keep_input = pipeline.keep_input(features)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(tf.local_variables_initializer())
+      with tf.contrib.slim.queues.QueueRunners(sess):
+        results = [sess.run([features, keep_input]) for _ in range(3)]
+
+    # Long examples are not truncated, so they can be dropped
+    self.assertEqual([_[0]["source_len"] for _ in results], [3, 5, 7])
+    # Too short, kept, too long
+    self.assertEqual([bool(_[1]) for _ in results], [False, True, False])
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for the local cluster utilities.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+
+import tensorflow as tf
+from tensorflow.contrib.learn.python.learn.estimators import run_config
+
+from seq2seq.training import local_cluster
+from seq2seq.training import utils as training_utils
+
+
+class CreateClusterTest(tf.test.TestCase):
+  """Tests the cluster definition and TF_CONFIG creation."""
+
+  def test_find_free_ports(self):
+    ports = local_cluster.find_free_ports(3)
+    self.assertEqual(len(set(ports)), 3)
+
+  def test_create_cluster(self):
+    cluster = local_cluster.create_cluster(
+        num_workers=3, num_ps=2, ports=[1, 2, 3, 4, 5])
+    self.assertEqual(cluster, {
+        "ps": ["localhost:1", "localhost:2"],
+        "master": ["localhost:3"],
+        "worker": ["localhost:4", "localhost:5"]
+    })
+    self.assertEqual(
+        local_cluster.cluster_tasks(cluster),
+        [("ps", 0), ("ps", 1), ("master", 0), ("worker", 0), ("worker", 1)])
+
+  def test_create_cluster_single_process(self):
+    cluster = local_cluster.create_cluster(num_workers=1, num_ps=1)
+    self.assertEqual(sorted(cluster.keys()), ["master", "ps"])
+    with self.assertRaises(ValueError):
+      local_cluster.create_cluster(num_workers=0)
+
+  def test_run_config(self):
+    cluster = local_cluster.create_cluster(num_workers=3, num_ps=1)
+    tf_config = local_cluster.create_tf_config(cluster, "worker", 1)
+    self.assertEqual(json.loads(tf_config)["task"],
+                     {"type": "worker", "index": 1})
+    with self.assertRaises(ValueError):
+      local_cluster.create_tf_config(cluster, "worker", 2)
+
+    old_tf_config = os.environ.get("TF_CONFIG")
+    try:
+      os.environ["TF_CONFIG"] = local_cluster.create_tf_config(
+          cluster, "master", 0)
+      config = run_config.RunConfig()
+      self.assertTrue(config.is_chief)
+      self.assertEqual(config.master, "grpc://" + cluster["master"][0])
+      self.assertEqual(training_utils.input_shard_params(config),
+                       {"num_shards": 3, "shard_index": 0})
+
+      os.environ["TF_CONFIG"] = tf_config
+      config = run_config.RunConfig()
+      self.assertFalse(config.is_chief)
+      self.assertEqual(config.task_type, "worker")
+      self.assertEqual(training_utils.input_shard_params(config),
+                       {"num_shards": 3, "shard_index": 2})
+    finally:
+      if old_tf_config is None:
+        del os.environ["TF_CONFIG"]
+      else:
+        os.environ["TF_CONFIG"] = old_tf_config
+
+
+class PartitionCPUsTest(tf.test.TestCase):
+  """Tests the partition_cpus function."""
+
+  def test_disjoint_blocks(self):
+    ps_cpus, worker_cpus = local_cluster.partition_cpus(
+        list(range(8)), num_workers=3, num_ps=2, num_ps_cpus=1)
+    self.assertEqual(ps_cpus, [0])
+    self.assertEqual(worker_cpus, [[1, 2, 3], [4, 5], [6, 7]])
+
+  def test_no_ps(self):
+    ps_cpus, worker_cpus = local_cluster.partition_cpus(
+        list(range(4)), num_workers=2, num_ps=0)
+    self.assertEqual(ps_cpus, [])
+    self.assertEqual(worker_cpus, [[0, 1], [2, 3]])
+
+  def test_more_processes_than_cpus(self):
+    ps_cpus, worker_cpus = local_cluster.partition_cpus(
+        [0, 1], num_workers=3, num_ps=1)
+    self.assertEqual(ps_cpus, [0])
+    self.assertEqual(worker_cpus, [[0], [1], [0]])
+
+
+if __name__ == "__main__":
+  tf.test.main()
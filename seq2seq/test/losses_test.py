@@ -61,5 +61,99 @@ class CrossEntropySequenceLossTest(tf.test.TestCase):
     np.testing.assert_array_equal(losses_[3:, 2], np.zeros_like(losses_[3:, 2]))
 
 
+class SampledSoftmaxSequenceLossTest(tf.test.TestCase):
+  """
+  Test for `sqe2seq.losses.sampled_softmax_sequence_loss`.
+  """
+
+  def setUp(self):
+    super(SampledSoftmaxSequenceLossTest, self).setUp()
+    self.batch_size = 4
+    self.sequence_length = 10
+    self.input_size = 8
+    self.vocab_size = 50
+
+  def test_op(self):
+    inputs = np.random.randn(self.sequence_length, self.batch_size,
+                             self.input_size).astype(np.float32)
+    weights = np.random.randn(self.input_size,
+                              self.vocab_size).astype(np.float32)
+    biases = np.zeros([self.vocab_size], dtype=np.float32)
+    unigram_counts = np.random.randint(
+        -1, 100, [self.vocab_size]).astype(np.float32)
+    sequence_length = np.array([1, 2, 3, 4])
+    targets = np.random.randint(0, self.vocab_size,
+                                [self.sequence_length, self.batch_size])
+    losses = seq2seq_losses.sampled_softmax_sequence_loss(
+        inputs=inputs,
+        weights=tf.constant(weights),
+        biases=biases,
+        targets=targets,
+        sequence_length=sequence_length,
+        num_samples=10,
+        unigram_counts=unigram_counts)
+
+    with self.test_session() as sess:
+      losses_ = sess.run(losses)
+
+    self.assertEqual(losses_.shape, (self.sequence_length, self.batch_size))
+    np.testing.assert_array_less(np.zeros_like(losses_[:1, 0]), losses_[:1, 0])
+    np.testing.assert_array_less(np.zeros_like(losses_[:3, 2]), losses_[:3, 2])
+    np.testing.assert_array_equal(losses_[1:, 0], np.zeros_like(losses_[1:, 0]))
+    np.testing.assert_array_equal(losses_[3:, 2], np.zeros_like(losses_[3:, 2]))
+
+
+class ChunkedCrossEntropySequenceLossTest(tf.test.TestCase):
+  """
+  Test for `sqe2seq.losses.chunked_cross_entropy_sequence_loss`.
+  """
+
+  def setUp(self):
+    super(ChunkedCrossEntropySequenceLossTest, self).setUp()
+    self.batch_size = 4
+    self.sequence_length = 10
+    self.input_size = 8
+    self.vocab_size = 50
+
+  def test_matches_full_loss(self):
+    inputs = tf.constant(
+        np.random.randn(self.sequence_length, self.batch_size,
+                        self.input_size).astype(np.float32))
+    weights = tf.constant(
+        np.random.randn(self.input_size, self.vocab_size).astype(np.float32))
+    biases = tf.constant(
+        np.random.randn(self.vocab_size).astype(np.float32))
+    sequence_length = np.array([1, 5, 10, 4])
+    targets = np.random.randint(0, self.vocab_size,
+                                [self.sequence_length, self.batch_size])
+
+    # Use a number of chunks that does not divide the number of outputs
+    losses = seq2seq_losses.chunked_cross_entropy_sequence_loss(
+        inputs=inputs,
+        weights=weights,
+        biases=biases,
+        targets=targets,
+        sequence_length=sequence_length,
+        num_chunks=3)
+    logits = tf.reshape(
+        tf.nn.xw_plus_b(tf.reshape(inputs, [-1, self.input_size]), weights,
+                        biases),
+        [self.sequence_length, self.batch_size, self.vocab_size])
+    expected_losses = seq2seq_losses.cross_entropy_sequence_loss(
+        logits, targets, sequence_length)
+
+    grads = tf.gradients(tf.reduce_sum(losses), [inputs, weights, biases])
+    expected_grads = tf.gradients(
+        tf.reduce_sum(expected_losses), [inputs, weights, biases])
+
+    with self.test_session() as sess:
+      losses_, expected_losses_, grads_, expected_grads_ = sess.run(
+          [losses, expected_losses, grads, expected_grads])
+
+    np.testing.assert_allclose(losses_, expected_losses_, rtol=1e-4, atol=1e-5)
+    for grad_, expected_grad_ in zip(grads_, expected_grads_):
+      np.testing.assert_allclose(grad_, expected_grad_, rtol=1e-4, atol=1e-5)
+
+
 if __name__ == "__main__":
   tf.test.main()
@@ -30,6 +30,7 @@ from seq2seq.data import vocab, input_pipeline
 from seq2seq.training import utils as training_utils
 from seq2seq.test import utils as test_utils
 from seq2seq.models import BasicSeq2Seq, AttentionSeq2Seq
+from seq2seq.models import TransformerSeq2Seq
 
 TEST_PARAMS = yaml.load("""
 embedding.dim: 5
@@ -150,6 +151,46 @@ class EncoderDecoderTests(tf.test.TestCase):
                                   [self.batch_size, expected_decode_len - 1])
     self.assertFalse(np.isnan(loss_))
 
+  def test_train_sampled_softmax(self):
+    model, fetches_ = self._test_pipeline(
+        mode=tf.contrib.learn.ModeKeys.TRAIN,
+        params={"loss.sampled_softmax.num_samples": 5})
+    predictions_, loss_, _ = fetches_
+
+    target_len = self.sequence_length + 10 + 2
+    max_decode_length = model.params["target.max_seq_len"]
+    expected_decode_len = np.minimum(target_len, max_decode_length)
+
+    # The decoder does not compute logits
+    np.testing.assert_array_equal(predictions_["logits"].shape,
+                                  [self.batch_size, expected_decode_len - 1, 0])
+    np.testing.assert_array_equal(predictions_["predicted_ids"].shape,
+                                  [self.batch_size, expected_decode_len - 1])
+    self.assertFalse(np.isnan(loss_))
+
+  def test_train_chunked_softmax(self):
+    _, fetches_ = self._test_pipeline(
+        mode=tf.contrib.learn.ModeKeys.TRAIN,
+        params={"loss.chunked_softmax.num_chunks": 3})
+    predictions_, loss_, _ = fetches_
+
+    self.assertEqual(predictions_["logits"].shape[-1], 0)
+    self.assertFalse(np.isnan(loss_))
+
+  def test_train_lazy_adam(self):
+    _, fetches_ = self._test_pipeline(
+        mode=tf.contrib.learn.ModeKeys.TRAIN,
+        params={"optimizer.name": "LazyAdam"})
+    _, loss_, _ = fetches_
+    self.assertFalse(np.isnan(loss_))
+
+  def test_train_gradient_accumulation(self):
+    _, fetches_ = self._test_pipeline(
+        mode=tf.contrib.learn.ModeKeys.TRAIN,
+        params={"optimizer.accumulation_steps": 2})
+    _, loss_, _ = fetches_
+    self.assertFalse(np.isnan(loss_))
+
   def test_infer(self):
     model, fetches_ = self._test_pipeline(tf.contrib.learn.ModeKeys.INFER)
     predictions_, = fetches_
@@ -228,5 +269,36 @@ class TestAttentionSeq2Seq(EncoderDecoderTests):
     return AttentionSeq2Seq(params=params_, mode=mode)
 
 
+class TestTransformerSeq2Seq(EncoderDecoderTests):
+  """Tests the seq2seq.models.TransformerSeq2Seq model.
+  """
+
+  def setUp(self):
+    super(TestTransformerSeq2Seq, self).setUp()
+
+  def create_model(self, mode, params=None):
+    params_ = TransformerSeq2Seq.default_params().copy()
+    params_.update(yaml.load("""
+      embedding.dim: 5
+      encoder.params:
+        num_layers: 2
+        num_units: 8
+        num_heads: 2
+        ffn_units: 16
+      decoder.params:
+        num_layers: 2
+        num_units: 8
+        num_heads: 2
+        ffn_units: 16
+        max_decode_length: 10
+      """))
+    params_.update({
+        "vocab_source": self.vocab_file.name,
+        "vocab_target": self.vocab_file.name,
+    })
+    params_.update(params or {})
+    return TransformerSeq2Seq(params=params_, mode=mode)
+
+
 if __name__ == "__main__":
   tf.test.main()
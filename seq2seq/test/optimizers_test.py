@@ -0,0 +1,115 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Unit tests for optimizer wrappers.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import tensorflow as tf
+import numpy as np
+
+from seq2seq.training.optimizers import GradientAccumulationOptimizer
+from seq2seq.training.optimizers import LazyAdamOptimizer
+
+
+class GradientAccumulationOptimizerTest(tf.test.TestCase):
+  """Tests the GradientAccumulationOptimizer class"""
+
+  def test_accumulation(self):
+    global_step = tf.contrib.framework.get_or_create_global_step()
+    var = tf.Variable([1.0, 2.0])
+    embedding = tf.Variable([[1.0], [2.0], [3.0]])
+    scale = tf.placeholder(tf.float32, [])
+    ids = tf.placeholder(tf.int32, [None])
+    loss = scale * tf.reduce_sum(var) + tf.reduce_sum(
+        tf.nn.embedding_lookup(embedding, ids))
+
+    optimizer = GradientAccumulationOptimizer(
+        tf.train.GradientDescentOptimizer(1.0), num_steps=2)
+    train_op = optimizer.minimize(loss, global_step=global_step)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+
+      sess.run(train_op, {scale: 1.0, ids: [0]})
+      np.testing.assert_array_equal(sess.run(var), [1.0, 2.0])
+      self.assertEqual(sess.run(global_step), 0)
+
+      sess.run(train_op, {scale: 3.0, ids: [0, 2]})
+      np.testing.assert_allclose(sess.run(var), [-1.0, 0.0])
+      np.testing.assert_allclose(sess.run(embedding), [[0.0], [2.0], [2.5]])
+      self.assertEqual(sess.run(global_step), 1)
+
+      # Accumulators are reset after an update
+      sess.run(train_op, {scale: 1.0, ids: [1]})
+      sess.run(train_op, {scale: 1.0, ids: [1]})
+      np.testing.assert_allclose(sess.run(var), [-2.0, -1.0])
+      np.testing.assert_allclose(sess.run(embedding), [[0.0], [1.0], [2.5]])
+      self.assertEqual(sess.run(global_step), 2)
+
+  def test_clip_gradients(self):
+    var = tf.Variable([0.0])
+    scale = tf.placeholder(tf.float32, [])
+    loss = scale * tf.reduce_sum(var)
+
+    def clip_gradients(grads_and_vars):
+      return [(tf.clip_by_value(grad, -1.0, 1.0), var_)
+              for grad, var_ in grads_and_vars]
+
+    optimizer = GradientAccumulationOptimizer(
+        tf.train.GradientDescentOptimizer(1.0), num_steps=2,
+        clip_gradients=clip_gradients)
+    train_op = optimizer.minimize(loss)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(train_op, {scale: 3.0})
+      sess.run(train_op, {scale: -2.0})
+      # The average gradient 0.5 is not clipped
+      np.testing.assert_allclose(sess.run(var), [-0.5])
+
+
+class LazyAdamOptimizerTest(tf.test.TestCase):
+  """Tests the LazyAdamOptimizer class"""
+
+  def test_sparse_update(self):
+    embedding = tf.Variable([[1.0], [2.0], [3.0]])
+    ids = tf.placeholder(tf.int32, [None])
+    loss = tf.reduce_sum(tf.nn.embedding_lookup(embedding, ids))
+
+    optimizer = LazyAdamOptimizer(0.1)
+    train_op = optimizer.minimize(loss)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      # The duplicate id has a gradient of 2
+      sess.run(train_op, {ids: [0, 2, 0]})
+      # The first step of Adam moves each row by the learning rate
+      np.testing.assert_allclose(
+          sess.run(embedding), [[0.9], [2.0], [2.9]], rtol=1e-5)
+      m_ = sess.run(optimizer.get_slot(embedding, "m"))
+      np.testing.assert_allclose(m_, [[0.2], [0.0], [0.1]], rtol=1e-5)
+
+      # Rows without a gradient keep their moments
+      sess.run(train_op, {ids: [1]})
+      m_ = sess.run(optimizer.get_slot(embedding, "m"))
+      np.testing.assert_allclose(m_, [[0.2], [0.1], [0.1]], rtol=1e-5)
+
+
+if __name__ == "__main__":
+  tf.test.main()
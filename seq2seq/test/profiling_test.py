@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tests for the aggregation of per-op statistics.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import tempfile
+
+import tensorflow as tf
+from tensorflow.core.framework import step_stats_pb2  # pylint: disable=E0611
+
+from seq2seq.training import profiling
+
+
+def _step_stats(node_micros, node_bytes=None):
+  """Creates StepStats with one CPU and one GPU stream device."""
+  node_bytes = node_bytes or {}
+  step_stats = step_stats_pb2.StepStats()
+  for device in ["/cpu:0", "/gpu:0/stream:all"]:
+    dev_stats = step_stats.dev_stats.add(device=device)
+    for name, micros in node_micros.items():
+      node_stats = dev_stats.node_stats.add(
+          node_name=name, all_end_rel_micros=micros[device])
+      node_stats.memory.add(total_bytes=node_bytes.get(name, 0))
+  return step_stats
+
+
+class OpStatsTest(tf.test.TestCase):
+  """Tests the collection and aggregation of op statistics."""
+
+  def test_collect_op_stats(self):
+    step_stats = _step_stats(
+        {"a/b/MatMul": {"/cpu:0": 5, "/gpu:0/stream:all": 20},
+         "a/Add": {"/cpu:0": 3, "/gpu:0/stream:all": 1}},
+        {"a/b/MatMul": 64})
+    op_stats = profiling.collect_op_stats(step_stats, {"a/b/MatMul": 100})
+    self.assertEqual(op_stats, {
+        "a/b/MatMul": {"micros": 20, "bytes": 64, "float_ops": 100},
+        "a/Add": {"micros": 3, "bytes": 0, "float_ops": 0}
+    })
+
+  def test_accumulate(self):
+    accumulator = profiling.OpStatsAccumulator({"a/b/MatMul": "MatMul"})
+    accumulator.add(10, {"a/b/MatMul": {"micros": 20, "bytes": 4,
+                                        "float_ops": 100}})
+    accumulator.add(11, {"a/b/MatMul": {"micros": 40, "bytes": 8,
+                                        "float_ops": 100},
+                         "a/Add": {"micros": 2, "bytes": 0, "float_ops": 0}})
+
+    path = os.path.join(tempfile.mkdtemp(), profiling.OP_STATS_FILENAME)
+    accumulator.save(path)
+    op_stats = profiling.load_op_stats(path)
+    self.assertEqual(op_stats["num_steps"], 2)
+    self.assertEqual(op_stats["steps"], [10, 11])
+    self.assertEqual(op_stats["ops"]["a/b/MatMul"], {
+        "micros": 30, "bytes": 6, "float_ops": 100, "count": 2,
+        "type": "MatMul"})
+    self.assertEqual(op_stats["ops"]["a/Add"]["micros"], 1)
+
+    scopes = profiling.aggregate_by_scope(op_stats["ops"])
+    self.assertEqual(sorted(scopes.keys()), ["a", "a/b"])
+    self.assertEqual(scopes["a"]["micros"], 31)
+    self.assertEqual(scopes["a"]["num_ops"], 2)
+    self.assertEqual(scopes["a/b"]["micros"], 30)
+    self.assertEqual(
+        sorted(profiling.aggregate_by_scope(op_stats["ops"], 1).keys()), ["a"])
+
+    types = profiling.aggregate_by_type(op_stats["ops"])
+    self.assertEqual(types["MatMul"]["micros"], 30)
+    self.assertEqual(types["unknown"]["num_ops"], 1)
+
+    table = profiling.format_table(scopes, top_n=1).split("\n")
+    self.assertEqual(len(table), 2)
+    self.assertTrue(table[1].endswith("  a"))
+
+
+class DiffStatsTest(tf.test.TestCase):
+  """Tests the comparison of op statistics between runs."""
+
+  def test_diff(self):
+    base = {"a": {"micros": 100, "bytes": 10, "float_ops": 5},
+            "b": {"micros": 1000, "bytes": 10, "float_ops": 5}}
+    new = {"a": {"micros": 100, "bytes": 20, "float_ops": 5},
+           "b": {"micros": 1050, "bytes": 10, "float_ops": 5},
+           "c": {"micros": 500, "bytes": 0, "float_ops": 0}}
+    diff = profiling.diff_stats(base, new)
+    self.assertEqual(sorted(diff.keys()), ["a", "b", "c"])
+    self.assertEqual(diff["a"]["bytes"], {
+        "base": 10, "new": 20, "delta": 10, "relative": 1.0})
+    self.assertAlmostEqual(diff["b"]["micros"]["relative"], 0.05)
+    self.assertIsNone(diff["c"]["micros"]["relative"])
+
+    self.assertEqual(profiling.total_stats(new),
+                     {"micros": 1650, "bytes": 30, "float_ops": 10})
+
+    regressions = profiling.find_regressions(
+        diff, {"micros": 0.01, "bytes": 0.1}, {"micros": 100})
+    self.assertEqual([(_["name"], _["metric"]) for _ in regressions],
+                     [("c", "micros"), ("a", "bytes")])
+
+    table = profiling.format_diff_table(diff, "micros").split("\n")
+    self.assertEqual(len(table), 4)
+    self.assertTrue(table[1].endswith("new  c"))
+    self.assertTrue(table[2].endswith("+5.0%  b"))
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -199,5 +199,57 @@ class StackBidirectionalRNNEncoderTest(tf.test.TestCase):
           [self.batch_size, 32])
 
 
+class HierarchicalRNNEncoderTest(tf.test.TestCase):
+  """
+  Tests the HierarchicalRNNEncoder class.
+  """
+
+  def setUp(self):
+    super(HierarchicalRNNEncoderTest, self).setUp()
+    tf.logging.set_verbosity(tf.logging.INFO)
+    self.batch_size = 4
+    self.sequence_length = 17
+    self.input_depth = 10
+    self.params = rnn_encoder.HierarchicalRNNEncoder.default_params()
+    self.params["chunk_size"] = 5
+    self.params["rnn_cell"]["cell_params"]["num_units"] = 32
+    self.params["chunk_rnn_cell"]["cell_params"]["num_units"] = 16
+    self.mode = tf.contrib.learn.ModeKeys.TRAIN
+
+  def _encode(self):
+    inputs = tf.random_normal(
+        [self.batch_size, self.sequence_length, self.input_depth])
+    example_length = tf.constant([17, 12, 5, 1], dtype=tf.int32)
+
+    encode_fn = rnn_encoder.HierarchicalRNNEncoder(self.params, self.mode)
+    encoder_output = encode_fn(inputs, example_length)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      return sess.run(encoder_output)
+
+  def test_encode_words(self):
+    encoder_output_ = self._encode()
+    np.testing.assert_array_equal(
+        encoder_output_.outputs.shape,
+        [self.batch_size, self.sequence_length, 32 * 2 + 16 * 2])
+    np.testing.assert_array_equal(encoder_output_.attention_values_length,
+                                  [17, 12, 5, 1])
+    np.testing.assert_array_equal(encoder_output_.final_state[0].h.shape,
+                                  [self.batch_size, 16])
+
+    # Word outputs beyond the example length are zero
+    np.testing.assert_array_equal(
+        encoder_output_.outputs[1, 12:, :64], 0.0)
+
+  def test_encode_chunks(self):
+    self.params["attention_level"] = "chunks"
+    encoder_output_ = self._encode()
+    np.testing.assert_array_equal(encoder_output_.outputs.shape,
+                                  [self.batch_size, 4, 16 * 2])
+    np.testing.assert_array_equal(encoder_output_.attention_values_length,
+                                  [4, 3, 1, 1])
+
+
 if __name__ == "__main__":
   tf.test.main()
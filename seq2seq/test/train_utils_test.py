@@ -21,6 +21,7 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import os
 import tempfile
 import tensorflow as tf
 import numpy as np
@@ -137,6 +138,172 @@ class TestInputFn(tf.test.TestCase):
   def test_wit_buckets(self):
     self._test_with_args(batch_size=10, bucket_boundaries=[0, 5, 10])
 
+  def test_with_pool(self):
+    self._test_with_args(batch_size=10, pool_size=4)
+
+  def test_with_curriculum(self):
+    tf.contrib.framework.create_global_step()
+    self._test_with_args(batch_size=10, curriculum_steps=100)
+
+  def test_sorted_pool(self):
+    sources = [" ".join(["a"] * length) for length in [5, 1, 4, 2, 6, 3]]
+    sources_file, targets_file = test_utils.create_temp_parallel_data(
+        sources=sources, targets=sources)
+    pipeline = input_pipeline.ParallelTextInputPipeline(
+        params={
+            "source_files": [sources_file.name],
+            "target_files": [targets_file.name],
+            "shuffle": False
+        },
+        mode=tf.contrib.learn.ModeKeys.TRAIN)
+    input_fn = training_utils.create_input_fn(
+        pipeline=pipeline, batch_size=2, pool_size=3)
+    features, _ = input_fn()
+
+    with self.test_session() as sess:
+      with tf.contrib.slim.queues.QueueRunners(sess):
+        batches = [sess.run(features) for _ in range(3)]
+
+    # Each batch holds neighbouring lengths and is padded to its maximum.
+    # The lengths include the SEQUENCE_END token.
+    lengths = sorted(sorted(_["source_len"].tolist()) for _ in batches)
+    self.assertEqual(lengths, [[2, 3], [4, 5], [6, 7]])
+    for batch in batches:
+      self.assertEqual(batch["source_tokens"].shape[1],
+                       max(batch["source_len"]))
+
+  def _read_filtered_lengths(self, **kwargs):
+    """Reads all batches of a pipeline that drops short and long examples
+    and returns the source lengths of the kept examples."""
+    sources = [" ".join(["a"] * length) for length in [1, 3, 5, 2, 4, 6]]
+    sources_file, targets_file = test_utils.create_temp_parallel_data(
+        sources=sources, targets=sources)
+    pipeline = input_pipeline.ParallelTextInputPipeline(
+        params={
+            "source_files": [sources_file.name],
+            "target_files": [targets_file.name],
+            "source_min_len": 3,
+            "source_max_len": 5,
+            "filter_long_examples": True,
+            "num_epochs": 1,
+            "shuffle": False
+        },
+        mode=tf.contrib.learn.ModeKeys.EVAL)
+    input_fn = training_utils.create_input_fn(
+        pipeline=pipeline, batch_size=2, allow_smaller_final_batch=True,
+        **kwargs)
+    features, _ = input_fn()
+
+    lengths = []
+    with self.test_session() as sess:
+      sess.run(tf.local_variables_initializer())
+      with tf.contrib.slim.queues.QueueRunners(sess):
+        try:
+          while True:
+            lengths.extend(sess.run(features)["source_len"].tolist())
+        except tf.errors.OutOfRangeError:
+          pass
+    return sorted(lengths)
+
+  def test_filtered_examples(self):
+    # The lengths include the SEQUENCE_END token
+    self.assertEqual(self._read_filtered_lengths(), [3, 4, 5])
+
+  def test_filtered_examples_with_buckets(self):
+    self.assertEqual(
+        self._read_filtered_lengths(bucket_boundaries=[4]), [3, 4, 5])
+
+  def test_filtered_batch(self):
+    # The TensorFlow 1.0 fallback for tf.train.maybe_batch
+    #pylint: disable=protected-access
+    counter = tf.train.limit_epochs(tf.range(6), num_epochs=1)
+    value = tf.train.batch([counter], batch_size=1, enqueue_many=True)[0][0]
+    batch = training_utils._filtered_batch(
+        tensors={"value": value},
+        keep_input=tf.equal(value % 2, 0),
+        batch_size=2,
+        allow_smaller_final_batch=True)
+
+    with self.test_session() as sess:
+      sess.run(tf.local_variables_initializer())
+      with tf.contrib.slim.queues.QueueRunners(sess):
+        values = sess.run(batch["value"]).tolist()
+        values += sess.run(batch["value"]).tolist()
+    self.assertEqual(values, [0, 2, 4])
+
+  def test_pool_and_buckets(self):
+    with self.assertRaises(ValueError):
+      training_utils.create_input_fn(
+          pipeline=None, batch_size=2, pool_size=3, bucket_boundaries=[5])
+
+
+class TestCachedInputFn(tf.test.TestCase):
+  """Tests create_cached_input_fn"""
+
+  def setUp(self):
+    super(TestCachedInputFn, self).setUp()
+    self.sources_file, self.targets_file = \
+      test_utils.create_temp_parallel_data(
+          sources=["Hello World .", "a b", "c"],
+          targets=["Goodbye .", "b a", "d"])
+    self.pipeline = input_pipeline.ParallelTextInputPipeline(
+        params={
+            "source_files": [self.sources_file.name],
+            "target_files": [self.targets_file.name],
+            "num_epochs": 1,
+            "shuffle": False
+        },
+        mode=tf.contrib.learn.ModeKeys.EVAL)
+
+  def tearDown(self):
+    super(TestCachedInputFn, self).tearDown()
+    self.sources_file.close()
+    self.targets_file.close()
+
+  def _read_all(self, input_fn):
+    """Reads all batches produced by the input function"""
+    results = []
+    with tf.Graph().as_default():
+      features, labels = input_fn()
+      with tf.Session() as sess:
+        sess.run(tf.local_variables_initializer())
+        with tf.contrib.slim.queues.QueueRunners(sess):
+          try:
+            while True:
+              results.append(sess.run([features, labels]))
+          except tf.errors.OutOfRangeError:
+            pass
+    return results
+
+  def test_replay(self):
+    cache_path = os.path.join(tempfile.mkdtemp(), "cache.npz")
+    input_fn = training_utils.create_cached_input_fn(
+        pipeline=self.pipeline,
+        batch_size=2,
+        allow_smaller_final_batch=True,
+        cache_path=cache_path)
+
+    # All calls produce the same batches
+    first_results = self._read_all(input_fn)
+    second_results = self._read_all(input_fn)
+    self.assertEqual(len(first_results), 2)
+    self.assertEqual(len(second_results), 2)
+    for (features1, labels1), (features2, labels2) in zip(first_results,
+                                                          second_results):
+      np.testing.assert_array_equal(features1["source_tokens"],
+                                    features2["source_tokens"])
+      np.testing.assert_array_equal(labels1["target_len"],
+                                    labels2["target_len"])
+    np.testing.assert_array_equal(first_results[0][0]["source_len"], [4, 3])
+
+    # A new input function loads the batches from the cache file
+    self.assertTrue(os.path.exists(cache_path))
+    input_fn = training_utils.create_cached_input_fn(
+        pipeline=self.pipeline, batch_size=2, cache_path=cache_path)
+    loaded_results = self._read_all(input_fn)
+    np.testing.assert_array_equal(loaded_results[1][0]["source_tokens"],
+                                  first_results[1][0]["source_tokens"])
+
 
 class TestLRDecay(tf.test.TestCase):
   """Tests learning rate decay function.
@@ -21,6 +21,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import tempfile
+
 import tensorflow as tf
 import numpy as np
 
@@ -117,6 +119,66 @@ class CreateVocabularyLookupTableTest(tf.test.TestCase):
       counts = sess.run(counts)
       np.testing.assert_array_equal(counts, [100, 200, 300, -1, -1])
 
+  def test_tables_are_shared(self):
+    vocab_file = test_utils.create_temporary_vocab_file(["Hello", "."])
+    tables1 = vocab.create_vocabulary_lookup_table(vocab_file.name)
+    tables2 = vocab.create_vocabulary_lookup_table(vocab_file.name)
+    self.assertIs(tables1[0], tables2[0])
+    with tf.Graph().as_default():
+      tables3 = vocab.create_vocabulary_lookup_table(vocab_file.name)
+    self.assertIsNot(tables1[0], tables3[0])
+
+
+class CompiledVocabularyTest(tf.test.TestCase):
+  """
+  Tests compiled vocabularies.
+  """
+
+  def setUp(self):
+    super(CompiledVocabularyTest, self).setUp()
+    self.vocab_file = test_utils.create_temporary_vocab_file(
+        ["Hello", ".", "笑"], [100, 200, 300])
+    self.vocab_dir = tempfile.mkdtemp()
+    vocab.compile_vocabulary(self.vocab_file.name, self.vocab_dir)
+
+  def test_vocab_info(self):
+    self.assertTrue(vocab.is_compiled_vocab(self.vocab_dir))
+    self.assertFalse(vocab.is_compiled_vocab(self.vocab_file.name))
+    vocab_info = vocab.get_vocab_info(self.vocab_dir)
+    self.assertEqual(vocab_info.vocab_size, 3)
+    self.assertEqual(vocab_info.path, self.vocab_dir)
+    self.assertEqual(vocab_info.special_vocab.UNK, 3)
+    self.assertEqual(vocab_info.total_size, 6)
+
+  def test_lookup_tables(self):
+    vocab_to_id_table, id_to_vocab_table, word_to_count_table, vocab_size = \
+      vocab.create_vocabulary_lookup_table(self.vocab_dir)
+
+    self.assertEqual(vocab_size, 6)
+    graph_def = tf.get_default_graph().as_graph_def().SerializeToString()
+    self.assertNotIn("Hello".encode("utf-8"), graph_def)
+
+    with self.test_session() as sess:
+      sess.run(tf.tables_initializer())
+
+      ids = vocab_to_id_table.lookup(
+          tf.convert_to_tensor(["Hello", ".", "笑", "SEQUENCE_END", "xxx"]))
+      ids = sess.run(ids)
+      np.testing.assert_array_equal(ids, [0, 1, 2, 5, 3])
+
+      words = id_to_vocab_table.lookup(
+          tf.convert_to_tensor(
+              [0, 1, 2, 3, 7], dtype=tf.int64))
+      words = sess.run(words)
+      np.testing.assert_array_equal(
+          np.char.decode(words.astype("S"), "utf-8"),
+          ["Hello", ".", "笑", "UNK", "UNK"])
+
+      counts = word_to_count_table.lookup(
+          tf.convert_to_tensor(["Hello", ".", "笑", "UNK", "xxx"]))
+      counts = sess.run(counts)
+      np.testing.assert_array_equal(counts, [100, 200, 300, -1, -1])
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stops training when an evaluation metric stops improving.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+
+import tensorflow as tf
+from tensorflow import gfile
+
+from seq2seq.training.evaluator import delete_checkpoint
+
+# Written to the model directory when early stopping ends training, so that
+# other workers of a cluster can stop as well.
+STOP_MARKER_FILENAME = "early_stopping_stop.json"
+
+
+class EarlyStopping(object):
+  """Decides when to stop training based on an evaluation metric.
+
+  Training stops when the metric has not improved by more than `min_delta`
+  for `patience` consecutive evaluations. Optionally, the weights of the best
+  evaluation are kept in `best_dir`.
+
+  Args:
+    metric: The name of the evaluation metric to monitor, e.g. `loss` or
+      `bleu`.
+    patience: The number of evaluations without improvement after which
+      training is stopped.
+    min_delta: The minimum change of the metric that counts as improvement.
+    higher_is_better: Whether higher values of the metric are better.
+    best_dir: Optional, a directory to keep the checkpoint of the best
+      evaluation in.
+    stop_marker: Optional, a file that is written when training should stop.
+      Workers that do not evaluate watch this file with a `StopMarkerHook`.
+  """
+
+  def __init__(self, metric, patience, min_delta=0.0, higher_is_better=False,
+               best_dir=None, stop_marker=None):
+    self.metric = metric
+    self.patience = patience
+    self.min_delta = min_delta
+    self.higher_is_better = higher_is_better
+    self.best_dir = best_dir
+    self.stop_marker = stop_marker
+    self.best_result = None
+    self.num_bad_evaluations = 0
+    self._best_checkpoint = None
+
+  def _is_improvement(self, value):
+    if self.best_result is None:
+      return True
+    best_value = self.best_result[self.metric]
+    if self.higher_is_better:
+      return value > best_value + self.min_delta
+    return value < best_value - self.min_delta
+
+  def update(self, eval_result, save_fn=None):
+    """Updates the state with the results of a new evaluation.
+
+    Args:
+      eval_result: A dictionary of evaluation results.
+      save_fn: Optional, a function that saves the evaluated weights to a
+        given checkpoint path. Called if the results are the best so far and
+        `best_dir` is set.
+
+    Returns:
+      True if training should stop.
+    """
+    if self.metric not in eval_result:
+      raise ValueError("Early stopping metric {} not found in the evaluation "
+                       "results: {}".format(self.metric,
+                                            list(eval_result.keys())))
+    value = float(eval_result[self.metric])
+    if self._is_improvement(value):
+      self.best_result = {k: float(v) for k, v in eval_result.items()}
+      self.num_bad_evaluations = 0
+      if self.best_dir and save_fn is not None:
+        self._save_best(save_fn)
+    else:
+      self.num_bad_evaluations += 1
+
+    tf.logging.info(
+        "Early stopping: %s = %g, best %g at step %d, %d of %d evaluations "
+        "without improvement", self.metric, value,
+        self.best_result[self.metric],
+        self.best_result[tf.GraphKeys.GLOBAL_STEP],
+        self.num_bad_evaluations, self.patience)
+    if self.num_bad_evaluations >= self.patience:
+      tf.logging.info("Stopping training, %s has not improved for %d "
+                      "evaluations", self.metric, self.patience)
+      if self.stop_marker:
+        self._write_stop_marker(eval_result)
+      return True
+    return False
+
+  def __call__(self, eval_result):
+    """Makes the object usable as `continuous_eval_predicate_fn`. Returns
+    False once training should stop."""
+    if eval_result is None:
+      return True
+    return not self.update(eval_result)
+
+  def _save_best(self, save_fn):
+    """Replaces the checkpoint in `best_dir` with the evaluated weights."""
+    gfile.MakeDirs(self.best_dir)
+    checkpoint_path = os.path.join(
+        self.best_dir,
+        "model.ckpt-{}".format(int(self.best_result[tf.GraphKeys.GLOBAL_STEP])))
+    if self._best_checkpoint and self._best_checkpoint != checkpoint_path:
+      delete_checkpoint(self._best_checkpoint)
+    save_fn(checkpoint_path)
+    self._best_checkpoint = checkpoint_path
+    tf.train.update_checkpoint_state(self.best_dir, checkpoint_path)
+    with gfile.GFile(os.path.join(self.best_dir, "eval_result.json"),
+                     "w") as file:
+      file.write(json.dumps(self.best_result, indent=1, sort_keys=True))
+    tf.logging.info("Saved the best checkpoint to %s", checkpoint_path)
+
+  def _write_stop_marker(self, eval_result):
+    """Writes the stop marker with the step at which training stopped."""
+    with gfile.GFile(self.stop_marker, "w") as file:
+      file.write(json.dumps({
+          "global_step": int(eval_result[tf.GraphKeys.GLOBAL_STEP]),
+          "best_result": self.best_result
+      }, indent=1, sort_keys=True))
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An evaluator that keeps its graph and session alive between evaluations.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import gfile
+
+from seq2seq.training import utils as training_utils
+
+
+class Evaluator(object):
+  """Evaluates a model on a fixed set of batches, reusing the same graph and
+  session for every evaluation.
+
+  The evaluation data is read into memory once. Each evaluation loads new
+  weights, either from another session via `load_weights` or from a
+  checkpoint via `restore`, resets the metrics and feeds all batches
+  through the model. This avoids rebuilding the graph, the vocabulary tables
+  and the input queues for every evaluation.
+
+  Args:
+    model_fn: A function `(features, labels, mode)` that builds the model and
+      returns a `ModelFnOps` instance, e.g. `Estimator._call_model_fn`.
+    input_fn: The evaluation input function. It must produce a finite
+      number of batches.
+    metrics: A dictionary from metric names to `MetricSpec` instances.
+    eval_dir: The directory to write evaluation summaries to.
+    session_config: Optional, a `ConfigProto` for the evaluation session.
+  """
+
+  def __init__(self, model_fn, input_fn, metrics, eval_dir,
+               session_config=None):
+    self._eval_dir = eval_dir
+    self._batches = training_utils.materialize_batches(input_fn)
+    if not self._batches:
+      raise ValueError("The evaluation input did not produce any batches.")
+    tf.logging.info("Read %d evaluation batches", len(self._batches))
+
+    self._graph = tf.Graph()
+    with self._graph.as_default():
+      self._global_step = tf.contrib.framework.create_global_step()
+      first_features, first_labels = self._batches[0]
+      self._features = self._create_placeholders(first_features, "features")
+      self._labels = None
+      if first_labels is not None:
+        self._labels = self._create_placeholders(first_labels, "labels")
+
+      model_fn_ops = model_fn(self._features, self._labels,
+                              tf.contrib.learn.ModeKeys.EVAL)
+
+      self._metric_values = {}
+      self._metric_updates = []
+      with tf.name_scope("metrics"):
+        loss_value, loss_update = tf.contrib.metrics.streaming_mean(
+            model_fn_ops.loss)
+        self._metric_values["loss"] = loss_value
+        self._metric_updates.append(loss_update)
+        for name, metric in (metrics or {}).items():
+          value, update = metric.create_metric_ops(
+              self._features, self._labels, model_fn_ops.predictions)
+          self._metric_values[name] = value
+          self._metric_updates.append(update)
+
+      # Ops to load weights from memory
+      self._variables = {_.op.name: _ for _ in tf.global_variables()}
+      self._assign_placeholders = {}
+      self._assign_ops = {}
+      for name, var in self._variables.items():
+        placeholder = tf.placeholder(var.dtype.base_dtype, var.get_shape())
+        self._assign_placeholders[name] = placeholder
+        self._assign_ops[name] = tf.assign(var, placeholder)
+
+      self._saver = tf.train.Saver(sharded=True)
+      self._local_init_op = tf.local_variables_initializer()
+      self._session = tf.Session(graph=self._graph, config=session_config)
+      self._session.run(tf.global_variables_initializer())
+      self._session.run(tf.tables_initializer())
+      self._graph.finalize()
+
+  @staticmethod
+  def _create_placeholders(arrays, name):
+    """Creates a placeholder for each array in a dictionary."""
+    placeholders = {}
+    with tf.name_scope(name):
+      for key, array in arrays.items():
+        placeholders[key] = tf.placeholder(
+            training_utils._tf_dtype(array),  # pylint: disable=protected-access
+            [None] * array.ndim,
+            name=key)
+    return placeholders
+
+  @property
+  def variable_names(self):
+    """The names of all variables of the evaluation model."""
+    return sorted(self._variables.keys())
+
+  def load_weights(self, values):
+    """Loads weights from a dictionary of variable names to numpy arrays.
+    Variables without a value keep their current value."""
+    feed_dict = {}
+    assign_ops = []
+    for name, value in values.items():
+      if name not in self._assign_ops:
+        continue
+      feed_dict[self._assign_placeholders[name]] = value
+      assign_ops.append(self._assign_ops[name])
+    self._session.run(assign_ops, feed_dict)
+
+  def restore(self, checkpoint_path):
+    """Loads all weights from a checkpoint."""
+    self._saver.restore(self._session, checkpoint_path)
+
+  def evaluate(self, name="one_pass"):
+    """Evaluates the current weights on all batches.
+
+    Args:
+      name: The name of the evaluation. Summaries are written to the
+        `eval_<name>` subdirectory of `eval_dir`.
+
+    Returns:
+      A dictionary from metric names to values. Contains the global step of
+      the evaluated weights under `global_step`.
+    """
+    self._session.run(self._local_init_op)
+    for features, labels in self._batches:
+      feed_dict = {self._features[k]: v for k, v in features.items()}
+      if self._labels is not None:
+        feed_dict.update({self._labels[k]: v for k, v in labels.items()})
+      self._session.run(self._metric_updates, feed_dict)
+
+    results = self._session.run(self._metric_values)
+    global_step = int(self._session.run(self._global_step))
+    results[tf.GraphKeys.GLOBAL_STEP] = global_step
+    tf.logging.info("Evaluation @ step %d: %s", global_step, ", ".join(
+        "{} = {}".format(k, v) for k, v in sorted(results.items())))
+
+    summary = tf.Summary()
+    for key, value in results.items():
+      if key != tf.GraphKeys.GLOBAL_STEP and np.isscalar(value):
+        summary.value.add(tag=key, simple_value=float(value))
+    writer = tf.summary.FileWriterCache.get(
+        os.path.join(self._eval_dir, "eval_" + name))
+    writer.add_summary(summary, global_step)
+    writer.flush()
+    return results
+
+  def save(self, checkpoint_path):
+    """Saves the current weights of the evaluation model to a checkpoint."""
+    self._saver.save(self._session, checkpoint_path, write_meta_graph=False)
+
+  def close(self):
+    """Closes the evaluation session."""
+    self._session.close()
+
+
+def delete_checkpoint(checkpoint_path):
+  """Deletes all files of a checkpoint, e.g. the index, data and meta graph
+  files of `model.ckpt-1000`."""
+  for path in gfile.Glob(checkpoint_path + ".*") + [checkpoint_path]:
+    if gfile.Exists(path):
+      gfile.Remove(path)
+
+
+def copy_checkpoint(checkpoint_path, new_checkpoint_path):
+  """Copies all files of a checkpoint to a new checkpoint path."""
+  for path in gfile.Glob(checkpoint_path + ".*"):
+    gfile.Copy(
+        path, new_checkpoint_path + path[len(checkpoint_path):],
+        overwrite=True)
+
+
+class BestCheckpoints(object):
+  """Ranks evaluated checkpoints by a metric and determines which of them
+  are not among the best K.
+
+  The ranking is stored in a JSON file so that it survives restarts.
+
+  Args:
+    metric: The name of the metric to rank checkpoints by.
+    higher_is_better: Whether higher values of the metric are better.
+    num_best: The number of best checkpoints to keep.
+    state_path: Optional, a JSON file to save the ranking to. If it exists,
+      the ranking is loaded from it.
+  """
+
+  def __init__(self, metric, higher_is_better, num_best, state_path=None):
+    self.metric = metric
+    self.higher_is_better = higher_is_better
+    self.num_best = num_best
+    self._state_path = state_path
+    self._entries = []
+    if state_path and gfile.Exists(state_path):
+      with gfile.GFile(state_path) as file:
+        self._entries = json.loads(file.read())
+
+  def _save(self):
+    if self._state_path:
+      with gfile.GFile(self._state_path, "w") as file:
+        file.write(json.dumps(self._entries, indent=1))
+
+  def _sort_key(self, entry):
+    value = entry["value"]
+    return -value if self.higher_is_better else value
+
+  def __contains__(self, checkpoint_path):
+    return any(_["checkpoint_path"] == checkpoint_path for _ in self._entries)
+
+  @property
+  def best(self):
+    """The best `num_best` entries, best first. Each entry is a dictionary
+    with `checkpoint_path`, `global_step` and `value` keys."""
+    entries = sorted(self._entries, key=self._sort_key)
+    return entries[:self.num_best]
+
+  def add(self, checkpoint_path, eval_result):
+    """Adds the evaluation results of a checkpoint.
+
+    Returns:
+      True if the checkpoint is among the best `num_best` checkpoints.
+    """
+    if self.metric not in eval_result:
+      raise ValueError("Metric {} not found in the evaluation results: {}"
+                       .format(self.metric, list(eval_result.keys())))
+    self._entries.append({
+        "checkpoint_path": checkpoint_path,
+        "global_step": int(eval_result.get(tf.GraphKeys.GLOBAL_STEP, -1)),
+        "value": float(eval_result[self.metric]),
+        "deleted": False
+    })
+    self._save()
+    return checkpoint_path in [_["checkpoint_path"] for _ in self.best]
+
+  def checkpoints_to_delete(self, exclude=None):
+    """Returns the paths of all evaluated checkpoints that are not among the
+    best and have not been deleted yet, except those in `exclude`."""
+    best_paths = set(_["checkpoint_path"] for _ in self.best)
+    exclude = set(exclude or [])
+    return [
+        _["checkpoint_path"] for _ in self._entries
+        if not _["deleted"] and _["checkpoint_path"] not in best_paths and
+        _["checkpoint_path"] not in exclude
+    ]
+
+  def mark_deleted(self, checkpoint_path):
+    """Records that the files of a checkpoint have been deleted."""
+    for entry in self._entries:
+      if entry["checkpoint_path"] == checkpoint_path:
+        entry["deleted"] = True
+    self._save()
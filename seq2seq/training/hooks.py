@@ -21,7 +21,10 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import abc
+import collections
+import json
 import os
+import time
 
 import numpy as np
 import six
@@ -32,10 +35,14 @@ import tensorflow as tf
 from tensorflow.python.training.basic_session_run_hooks import SecondOrStepTimer  # pylint: disable=E0611
 from tensorflow.python.training import session_manager # pylint: disable=E0611
 from tensorflow.python.client import timeline  # pylint: disable=E0611
+from tensorflow.python.framework import tensor_util  # pylint: disable=E0611
+from tensorflow.contrib.tfprof.python.tools.tfprof import tfprof_logger  # pylint: disable=E0611
 from tensorflow import gfile
 
 from seq2seq.configurable import Configurable, abstractstaticmethod
 from seq2seq import graph_utils, global_vars
+from seq2seq.training import profiling
+from seq2seq.training.early_stopping import STOP_MARKER_FILENAME
 
 FLAGS = tf.flags.FLAGS
 
@@ -70,12 +77,26 @@ class TrainingHook(tf.train.SessionRunHook, Configurable):
 
 
 class MetadataCaptureHook(TrainingHook):
-  """A hook to capture metadata for a single step.
-  Useful for performance debugging. It performs a full trace and saves
-  run_metadata and Chrome timeline information to a file.
+  """A hook to capture full traces of training steps.
+  Useful for performance debugging. It saves run_metadata and Chrome timeline
+  information to files.
+
+  By default only a single step is traced and its files are written to the
+  model directory. If `every_n_steps` or `every_n_secs` is set, the hook
+  instead traces `num_steps` consecutive steps periodically, starting at
+  `step`. Each capture is written to a `metadata/capture-<step>` directory
+  and only the latest `max_captures` captures are kept. The per-op execution
+  time, memory and floating point operations are averaged over all traced
+  steps and written to `metadata/op_stats.json`, which can be summarized by
+  `bin/tools/profile.py`.
 
-  Args:
-    step: The step number to trace. The hook is only enable for this step.
+  Params:
+    step: The step number to trace. In periodic mode, the first step to
+      trace.
+    every_n_steps: Optional, capture traces every N steps.
+    every_n_secs: Optional, capture traces every N seconds.
+    num_steps: The number of consecutive steps traced per capture.
+    max_captures: The number of captures kept on disk.
   """
 
   def __init__(self, params, model_dir, run_config):
@@ -84,13 +105,34 @@ class MetadataCaptureHook(TrainingHook):
     self._done = False
     self._global_step = None
     self._output_dir = os.path.abspath(self.model_dir)
+    self._periodic = (self.params["every_n_steps"] is not None or
+                      self.params["every_n_secs"] is not None)
+    self._timer = None
+    if self._periodic:
+      self._timer = SecondOrStepTimer(
+          every_secs=self.params["every_n_secs"],
+          every_steps=self.params["every_n_steps"])
+      self._output_dir = os.path.join(self._output_dir, "metadata")
+    self._capture_dir = None
+    self._captures = []
+    self._steps_to_trace = 0
+    self._op_stats = None
 
   @staticmethod
   def default_params():
-    return {"step": 10}
+    return {
+        "step": 10,
+        "every_n_steps": None,
+        "every_n_secs": None,
+        "num_steps": 1,
+        "max_captures": 5
+    }
 
   def begin(self):
     self._global_step = tf.train.get_global_step()
+    self._op_stats = profiling.OpStatsAccumulator(op_types={
+        op.name: op.type for op in tf.get_default_graph().get_operations()
+    })
 
   def before_run(self, _run_context):
     if not self.is_chief or self._done:
@@ -105,38 +147,95 @@ class MetadataCaptureHook(TrainingHook):
   def after_run(self, _run_context, run_values):
     if not self.is_chief or self._done:
       return
+    if self._periodic:
+      self._after_run_periodic(run_values)
+      return
 
     step_done = run_values.results
     if self._active:
       tf.logging.info("Captured full trace at step %s", step_done)
-      # Create output directory
-      gfile.MakeDirs(self._output_dir)
-
-      # Save run metadata
-      trace_path = os.path.join(self._output_dir, "run_meta")
-      with gfile.GFile(trace_path, "wb") as trace_file:
-        trace_file.write(run_values.run_metadata.SerializeToString())
-        tf.logging.info("Saved run_metadata to %s", trace_path)
-
-      # Save timeline
-      timeline_path = os.path.join(self._output_dir, "timeline.json")
-      with gfile.GFile(timeline_path, "w") as timeline_file:
-        tl_info = timeline.Timeline(run_values.run_metadata.step_stats)
-        tl_chrome = tl_info.generate_chrome_trace_format(show_memory=True)
-        timeline_file.write(tl_chrome)
-        tf.logging.info("Saved timeline to %s", timeline_path)
-
-      # Save tfprof op log
-      tf.contrib.tfprof.tfprof_logger.write_op_log(
-          graph=tf.get_default_graph(),
-          log_dir=self._output_dir,
-          run_meta=run_values.run_metadata)
-      tf.logging.info("Saved op log to %s", self._output_dir)
+      self._write_trace(self._output_dir, run_values.run_metadata)
       self._active = False
       self._done = True
 
     self._active = (step_done >= self.params["step"])
 
+  def _after_run_periodic(self, run_values):
+    """Traces `num_steps` consecutive steps whenever the timer triggers."""
+    step_done = run_values.results
+    if self._active:
+      tf.logging.info("Captured full trace at step %s", step_done)
+      run_metadata = run_values.run_metadata
+      self._write_trace(self._capture_dir, run_metadata, step_done)
+      float_ops = {
+          name: entry.float_ops
+          for name, entry in tfprof_logger._get_logged_ops(  # pylint: disable=protected-access
+              tf.get_default_graph(), run_metadata).items()
+      }
+      self._op_stats.add(
+          step_done,
+          profiling.collect_op_stats(run_metadata.step_stats, float_ops))
+      self._steps_to_trace -= 1
+      if self._steps_to_trace == 0:
+        self._finish_capture(run_metadata)
+      return
+
+    if step_done < self.params["step"]:
+      return
+    if self._timer.should_trigger_for_step(step_done):
+      self._timer.update_last_triggered_step(step_done)
+      self._active = True
+      self._steps_to_trace = self.params["num_steps"]
+      self._capture_dir = os.path.join(
+          self._output_dir, "capture-{:08d}".format(step_done))
+
+  def _finish_capture(self, run_metadata):
+    """Saves the aggregated statistics and removes old captures."""
+    self._active = False
+    self._captures.append(self._capture_dir)
+    while len(self._captures) > self.params["max_captures"]:
+      gfile.DeleteRecursively(self._captures.pop(0))
+
+    # The latest trace is also the input for the analyses of profile.py
+    with gfile.GFile(os.path.join(self._output_dir, "run_meta"), "wb") as file:
+      file.write(run_metadata.SerializeToString())
+    gfile.Copy(
+        os.path.join(self._capture_dir, "tfprof_log"),
+        os.path.join(self._output_dir, "tfprof_log"),
+        overwrite=True)
+
+    op_stats_path = os.path.join(
+        self._output_dir, profiling.OP_STATS_FILENAME)
+    self._op_stats.save(op_stats_path)
+    tf.logging.info("Saved statistics of %d traced steps to %s",
+                    self._op_stats.num_steps, op_stats_path)
+
+  def _write_trace(self, output_dir, run_metadata, step=None):
+    """Writes the run metadata, timeline and op log of a traced step."""
+    suffix = "" if step is None else "-{:08d}".format(step)
+    gfile.MakeDirs(output_dir)
+
+    # Save run metadata
+    trace_path = os.path.join(output_dir, "run_meta" + suffix)
+    with gfile.GFile(trace_path, "wb") as trace_file:
+      trace_file.write(run_metadata.SerializeToString())
+      tf.logging.info("Saved run_metadata to %s", trace_path)
+
+    # Save timeline
+    timeline_path = os.path.join(output_dir, "timeline{}.json".format(suffix))
+    with gfile.GFile(timeline_path, "w") as timeline_file:
+      tl_info = timeline.Timeline(run_metadata.step_stats)
+      tl_chrome = tl_info.generate_chrome_trace_format(show_memory=True)
+      timeline_file.write(tl_chrome)
+      tf.logging.info("Saved timeline to %s", timeline_path)
+
+    # Save tfprof op log
+    tfprof_logger.write_op_log(
+        graph=tf.get_default_graph(),
+        log_dir=output_dir,
+        run_meta=run_metadata)
+    tf.logging.info("Saved op log to %s", output_dir)
+
 
 class TrainSampleHook(TrainingHook):
   """Occasionally samples predictions from the training run and prints them.
@@ -373,3 +472,513 @@ class SyncReplicasOptimizerHook(TrainingHook):
     if self._q_runner is not None:
       self._q_runner.create_threads(
           session, coord=coord, daemon=True, start=True)
+
+
+class StopMarkerHook(TrainingHook):
+  """Stops training once another process writes a stop marker file to the
+  model directory. In a cluster only the chief evaluates the model for early
+  stopping. The chief writes the marker when it stops, and this hook stops
+  the other workers.
+
+  A marker that already exists when training starts is left from an earlier
+  run and ignored until it is rewritten.
+
+  Params:
+    every_n_secs: Check for the marker every N seconds.
+    marker_file: Name of the marker file in the model directory.
+  """
+
+  #pylint: disable=missing-docstring
+
+  def __init__(self, params, model_dir, run_config):
+    super(StopMarkerHook, self).__init__(params, model_dir, run_config)
+    self._marker_path = os.path.join(self.model_dir,
+                                     self.params["marker_file"])
+    self._initial_marker = None
+    self._last_check = None
+
+  @staticmethod
+  def default_params():
+    return {
+        "every_n_secs": 30,
+        "marker_file": STOP_MARKER_FILENAME,
+    }
+
+  def _read_marker(self):
+    if not gfile.Exists(self._marker_path):
+      return None
+    with gfile.GFile(self._marker_path) as file:
+      return file.read()
+
+  def begin(self):
+    self._initial_marker = self._read_marker()
+    self._last_check = time.time()
+
+  def after_run(self, run_context, _run_values):
+    if time.time() - self._last_check < self.params["every_n_secs"]:
+      return
+    self._last_check = time.time()
+    marker = self._read_marker()
+    if marker is not None and marker != self._initial_marker:
+      tf.logging.info("Found stop marker %s. Stopping training.",
+                      self._marker_path)
+      run_context.request_stop()
+
+
+DEQUEUE_OP_TYPES = set([
+    "QueueDequeue", "QueueDequeueV2", "QueueDequeueMany", "QueueDequeueManyV2",
+    "QueueDequeueUpTo", "QueueDequeueUpToV2"
+])
+
+
+def _find_dequeue_op(tensors):
+  """Finds the dequeue operation closest to a batch of tensors.
+
+  Args:
+    tensors: A list of tensors computed from a batch of input data.
+
+  Returns:
+    The dequeue operation, or None if the tensors are not read from a queue.
+  """
+  visited = set()
+  ops = collections.deque(_.op for _ in tensors)
+  while ops:
+    op = ops.popleft()
+    if op in visited:
+      continue
+    visited.add(op)
+    if op.type in DEQUEUE_OP_TYPES:
+      return op
+    ops.extend(_.op for _ in op.inputs)
+  return None
+
+
+def _dequeue_size(dequeue_op):
+  """Returns the number of elements a single run of `dequeue_op` removes."""
+  dequeue_size = 1
+  if len(dequeue_op.inputs) > 1:
+    dequeue_size = tensor_util.constant_value(dequeue_op.inputs[1]) or 1
+  return int(dequeue_size)
+
+
+def _find_input_queue(tensors):
+  """Finds the queue that a batch of tensors is dequeued from.
+
+  Args:
+    tensors: A list of tensors computed from a batch of input data.
+
+  Returns:
+    A tuple `(queue_op, dequeue_size)` of the queue operation closest to the
+    given tensors and the number of elements a single dequeue removes from
+    it, or `(None, None)` if the tensors are not read from a queue.
+  """
+  dequeue_op = _find_dequeue_op(tensors)
+  if dequeue_op is None:
+    return None, None
+  return dequeue_op.inputs[0].op, _dequeue_size(dequeue_op)
+
+
+def _queue_size(queue_op):
+  """Returns a tensor with the number of elements in a queue."""
+  queue = tf.QueueBase(
+      dtypes=queue_op.get_attr("component_types"),
+      shapes=None,
+      names=None,
+      queue_ref=queue_op.outputs[0])
+  return queue.size()
+
+
+def _batch_statistics(features, labels):
+  """Creates tensors that count the examples, the tokens, and the token
+  positions including padding in a batch.
+  """
+  stats = {}
+  tensors = list(features.values()) + list(labels.values())
+  if not tensors:
+    return stats
+  stats["examples"] = tf.shape(tensors[0])[0]
+
+  real_tokens = []
+  padded_tokens = []
+  for dict_, prefix in [(features, "source"), (labels, "target")]:
+    tokens_key, len_key = prefix + "_tokens", prefix + "_len"
+    if tokens_key in dict_ and len_key in dict_:
+      real_tokens.append(tf.reduce_sum(tf.to_int64(dict_[len_key])))
+      padded_tokens.append(tf.to_int64(tf.size(dict_[tokens_key])))
+  if real_tokens:
+    stats["tokens"] = tf.add_n(real_tokens)
+    stats["padded_tokens"] = tf.add_n(padded_tokens)
+  return stats
+
+
+class ThroughputHook(TrainingHook):
+  """Measures training throughput and splits the step time into time spent
+  waiting for input and time spent computing.
+
+  Together with each step the hook fetches the size of the queue the model
+  reads its batches from, right after the step's own dequeue. If the queue
+  holds less than a full batch at that point, the next step is counted as
+  input-bound. Their wait for input is estimated as the
+  difference to the median time of the steps that started with a full
+  queue.
+
+  Every report is logged, written as summaries, and appended as a line of
+  JSON to `log_file` on the chief.
+
+  Params:
+    every_n_steps: Report every N steps.
+      If set, `every_n_secs` must be None.
+    every_n_secs: Report every N seconds.
+      If set, `every_n_steps` must be None.
+    percentiles: A list of step time percentiles to report.
+    log_file: Name of the JSON log file in the model directory. An empty
+      string disables the log.
+  """
+
+  #pylint: disable=missing-docstring
+
+  def __init__(self, params, model_dir, run_config):
+    super(ThroughputHook, self).__init__(params, model_dir, run_config)
+    self._timer = SecondOrStepTimer(
+        every_secs=self.params["every_n_secs"],
+        every_steps=self.params["every_n_steps"])
+    self._global_step = None
+    self._batch_stats = {}
+    self._queue_size = None
+    self._dequeue_size = None
+    self._step_start = None
+    self._starved = False
+    self._next_starved = False
+    self._reset_window()
+
+  @staticmethod
+  def default_params():
+    return {
+        "every_n_steps": 100,
+        "every_n_secs": None,
+        "percentiles": [50, 90, 99],
+        "log_file": "throughput.jsonl"
+    }
+
+  def _reset_window(self):
+    self._window_start = time.time()
+    self._step_times = []
+    self._starved_steps = []
+    self._totals = collections.defaultdict(int)
+
+  def begin(self):
+    self._global_step = tf.train.get_global_step()
+    features = graph_utils.get_dict_from_collection("features")
+    labels = graph_utils.get_dict_from_collection("labels")
+    with tf.name_scope("throughput_hook"):
+      self._batch_stats = _batch_statistics(features, labels)
+      dequeue_op = _find_dequeue_op(
+          list(features.values()) + list(labels.values()))
+      if dequeue_op is not None:
+        self._dequeue_size = _dequeue_size(dequeue_op)
+        # Read the size after this step's dequeue, so the value does not
+        # depend on the order in which the step's ops happen to run.
+        with tf.control_dependencies([dequeue_op]):
+          self._queue_size = _queue_size(dequeue_op.inputs[0].op)
+
+  def before_run(self, _run_context):
+    self._starved = self._next_starved
+    self._step_start = time.time()
+    fetches = [self._batch_stats, self._global_step]
+    if self._queue_size is not None:
+      fetches.append(self._queue_size)
+    return tf.train.SessionRunArgs(fetches)
+
+  def after_run(self, _run_context, run_values):
+    self._step_times.append(time.time() - self._step_start)
+    self._starved_steps.append(self._starved)
+    batch_stats, step = run_values.results[:2]
+    if self._queue_size is not None:
+      self._next_starved = run_values.results[2] < self._dequeue_size
+    for key, value in batch_stats.items():
+      self._totals[key] += int(value)
+
+    if not self._timer.should_trigger_for_step(step):
+      return
+    # The first window includes graph setup and warmup, so it is discarded.
+    if self._timer.last_triggered_step() is not None:
+      self._report(step)
+    self._timer.update_last_triggered_step(step)
+    self._reset_window()
+
+  def _compute_report(self, step):
+    """Returns a dictionary with the statistics of the current window."""
+    elapsed = max(time.time() - self._window_start, 1e-12)
+    step_times = np.array(self._step_times)
+    starved = np.array(self._starved_steps)
+
+    # Estimate the compute time of a step from the steps that did not have to
+    # wait for input. Everything above that is time spent waiting.
+    if np.any(~starved):
+      compute_time = np.median(step_times[~starved])
+    else:
+      compute_time = np.min(step_times)
+    input_wait = np.sum(np.maximum(step_times[starved] - compute_time, 0.0))
+
+    report = collections.OrderedDict()
+    report["global_step"] = int(step)
+    report["steps"] = len(step_times)
+    report["steps_per_sec"] = len(step_times) / elapsed
+    report["examples_per_sec"] = self._totals["examples"] / elapsed
+    if self._totals["padded_tokens"]:
+      report["tokens_per_sec"] = self._totals["tokens"] / elapsed
+      report["padding_ratio"] = (
+          1.0 - self._totals["tokens"] / self._totals["padded_tokens"])
+    for percentile in self.params["percentiles"]:
+      report["step_time_p{}".format(percentile)] = float(
+          np.percentile(step_times, percentile))
+    report["input_wait_fraction"] = float(input_wait / np.sum(step_times))
+    report["input_bound_steps"] = float(np.mean(starved))
+    return report
+
+  def _report(self, step):
+    report = self._compute_report(step)
+    tf.logging.info("Throughput @ step %d: %s", step, ", ".join(
+        "{}={:.4g}".format(k, v) for k, v in report.items()))
+    if not self.is_chief:
+      return
+
+    summary = tf.Summary(value=[
+        tf.Summary.Value(tag="throughput/" + key, simple_value=value)
+        for key, value in report.items() if key != "global_step"
+    ])
+    tf.summary.FileWriterCache.get(self.model_dir).add_summary(summary, step)
+
+    if self.params["log_file"]:
+      log_path = os.path.join(self.model_dir, self.params["log_file"])
+      with gfile.GFile(log_path, "a") as log_file:
+        log_file.write(json.dumps(report) + "\n")
+
+
+def _recommend_input_knobs(queue_stats, final_queue):
+  """Recommends changes to the input pipeline of an input-bound model.
+
+  Args:
+    queue_stats: A list of dictionaries with the `name`, `capacity`,
+      `mean_fill`, `max_fill` and `empty_fraction` of each input queue,
+      ordered from the readers to the model. A queue counts as empty if it
+      can not serve a single dequeue.
+    final_queue: The name of the queue the model dequeues its batches from.
+
+  Returns:
+    A list of recommendations.
+  """
+  stats_by_name = {_["name"]: _ for _ in queue_stats}
+  final = stats_by_name.get(final_queue)
+  upstream = [
+      _ for _ in queue_stats
+      if _["name"] != final_queue and "input_producer" not in _["name"]
+  ]
+  empty_upstream = [_ for _ in upstream if _["empty_fraction"] > 0.5]
+  full_upstream = [_ for _ in upstream if _["mean_fill"] > 0.5]
+
+  recommendations = []
+  if upstream and len(empty_upstream) == len(upstream):
+    recommendations.append(
+        "The reader queues ({}) are mostly empty, so reading the input is "
+        "the bottleneck. Use more parallel readers, split the data into more "
+        "files (bin/tools/shuffle_data.py), or move it to faster storage."
+        .format(", ".join(_["name"] for _ in upstream)))
+  elif full_upstream:
+    recommendations.append(
+        "{} is mostly full while the model waits for {}, so the "
+        "preprocessing between them is the bottleneck. Use more threads for "
+        "that stage (e.g. `num_decode_threads`) or precompute it offline "
+        "(bin/tools/compile_vocab.py, BPE codes, "
+        "bin/tools/cache_image_features.py).".format(
+            full_upstream[-1]["name"], final_queue))
+  elif not upstream:
+    recommendations.append(
+        "The model waits for {}, which is filled directly from the input "
+        "files. Use more input files and readers, or precompute the "
+        "preprocessing offline.".format(final_queue))
+
+  # Queues that run empty although they were full at times can not absorb
+  # bursts in the input speed. A deeper queue prefetches more.
+  for stats in queue_stats:
+    if "input_producer" in stats["name"] or stats["capacity"] <= 0:
+      continue
+    if stats["empty_fraction"] > 0.1 and stats["max_fill"] >= 0.9:
+      recommendations.append(
+          "{} alternates between full and empty. Increase its capacity of {} "
+          "to prefetch more.".format(stats["name"], stats["capacity"]))
+
+  if final is not None and not recommendations:
+    recommendations.append(
+        "Increase the capacity of {} to prefetch more batches.".format(
+            final_queue))
+  return recommendations
+
+
+class InputPipelineMonitorHook(TrainingHook):
+  """Monitors the input queues and warns when training is input-bound.
+
+  Every `every_n_steps` steps the hook samples the fill level of all queues
+  that are filled by queue runners and traces how long the training step
+  waits for its batch to be dequeued. Every `report_every_n_steps` steps it
+  logs the average fill level of each queue and the fraction of step time
+  spent waiting for input. If this fraction exceeds `input_bound_threshold`
+  it logs a warning with recommendations for the input pipeline.
+
+  Params:
+    every_n_steps: Sample the queues every N steps.
+    report_every_n_steps: Report the statistics every N steps.
+    input_bound_threshold: Warn if the model spends more than this fraction
+      of the step time waiting for input.
+  """
+
+  #pylint: disable=missing-docstring
+
+  def __init__(self, params, model_dir, run_config):
+    super(InputPipelineMonitorHook, self).__init__(
+        params, model_dir, run_config)
+    self._queue_sizes = collections.OrderedDict()
+    self._capacities = {}
+    self._min_sizes = {}
+    self._final_queue = None
+    self._dequeue_ops = set()
+    self._iter_count = 0
+    self._sampling = False
+    self._step_start = None
+    self._global_step = None
+    self._reset_samples()
+
+  @staticmethod
+  def default_params():
+    return {
+        "every_n_steps": 10,
+        "report_every_n_steps": 1000,
+        "input_bound_threshold": 0.1
+    }
+
+  def _reset_samples(self):
+    self._fill_samples = collections.defaultdict(list)
+    self._step_times = []
+    self._wait_times = []
+
+  def begin(self):
+    self._iter_count = 0
+    self._global_step = tf.train.get_global_step()
+    graph = tf.get_default_graph()
+
+    features = graph_utils.get_dict_from_collection("features")
+    labels = graph_utils.get_dict_from_collection("labels")
+    final_queue_op, dequeue_size = _find_input_queue(
+        list(features.values()) + list(labels.values()))
+
+    queue_ops = [
+        _.queue.queue_ref.op
+        for _ in tf.get_collection(tf.GraphKeys.QUEUE_RUNNERS)
+    ]
+    if final_queue_op is not None:
+      self._final_queue = final_queue_op.name
+      queue_ops.append(final_queue_op)
+
+    with tf.name_scope("input_pipeline_monitor"):
+      for queue_op in queue_ops:
+        if queue_op.name in self._queue_sizes:
+          continue
+        self._queue_sizes[queue_op.name] = _queue_size(queue_op)
+        self._capacities[queue_op.name] = queue_op.get_attr("capacity")
+        self._min_sizes[queue_op.name] = 1
+    if final_queue_op is not None:
+      self._min_sizes[final_queue_op.name] = dequeue_size
+
+    self._dequeue_ops = set(
+        op.name for op in graph.get_operations()
+        if op.type in DEQUEUE_OP_TYPES and
+        op.inputs[0].op.name == self._final_queue)
+
+  def before_run(self, _run_context):
+    self._sampling = (self._iter_count % self.params["every_n_steps"] == 0)
+    self._step_start = time.time()
+    if not self._sampling:
+      return tf.train.SessionRunArgs(self._global_step)
+    run_options = tf.RunOptions(trace_level=tf.RunOptions.SOFTWARE_TRACE) #pylint: disable=E1101
+    return tf.train.SessionRunArgs(
+        [self._global_step, self._queue_sizes], options=run_options)
+
+  def after_run(self, _run_context, run_values):
+    self._iter_count += 1
+    if self._sampling:
+      self._step_times.append(time.time() - self._step_start)
+      step, queue_sizes = run_values.results
+      for name, size in queue_sizes.items():
+        self._fill_samples[name].append(size)
+
+      # The time the step spends in the dequeue op is the time it waits for
+      # input.
+      wait_micros = 0
+      for dev_stats in run_values.run_metadata.step_stats.dev_stats:
+        for node_stats in dev_stats.node_stats:
+          if node_stats.node_name in self._dequeue_ops:
+            wait_micros += node_stats.all_end_rel_micros
+      self._wait_times.append(wait_micros / 1e6)
+    else:
+      step = run_values.results
+
+    if self._iter_count % self.params["report_every_n_steps"] == 0 and \
+      self._step_times:
+      self._report(step)
+      self._reset_samples()
+
+  def compute_statistics(self):
+    """Returns the statistics of the samples since the last report.
+
+    Returns:
+      A tuple `(queue_stats, wait_fraction)`. `queue_stats` is a list with a
+      dictionary for each queue.
+    """
+    queue_stats = []
+    for name, sizes in self._fill_samples.items():
+      capacity = self._capacities[name]
+      sizes = np.array(sizes, dtype=np.float64)
+      fill = sizes / capacity if capacity > 0 else np.zeros_like(sizes)
+      queue_stats.append({
+          "name": name,
+          "capacity": capacity,
+          "mean_size": float(np.mean(sizes)),
+          "mean_fill": float(np.mean(fill)),
+          "max_fill": float(np.max(fill)),
+          "empty_fraction": float(np.mean(sizes < self._min_sizes[name]))
+      })
+    # Keep the order in which the queues were created, readers first
+    order = list(self._queue_sizes.keys())
+    queue_stats.sort(key=lambda _: order.index(_["name"]))
+    wait_fraction = sum(self._wait_times) / max(sum(self._step_times), 1e-12)
+    return queue_stats, wait_fraction
+
+  def _report(self, step):
+    queue_stats, wait_fraction = self.compute_statistics()
+
+    lines = ["Input pipeline @ step {}: {:.1%} of step time waiting for "
+             "input".format(step, wait_fraction)]
+    for stats in queue_stats:
+      lines.append(
+          "  {name}: {mean_size:.1f}/{capacity} elements ({mean_fill:.0%} "
+          "full, empty in {empty_fraction:.0%} of samples)".format(**stats))
+    tf.logging.info("\n".join(lines))
+
+    if wait_fraction > self.params["input_bound_threshold"]:
+      recommendations = _recommend_input_knobs(queue_stats, self._final_queue)
+      tf.logging.warning(
+          "Training is input-bound: %.1f%% of the step time is spent waiting "
+          "for input.\n%s", 100.0 * wait_fraction,
+          "\n".join("  - " + _ for _ in recommendations))
+
+    if self.is_chief:
+      values = [
+          tf.Summary.Value(tag="input_pipeline/wait_fraction",
+                           simple_value=wait_fraction)
+      ]
+      for stats in queue_stats:
+        values.append(tf.Summary.Value(
+            tag="input_pipeline/{}/fill".format(stats["name"]),
+            simple_value=stats["mean_fill"]))
+      tf.summary.FileWriterCache.get(self.model_dir).add_summary(
+          tf.Summary(value=values), step)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Utilities to run a distributed training cluster on a single machine.
+
+A local cluster consists of parameter servers and training processes that
+communicate over localhost. The chief training process runs as the `master`
+job and all other training processes run as `worker` jobs, which is the
+layout expected by `tf.contrib.learn.RunConfig`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import multiprocessing
+import os
+import socket
+
+
+def find_free_ports(num_ports, host="localhost"):
+  """Returns a list of distinct ports that are currently unused.
+
+  The ports are released again before this function returns, so another
+  process may grab them in the meantime. This is good enough for launching
+  a cluster right away.
+  """
+  sockets = []
+  try:
+    for _ in range(num_ports):
+      sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+      sock.bind((host, 0))
+      sockets.append(sock)
+    return [sock.getsockname()[1] for sock in sockets]
+  finally:
+    for sock in sockets:
+      sock.close()
+
+
+def create_cluster(num_workers, num_ps=1, host="localhost", ports=None):
+  """Creates the cluster definition of a local cluster.
+
+  Args:
+    num_workers: Total number of training processes, including the chief.
+    num_ps: Number of parameter servers.
+    host: The host name all processes listen on.
+    ports: Optional, a list of `num_ps + num_workers` ports. If None, free
+      ports are chosen automatically.
+
+  Returns:
+    A dictionary mapping job names to lists of "host:port" addresses, in
+    the format of the `cluster` entry of `TF_CONFIG`.
+  """
+  if num_workers < 1:
+    raise ValueError("A cluster needs at least one training process.")
+  if num_ps < 0:
+    raise ValueError("The number of parameter servers must be >= 0.")
+  if ports is None:
+    ports = find_free_ports(num_ps + num_workers, host)
+  if len(ports) != num_ps + num_workers:
+    raise ValueError("Expected {} ports, got {}".format(
+        num_ps + num_workers, len(ports)))
+
+  addresses = ["{}:{}".format(host, port) for port in ports]
+  cluster = {"master": addresses[num_ps:num_ps + 1]}
+  if num_ps > 0:
+    cluster["ps"] = addresses[:num_ps]
+  if num_workers > 1:
+    cluster["worker"] = addresses[num_ps + 1:]
+  return cluster
+
+
+def cluster_tasks(cluster):
+  """Returns a list of `(job_name, task_index)` tuples for all tasks in the
+  cluster. Parameter servers come first so that they can be started before
+  the training processes.
+  """
+  tasks = []
+  for job_name in ["ps", "master", "worker"]:
+    for task_index in range(len(cluster.get(job_name, []))):
+      tasks.append((job_name, task_index))
+  return tasks
+
+
+def create_tf_config(cluster, job_name, task_index):
+  """Returns the `TF_CONFIG` environment variable value for a task.
+
+  Args:
+    cluster: A cluster definition as returned by `create_cluster`.
+    job_name: The job of the task, one of "ps", "master" or "worker".
+    task_index: The index of the task within its job.
+
+  Returns:
+    A JSON string.
+  """
+  if task_index >= len(cluster.get(job_name, [])):
+    raise ValueError("Task {}:{} is not part of the cluster".format(
+        job_name, task_index))
+  return json.dumps({
+      "cluster": cluster,
+      "task": {
+          "type": job_name,
+          "index": task_index
+      },
+      "environment": "cloud"
+  })
+
+
+def available_cpus():
+  """Returns a sorted list of the CPU ids the current process may run on."""
+  if hasattr(os, "sched_getaffinity"):
+    return sorted(os.sched_getaffinity(0))
+  return list(range(multiprocessing.cpu_count()))
+
+
+def partition_cpus(cpus, num_workers, num_ps=1, num_ps_cpus=1):
+  """Assigns CPUs to the processes of a local cluster.
+
+  The parameter servers share the first `num_ps_cpus` CPUs. The remaining
+  CPUs are split into contiguous, disjoint blocks of (almost) equal size,
+  one per training process. If there are fewer CPUs than processes, CPUs
+  are shared round-robin instead.
+
+  Args:
+    cpus: A list of CPU ids.
+    num_workers: Total number of training processes, including the chief.
+    num_ps: Number of parameter servers.
+    num_ps_cpus: Number of CPUs reserved for the parameter servers.
+
+  Returns:
+    A tuple `(ps_cpus, worker_cpus)`. `ps_cpus` is a list of CPU ids shared
+    by all parameter servers and `worker_cpus` is a list with a list of CPU
+    ids for each training process.
+  """
+  if not cpus:
+    raise ValueError("No CPUs to partition.")
+  cpus = list(cpus)
+
+  ps_cpus = []
+  worker_pool = cpus
+  if num_ps > 0:
+    if len(cpus) - num_ps_cpus >= num_workers:
+      ps_cpus = cpus[:num_ps_cpus]
+      worker_pool = cpus[num_ps_cpus:]
+    else:
+      ps_cpus = cpus[:max(num_ps_cpus, 1)]
+
+  if len(worker_pool) < num_workers:
+    worker_cpus = [[worker_pool[i % len(worker_pool)]]
+                   for i in range(num_workers)]
+    return ps_cpus, worker_cpus
+
+  block_size, remainder = divmod(len(worker_pool), num_workers)
+  worker_cpus = []
+  start = 0
+  for worker_index in range(num_workers):
+    end = start + block_size + (1 if worker_index < remainder else 0)
+    worker_cpus.append(worker_pool[start:end])
+    start = end
+  return ps_cpus, worker_cpus
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Optimizer wrappers used for training.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+
+class LazyAdamOptimizer(tf.train.AdamOptimizer):
+  """A variant of Adam that only updates the moment estimates and weights of
+  the rows of a sparse gradient, e.g. the embeddings of the tokens in a
+  batch. The regular Adam optimizer decays the moments of all rows in every
+  step, which makes the update proportional to the vocabulary size.
+
+  Dense gradients are applied as in `tf.train.AdamOptimizer`. This is the
+  same algorithm as `tf.contrib.opt.LazyAdamOptimizer`, which is not
+  available in TensorFlow 1.0.
+  """
+
+  def _apply_sparse(self, grad, var):
+    dtype = var.dtype.base_dtype
+    beta1_power = tf.cast(self._beta1_power, dtype)
+    beta2_power = tf.cast(self._beta2_power, dtype)
+    lr_t = tf.cast(self._lr_t, dtype)
+    beta1_t = tf.cast(self._beta1_t, dtype)
+    beta2_t = tf.cast(self._beta2_t, dtype)
+    epsilon_t = tf.cast(self._epsilon_t, dtype)
+    lr = lr_t * tf.sqrt(1 - beta2_power) / (1 - beta1_power)
+
+    # Sum the gradients of duplicate rows so each row is updated once
+    indices, positions = tf.unique(grad.indices)
+    values = tf.unsorted_segment_sum(
+        grad.values, positions, tf.shape(indices)[0])
+
+    m = self.get_slot(var, "m")
+    m_t = tf.scatter_update(
+        m, indices,
+        beta1_t * tf.gather(m, indices) + (1 - beta1_t) * values,
+        use_locking=self._use_locking)
+    v = self.get_slot(var, "v")
+    v_t = tf.scatter_update(
+        v, indices,
+        beta2_t * tf.gather(v, indices) + (1 - beta2_t) * tf.square(values),
+        use_locking=self._use_locking)
+
+    m_t_rows = tf.gather(m_t, indices)
+    v_t_rows = tf.gather(v_t, indices)
+    var_update = tf.scatter_sub(
+        var, indices, lr * m_t_rows / (tf.sqrt(v_t_rows) + epsilon_t),
+        use_locking=self._use_locking)
+    return tf.group(var_update, m_t, v_t)
+
+
+class GradientAccumulationOptimizer(tf.train.Optimizer):
+  """An optimizer that accumulates gradients over `num_steps` calls of its
+  update operation and only then applies their average using the wrapped
+  optimizer. This results in the same update as training with a
+  `num_steps` times larger batch, but only a single micro-batch needs to
+  fit into memory.
+
+  The global step is only incremented when the gradients are applied, so
+  learning rate decay and the number of training steps refer to the
+  number of updates. This optimizer can in turn be wrapped by a
+  `SyncReplicasOptimizer`, in which case gradients aggregated across
+  replicas are accumulated.
+
+  Args:
+    opt: The optimizer to wrap.
+    num_steps: Apply the gradients every `num_steps` steps.
+    clip_gradients: Optional, a function that is applied to the list of
+      averaged `(gradient, variable)` pairs before they are applied.
+      Pass this instead of clipping the gradients of each micro-batch.
+    use_locking: If true, use locks for the accumulation.
+    name: Name for the operations created by this optimizer.
+  """
+
+  def __init__(self,
+               opt,
+               num_steps,
+               clip_gradients=None,
+               use_locking=False,
+               name="GradientAccumulation"):
+    super(GradientAccumulationOptimizer, self).__init__(use_locking, name)
+    self._opt = opt
+    self._num_steps = num_steps
+    self._clip_gradients = clip_gradients
+
+  def compute_gradients(self, *args, **kwargs):
+    return self._opt.compute_gradients(*args, **kwargs)
+
+  def get_slot(self, *args, **kwargs):
+    return self._opt.get_slot(*args, **kwargs)
+
+  def get_slot_names(self, *args, **kwargs):
+    return self._opt.get_slot_names(*args, **kwargs)
+
+  def apply_gradients(self, grads_and_vars, global_step=None, name=None):
+    grads_and_vars = [(g, v) for g, v in grads_and_vars if g is not None]
+
+    # Variables of the wrapped optimizer must not be created inside the
+    # conditional below, so its slots are created here.
+    with tf.control_dependencies(None):
+      #pylint: disable=protected-access
+      self._opt._create_slots([var for _, var in grads_and_vars])
+
+    with tf.name_scope(name, self._name):
+      accumulators = [
+          self._zeros_slot(var, "accumulator", self._name)
+          for _, var in grads_and_vars
+      ]
+      with tf.variable_scope(self._name):
+        counter = tf.get_variable(
+            "counter", [], tf.int64, tf.constant_initializer(0),
+            trainable=False)
+
+      accumulate_ops = []
+      for (grad, _), accumulator in zip(grads_and_vars, accumulators):
+        if isinstance(grad, tf.IndexedSlices):
+          accumulate_ops.append(tf.scatter_add(
+              accumulator, grad.indices, grad.values,
+              use_locking=self._use_locking))
+        else:
+          accumulate_ops.append(tf.assign_add(
+              accumulator, grad, use_locking=self._use_locking))
+      with tf.control_dependencies(accumulate_ops):
+        step = tf.assign_add(counter, 1, use_locking=self._use_locking)
+
+      def average_gradients():
+        """Returns the averaged and optionally clipped gradients."""
+        averaged = [(accumulator / self._num_steps, var)
+                    for accumulator, (_, var) in zip(accumulators,
+                                                     grads_and_vars)]
+        if self._clip_gradients is not None:
+          averaged = self._clip_gradients(averaged)
+        return averaged
+
+      def apply_and_reset():
+        """Applies the averaged gradients and resets the accumulators."""
+        apply_op = self._opt.apply_gradients(
+            average_gradients(), global_step=global_step)
+        with tf.control_dependencies([apply_op]):
+          reset_ops = [
+              tf.assign(accumulator, tf.zeros_like(accumulator))
+              for accumulator in accumulators
+          ]
+        with tf.control_dependencies(reset_ops):
+          return tf.constant(True)
+
+      applied = tf.cond(
+          tf.equal(step % self._num_steps, 0),
+          apply_and_reset,
+          lambda: tf.constant(False))
+      return applied.op
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Aggregation of per-op execution statistics over traced training steps.
+
+The statistics are collected from the `RunMetadata` of fully traced steps,
+e.g. by the `MetadataCaptureHook`, and can be summarized by name scope and
+compared between runs by `bin/tools/profile.py`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import json
+
+from tensorflow import gfile
+
+OP_STATS_FILENAME = "op_stats.json"
+STAT_KEYS = ["micros", "bytes", "float_ops"]
+
+
+def collect_op_stats(step_stats, float_ops=None):
+  """Collects the execution time and memory of all ops in a traced step.
+
+  An op may show up on several devices, e.g. once for launching a GPU kernel
+  and once for each stream the kernel runs on. The maximum over all devices is
+  used in this case.
+
+  Args:
+    step_stats: A `StepStats` protocol buffer, as found in
+      `RunMetadata.step_stats`.
+    float_ops: Optional, a dictionary from op names to the number of floating
+      point operations of the op.
+
+  Returns:
+    A dictionary from op names to dictionaries with `micros`, `bytes` and
+    `float_ops` keys.
+  """
+  float_ops = float_ops or {}
+  op_stats = {}
+  for dev_stats in step_stats.dev_stats:
+    for node_stats in dev_stats.node_stats:
+      name = node_stats.node_name.split(":")[0]
+      if name == "_SOURCE" or name == "_SINK":
+        continue
+      num_bytes = sum(_.total_bytes for _ in node_stats.memory)
+      stats = op_stats.setdefault(
+          name, {"micros": 0, "bytes": 0,
+                 "float_ops": int(float_ops.get(name, 0))})
+      stats["micros"] = max(stats["micros"], node_stats.all_end_rel_micros)
+      stats["bytes"] = max(stats["bytes"], num_bytes)
+  return op_stats
+
+
+class OpStatsAccumulator(object):
+  """Sums up per-op statistics over multiple traced steps.
+
+  Args:
+    op_types: Optional, a dictionary from op names to op types.
+  """
+
+  def __init__(self, op_types=None):
+    self.op_types = op_types or {}
+    self.num_steps = 0
+    self.steps = []
+    self.op_stats = collections.defaultdict(
+        lambda: {key: 0 for key in STAT_KEYS + ["count"]})
+
+  def add(self, step, op_stats):
+    """Adds the statistics of a single step, as returned by
+    `collect_op_stats`."""
+    self.num_steps += 1
+    self.steps.append(int(step))
+    for name, stats in op_stats.items():
+      total = self.op_stats[name]
+      for key in STAT_KEYS:
+        total[key] += stats[key]
+      total["count"] += 1
+
+  def to_dict(self):
+    """Returns the statistics averaged per traced step."""
+    ops = {}
+    for name, total in self.op_stats.items():
+      ops[name] = {
+          key: total[key] / max(self.num_steps, 1) for key in STAT_KEYS}
+      ops[name]["count"] = total["count"]
+      ops[name]["type"] = self.op_types.get(name, "")
+    return {"num_steps": self.num_steps, "steps": self.steps, "ops": ops}
+
+  def save(self, path):
+    """Writes the averaged statistics to a JSON file."""
+    with gfile.GFile(path, "w") as file:
+      file.write(json.dumps(self.to_dict(), indent=1, sort_keys=True))
+
+
+def load_op_stats(path):
+  """Loads statistics written by `OpStatsAccumulator.save`."""
+  with gfile.GFile(path) as file:
+    return json.loads(file.read())
+
+
+def aggregate_by_scope(ops, max_depth=None):
+  """Sums up per-op statistics by name scope.
+
+  Each op is counted towards all name scopes it is nested in, up to
+  `max_depth` levels.
+
+  Args:
+    ops: A dictionary from op names to statistics, e.g. the `ops` entry of
+      the dictionary returned by `load_op_stats`.
+    max_depth: Optional, the maximum scope depth to aggregate.
+
+  Returns:
+    A dictionary from scope names to dictionaries with the summed
+    statistics and the number of ops in the scope.
+  """
+  scopes = collections.defaultdict(
+      lambda: {key: 0 for key in STAT_KEYS + ["num_ops"]})
+  for name, stats in ops.items():
+    parts = name.split("/")[:-1]
+    if max_depth is not None:
+      parts = parts[:max_depth]
+    for depth in range(1, len(parts) + 1):
+      scope = scopes["/".join(parts[:depth])]
+      for key in STAT_KEYS:
+        scope[key] += stats.get(key, 0)
+      scope["num_ops"] += 1
+  return dict(scopes)
+
+
+def aggregate_by_type(ops):
+  """Sums up per-op statistics by op type."""
+  types = collections.defaultdict(
+      lambda: {key: 0 for key in STAT_KEYS + ["num_ops"]})
+  for stats in ops.values():
+    total = types[stats.get("type") or "unknown"]
+    for key in STAT_KEYS:
+      total[key] += stats.get(key, 0)
+    total["num_ops"] += 1
+  return dict(types)
+
+
+def format_table(rows, order_by="micros", top_n=None):
+  """Formats aggregated statistics as a text table.
+
+  Args:
+    rows: A dictionary from names to statistics.
+    order_by: Sort the rows by this statistic, in descending order.
+    top_n: Optional, only include this many rows.
+
+  Returns:
+    A string.
+  """
+  names = sorted(rows, key=lambda _: (-rows[_].get(order_by, 0), _))
+  if top_n is not None:
+    names = names[:top_n]
+  lines = ["{:>12} {:>12} {:>14}  {}".format(
+      "micros", "bytes", "float_ops", "name")]
+  for name in names:
+    stats = rows[name]
+    lines.append("{:>12.0f} {:>12.0f} {:>14.0f}  {}".format(
+        stats.get("micros", 0), stats.get("bytes", 0),
+        stats.get("float_ops", 0), name))
+  return "\n".join(lines)
+
+
+def total_stats(ops):
+  """Sums up the statistics of all ops."""
+  totals = {key: 0 for key in STAT_KEYS}
+  for stats in ops.values():
+    for key in STAT_KEYS:
+      totals[key] += stats.get(key, 0)
+  return totals
+
+
+def _delta(base_value, new_value):
+  """Returns a dictionary describing the change between two values."""
+  delta = new_value - base_value
+  relative = delta / base_value if base_value else None
+  return {"base": base_value, "new": new_value, "delta": delta,
+          "relative": relative}
+
+
+def diff_stats(base_rows, new_rows):
+  """Compares aggregated statistics of two runs.
+
+  Args:
+    base_rows: A dictionary from names to statistics of the baseline run.
+    new_rows: A dictionary from names to statistics of the new run.
+
+  Returns:
+    A dictionary from all names in either run to dictionaries that map each
+    statistic to its `base` and `new` value, its absolute `delta`, and its
+    `relative` change. The relative change is None if the baseline value
+    is 0.
+  """
+  diff = {}
+  for name in set(base_rows).union(new_rows):
+    base_stats = base_rows.get(name, {})
+    new_stats = new_rows.get(name, {})
+    diff[name] = {
+        key: _delta(base_stats.get(key, 0), new_stats.get(key, 0))
+        for key in STAT_KEYS
+    }
+  return diff
+
+
+def find_regressions(diff, thresholds, min_deltas=None):
+  """Finds the statistics that increased between two runs.
+
+  Args:
+    diff: A dictionary returned by `diff_stats`.
+    thresholds: A dictionary from statistics to the relative increase above
+      which they count as regression, e.g. `{"micros": 0.1}`.
+    min_deltas: Optional, a dictionary from statistics to the minimum
+      absolute increase that counts as regression. Used to ignore noise in
+      small values.
+
+  Returns:
+    A list of dictionaries with the `name`, `metric` and the change of each
+    regression, ordered by decreasing absolute increase.
+  """
+  min_deltas = min_deltas or {}
+  regressions = []
+  for name, stats in diff.items():
+    for key, threshold in thresholds.items():
+      change = stats[key]
+      if change["delta"] <= min_deltas.get(key, 0):
+        continue
+      # Values that are new in this run always count as regression
+      if change["relative"] is None or change["relative"] > threshold:
+        regression = {"name": name, "metric": key}
+        regression.update(change)
+        regressions.append(regression)
+  return sorted(regressions, key=lambda _: (-_["delta"], _["name"]))
+
+
+def format_diff_table(diff, order_by="micros", top_n=None):
+  """Formats the changes of a statistic as a text table, ordered by the
+  absolute change."""
+  names = sorted(diff, key=lambda _: (-abs(diff[_][order_by]["delta"]), _))
+  if top_n is not None:
+    names = names[:top_n]
+  lines = ["{:>12} {:>12} {:>12} {:>8}  {}".format(
+      "base", "new", "delta", "change", "name")]
+  for name in names:
+    change = diff[name][order_by]
+    relative = "new" if change["relative"] is None else "{:+.1%}".format(
+        change["relative"])
+    lines.append("{:>12.0f} {:>12.0f} {:>+12.0f} {:>8}  {}".format(
+        change["base"], change["new"], change["delta"], relative, name))
+  return "\n".join(lines)
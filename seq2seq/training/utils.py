@@ -22,12 +22,14 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import inspect
+import io
 import os
 from collections import defaultdict
 from pydoc import locate
 
 import json
 
+import numpy as np
 import tensorflow as tf
 from tensorflow import gfile
 
@@ -231,11 +233,201 @@ def create_learning_rate_decay_fn(decay_type,
   return decay_fn
 
 
+def input_shard_params(run_config):
+  """Returns the input pipeline parameters that give each training process
+  in a distributed cluster a disjoint shard of the data.
+
+  The master reads shard 0 and the workers read the following shards in
+  order of their task id. Outside of a cluster there is a single shard.
+
+  Args:
+    run_config: A `RunConfig` instance.
+
+  Returns:
+    A dictionary with `num_shards` and `shard_index` keys.
+  """
+  cluster_spec = run_config.cluster_spec
+  if cluster_spec is None or not cluster_spec.jobs:
+    return {"num_shards": 1, "shard_index": 0}
+
+  def _num_tasks(job_name):
+    if job_name not in cluster_spec.jobs:
+      return 0
+    return cluster_spec.num_tasks(job_name)
+
+  num_masters = _num_tasks("master")
+  num_shards = num_masters + _num_tasks("worker")
+  if run_config.task_type == "worker":
+    shard_index = num_masters + run_config.task_id
+  else:
+    shard_index = run_config.task_id
+  if num_shards == 0 or shard_index >= num_shards:
+    return {"num_shards": 1, "shard_index": 0}
+  return {"num_shards": num_shards, "shard_index": shard_index}
+
+
+def _length_keys(tensors):
+  """Returns the names of the sequence length tensors in `tensors`."""
+  return [k for k in ["source_len", "target_len"] if k in tensors]
+
+
+def _curriculum_filter(features_and_labels, curriculum_steps,
+                       curriculum_min_length, curriculum_max_length):
+  """Creates a predicate that implements a length curriculum.
+
+  During the first `curriculum_steps` training steps only examples up to a
+  maximum length are kept. The maximum length grows linearly from
+  `curriculum_min_length` to `curriculum_max_length`. After that all
+  examples are kept.
+
+  Returns:
+    A boolean scalar tensor, or None if there is no global step.
+  """
+  global_step = tf.contrib.framework.get_global_step()
+  if global_step is None:
+    tf.logging.warning("No global step found, disabling the curriculum.")
+    return None
+  progress = tf.minimum(
+      tf.to_float(global_step) / float(curriculum_steps), 1.0)
+  max_length = curriculum_min_length + progress * (
+      curriculum_max_length - curriculum_min_length)
+  conditions = [
+      tf.to_float(features_and_labels[k]) <= max_length
+      for k in _length_keys(features_and_labels)
+  ]
+  return tf.logical_or(
+      global_step >= curriculum_steps, tf.reduce_all(tf.stack(conditions)))
+
+
+def _filtered_batch(tensors, keep_input, batch_size, **kwargs):
+  """Batches single examples for which the scalar `keep_input` is true, using
+  only ops available in TensorFlow 1.0. Each example is turned into a batch
+  of zero or one elements and enqueued with `enqueue_many=True`. All other
+  keyword arguments are passed to `tf.train.batch`.
+  """
+  keep_indices = tf.reshape(tf.where(tf.reshape(keep_input, [1])), [-1])
+  filtered = {
+      k: tf.gather(tf.expand_dims(v, 0), keep_indices)
+      for k, v in tensors.items()
+  }
+  return tf.train.batch(
+      tensors=filtered, enqueue_many=True, batch_size=batch_size, **kwargs)
+
+
+def _maybe_batch(tensors, keep_input, batch_size, **kwargs):
+  """Batches single examples for which the scalar `keep_input` is true.
+
+  Uses `tf.train.maybe_batch` if it is available (TensorFlow >= 1.1) and
+  falls back to `_filtered_batch` otherwise.
+  """
+  if not hasattr(tf.train, "maybe_batch"):
+    return _filtered_batch(tensors, keep_input, batch_size, **kwargs)
+  return tf.train.maybe_batch(
+      tensors=tensors,
+      keep_input=keep_input,
+      enqueue_many=False,
+      batch_size=batch_size,
+      **kwargs)
+
+
+def _trim_padding(batch):
+  """Removes padding that is not needed by any example of a batch. Sequence
+  tensors are assumed to start with the same prefix as their length tensor,
+  e.g. `source_tokens` and `source_len`."""
+  batch = dict(batch)
+  for length_key in _length_keys(batch):
+    prefix = length_key[:-len("len")]
+    max_length = tf.reduce_max(batch[length_key])
+    for key, tensor in batch.items():
+      if key.startswith(prefix) and tensor.get_shape().ndims >= 2:
+        batch[key] = tensor[:, :max_length]
+  return batch
+
+
+def _sorted_pool_batch(tensors, batch_size, pool_size, keep_input, capacity):
+  """Batches examples of similar length together.
+
+  Reads a pool of `pool_size * batch_size` examples, sorts it by source and
+  target length, cuts it into `pool_size` batches and enqueues these batches
+  in random order. Each dequeued batch is padded only to the length of its
+  longest example.
+
+  Returns:
+    A dictionary of batched tensors.
+  """
+  pool_examples = pool_size * batch_size
+  length_keys = _length_keys(tensors)
+  if not length_keys:
+    raise ValueError("Sorted pool batching requires source_len or "
+                     "target_len")
+
+  if keep_input is not None:
+    pool = _maybe_batch(
+        tensors=tensors,
+        keep_input=keep_input,
+        batch_size=pool_examples,
+        dynamic_pad=True,
+        capacity=capacity + pool_examples,
+        name="pool_queue")
+  else:
+    pool = tf.train.batch(
+        tensors=tensors,
+        batch_size=pool_examples,
+        dynamic_pad=True,
+        capacity=capacity + pool_examples,
+        name="pool_queue")
+
+  # Sort by source length first and target length second
+  sort_key = tf.zeros([pool_examples], dtype=tf.int64)
+  for key in length_keys:
+    length = tf.to_int64(pool[key])
+    sort_key = sort_key * (tf.reduce_max(length) + 1) + length
+  _, sorted_indices = tf.nn.top_k(-sort_key, k=pool_examples)
+
+  # Shuffle the order of the batches, but not the examples within them
+  batch_order = tf.random_shuffle(tf.range(pool_size))
+  indices = tf.gather(
+      tf.reshape(sorted_indices, [pool_size, batch_size]), batch_order)
+  indices = tf.reshape(indices, [-1])
+
+  batches = {}
+  for key, tensor in pool.items():
+    tensor = tf.gather(tensor, indices)
+    batches[key] = tf.reshape(
+        tensor,
+        tf.concat([[pool_size, batch_size], tf.shape(tensor)[1:]], 0))
+    batches[key].set_shape(
+        [pool_size, batch_size] + tensor.get_shape().as_list()[1:])
+
+  batch = tf.train.batch(
+      tensors=batches,
+      enqueue_many=True,
+      batch_size=1,
+      dynamic_pad=True,
+      capacity=2 * pool_size,
+      name="batch_queue")
+  return _trim_padding({k: tf.squeeze(v, [0]) for k, v in batch.items()})
+
+
+def _add_padding_summaries(batch):
+  """Adds summaries for the fraction of non-padding tokens in a batch."""
+  for length_key in _length_keys(batch):
+    length = tf.to_float(batch[length_key])
+    padded_tokens = tf.to_float(tf.size(length)) * tf.reduce_max(length)
+    tf.summary.scalar(
+        "padding_efficiency/" + length_key[:-len("_len")],
+        tf.reduce_sum(length) / tf.maximum(padded_tokens, 1.0))
+
+
 def create_input_fn(pipeline,
                     batch_size,
                     bucket_boundaries=None,
                     allow_smaller_final_batch=False,
-                    scope=None):
+                    scope=None,
+                    pool_size=None,
+                    curriculum_steps=None,
+                    curriculum_min_length=10,
+                    curriculum_max_length=50):
   """Creates an input function that can be used with tf.learn estimators.
     Note that you must pass "factory funcitons" for both the data provider and
     featurizer to ensure that everything will be created in  the same graph.
@@ -246,11 +438,32 @@ def create_input_fn(pipeline,
       reasonable number of batches in memory is created.
     bucket_boundaries: int list, increasing non-negative numbers.
       If None, no bucket is performed.
+    allow_smaller_final_batch: If true, the last batch of a finite input
+      may be smaller than `batch_size`.
+    scope: Optional, the variable scope of the input ops.
+    pool_size: If set, read pools of `pool_size` batches, sort each pool by
+      sequence length and return its batches in random order. Can not be
+      combined with `bucket_boundaries`.
+    curriculum_steps: If set, train on short examples first. The maximum
+      length of an example grows from `curriculum_min_length` to
+      `curriculum_max_length` over this many steps.
+    curriculum_min_length: The maximum example length at the first step.
+    curriculum_max_length: The maximum example length at the last
+      curriculum step. All examples are used afterwards.
 
   Returns:
     An input function that returns `(feature_batch, labels_batch)`
     tuples when called.
+
+  Raises:
+    ValueError: If `pool_size` is combined with bucketing or with smaller
+      final batches.
   """
+  if pool_size and bucket_boundaries:
+    raise ValueError("pool_size and bucket_boundaries are exclusive")
+  if pool_size and allow_smaller_final_batch:
+    raise ValueError("Sorted pool batching does not support smaller final "
+                     "batches")
 
   def input_fn():
     """Creates features and labels.
@@ -260,17 +473,48 @@ def create_input_fn(pipeline,
       data_provider = pipeline.make_data_provider()
       features_and_labels = pipeline.read_from_data_provider(data_provider)
 
-      if bucket_boundaries:
+      # Examples rejected by the pipeline are dropped before they are
+      # enqueued, so they never affect the padded batch size.
+      keep_input = pipeline.keep_input(features_and_labels)
+      if curriculum_steps:
+        curriculum_keep_input = _curriculum_filter(
+            features_and_labels, curriculum_steps, curriculum_min_length,
+            curriculum_max_length)
+        if keep_input is None:
+          keep_input = curriculum_keep_input
+        elif curriculum_keep_input is not None:
+          keep_input = tf.logical_and(keep_input, curriculum_keep_input)
+
+      if pool_size:
+        batch = _sorted_pool_batch(
+            tensors=features_and_labels,
+            batch_size=batch_size,
+            pool_size=pool_size,
+            keep_input=keep_input,
+            capacity=5000 + 16 * batch_size)
+      elif bucket_boundaries:
+        bucket_keep_input = features_and_labels["source_len"] >= 1
+        if keep_input is not None:
+          bucket_keep_input = tf.logical_and(bucket_keep_input, keep_input)
         _, batch = tf.contrib.training.bucket_by_sequence_length(
             input_length=features_and_labels["source_len"],
             bucket_boundaries=bucket_boundaries,
             tensors=features_and_labels,
             batch_size=batch_size,
-            keep_input=features_and_labels["source_len"] >= 1,
+            keep_input=bucket_keep_input,
             dynamic_pad=True,
             capacity=5000 + 16 * batch_size,
             allow_smaller_final_batch=allow_smaller_final_batch,
             name="bucket_queue")
+      elif keep_input is not None:
+        batch = _maybe_batch(
+            tensors=features_and_labels,
+            keep_input=keep_input,
+            batch_size=batch_size,
+            dynamic_pad=True,
+            capacity=5000 + 16 * batch_size,
+            allow_smaller_final_batch=allow_smaller_final_batch,
+            name="batch_queue")
       else:
         batch = tf.train.batch(
             tensors=features_and_labels,
@@ -280,6 +524,7 @@ def create_input_fn(pipeline,
             capacity=5000 + 16 * batch_size,
             allow_smaller_final_batch=allow_smaller_final_batch,
             name="batch_queue")
+      _add_padding_summaries(batch)
 
       # Separate features and labels
       features_batch = {k: batch[k] for k in pipeline.feature_keys}
@@ -291,3 +536,159 @@ def create_input_fn(pipeline,
       return features_batch, labels_batch
 
   return input_fn
+
+
+def materialize_batches(input_fn):
+  """Runs an input function in a separate graph until its input is exhausted.
+
+  Returns:
+    A list of `(features, labels)` tuples of numpy array dictionaries.
+    `labels` is None if the input function does not return labels.
+  """
+  batches = []
+  with tf.Graph().as_default():
+    features, labels = input_fn()
+    with tf.Session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(tf.local_variables_initializer())
+      coord = tf.train.Coordinator()
+      threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+      try:
+        while True:
+          features_, labels_ = sess.run([features, labels or {}])
+          batches.append((features_, labels_ or None))
+      except tf.errors.OutOfRangeError:
+        pass
+      finally:
+        coord.request_stop()
+        coord.join(threads)
+  return batches
+
+
+def _save_batches(batches, path):
+  """Saves batches returned by `materialize_batches` to a numpy file."""
+  arrays = {}
+  for batch_idx, (features, labels) in enumerate(batches):
+    for prefix, dict_ in [("features", features), ("labels", labels or {})]:
+      for key, value in dict_.items():
+        if value.dtype.kind == "O":
+          value = value.astype("S")
+        arrays["{}/{}/{}".format(batch_idx, prefix, key)] = value
+  buffer = io.BytesIO()
+  np.savez(buffer, **arrays)
+  with gfile.GFile(path, "wb") as file:
+    file.write(buffer.getvalue())
+  tf.logging.info("Saved %d evaluation batches to %s", len(batches), path)
+
+
+def _load_batches(path):
+  """Loads batches saved by `_save_batches`."""
+  with gfile.GFile(path, "rb") as file:
+    arrays = dict(np.load(io.BytesIO(file.read())).items())
+  batches = defaultdict(lambda: ({}, {}))
+  for name, value in arrays.items():
+    batch_idx, prefix, key = name.split("/", 2)
+    features, labels = batches[int(batch_idx)]
+    (features if prefix == "features" else labels)[key] = value
+  tf.logging.info("Loaded %d evaluation batches from %s", len(batches), path)
+  return [(features, labels or None)
+          for _, (features, labels) in sorted(batches.items())]
+
+
+def _tf_dtype(array):
+  """Returns the Tensorflow dtype for a numpy array."""
+  if array.dtype.kind in ["S", "U", "O"]:
+    return tf.string
+  return tf.as_dtype(array.dtype)
+
+
+def create_cached_input_fn(pipeline,
+                           batch_size,
+                           bucket_boundaries=None,
+                           allow_smaller_final_batch=False,
+                           cache_path=None,
+                           scope=None):
+  """Creates an input function that reads all batches once and replays them
+  on every subsequent call. This avoids re-reading and re-batching the same
+  data for every evaluation. The pipeline must read a finite number of
+  epochs, e.g. `num_epochs=1`.
+
+  The batches are read in a separate graph the first time the input function
+  is called and kept in memory. If `cache_path` is given they are also saved
+  to that file, and loaded from it if the file already exists. Delete the
+  file if the underlying data changes.
+
+  Args:
+    pipeline: An instance of `seq2seq.data.InputPipeline`.
+    batch_size: Create batches of this size.
+    bucket_boundaries: int list, increasing non-negative numbers.
+      If None, no bucket is performed.
+    allow_smaller_final_batch: Allow the final batch to be smaller.
+    cache_path: Optional, a file to store the batches in.
+    scope: Optional, a variable scope for the input function.
+
+  Returns:
+    An input function that returns `(feature_batch, labels_batch)`
+    tuples when called.
+  """
+  if pipeline.params["num_epochs"] is None:
+    raise ValueError("Can only cache input pipelines with a finite number "
+                     "of epochs.")
+
+  base_input_fn = create_input_fn(
+      pipeline=pipeline,
+      batch_size=batch_size,
+      bucket_boundaries=bucket_boundaries,
+      allow_smaller_final_batch=allow_smaller_final_batch,
+      scope=scope)
+  cache = {}
+
+  def get_batches():
+    """Returns the cached batches, reading them first if necessary."""
+    if "batches" not in cache:
+      if cache_path and gfile.Exists(cache_path):
+        cache["batches"] = _load_batches(cache_path)
+      else:
+        cache["batches"] = materialize_batches(base_input_fn)
+        tf.logging.info("Cached %d input batches", len(cache["batches"]))
+        if cache_path:
+          _save_batches(cache["batches"], cache_path)
+    return cache["batches"]
+
+  def input_fn():
+    """Replays the cached features and labels.
+    """
+    batches = get_batches()
+    if not batches:
+      raise ValueError("The input pipeline did not produce any batches.")
+    first_features, first_labels = batches[0]
+    feature_keys = sorted(first_features.keys())
+    label_keys = sorted((first_labels or {}).keys())
+
+    def get_batch(batch_idx):
+      """Returns the arrays of a single batch in a fixed order"""
+      features, labels = batches[batch_idx]
+      return [features[k] for k in feature_keys] + \
+        [labels[k] for k in label_keys]
+
+    with tf.variable_scope(scope or "input_fn"):
+      # Produces each batch index once and then raises OutOfRangeError
+      batch_idx = tf.train.range_input_producer(
+          len(batches), num_epochs=1, shuffle=False).dequeue()
+
+      dtypes = [_tf_dtype(first_features[k]) for k in feature_keys]
+      dtypes += [_tf_dtype(first_labels[k]) for k in label_keys]
+      tensors = tf.py_func(get_batch, [batch_idx], dtypes, stateful=False)
+      ndims = [first_features[k].ndim for k in feature_keys]
+      ndims += [first_labels[k].ndim for k in label_keys]
+      for tensor, ndim in zip(tensors, ndims):
+        tensor.set_shape([None] * ndim)
+
+      num_features = len(feature_keys)
+      features_batch = dict(zip(feature_keys, tensors[:num_features]))
+      labels_batch = None
+      if label_keys:
+        labels_batch = dict(zip(label_keys, tensors[num_features:]))
+      return features_batch, labels_batch
+
+  return input_fn